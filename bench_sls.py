@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Offline benchmark of the SLS scheduler against a fake LTP tree, needs no root and no network.
+#           1. MakeFakeLTP : Creates a fake ltp tree with stub tests, runtest files and a stub runltp
+#           2. BenchEnv : Exports ltp_path, TC_OUTPUT and focus lists pointing to the fake tree, last suite is IO
+#           3. Bench : Runs SlotLoop or ScenarioLoop of scheduler_sls.py, the scheduler of go_sls.py, with cost
+#                      profiles, IO targets, optional controller, cgroups and timeouts
+#           4. Prints scenarios per hour, idle slot time, startup latency and per test launch overhead
+#
+#  SETUP:   1. ./bench_sls.py <options>, see ./bench_sls.py --help
+#           2. Tree and results are created under a temp directory, removed at the end unless -k
+#
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import datetime
+import tempfile
+import threading
+from catalog_sls import LoadCatalog, ListTests
+from runner_sls import TestRegistry
+from results_sls import ResultAggregator, RESULT_JOURNAL
+from profile_sls import Record, WriteProfile, PROFILE_FILE
+from common_sls import SetLtpPaths, lg, LogFlush
+from sampler_sls import TakeSnapshot
+from ltpmeta_sls import LoadMetadata, KernelVersion
+from cost_sls import CostProfiles
+from controller_sls import UtilController
+from iotarget_sls import IOAllocator
+from cgroup_sls import CgroupManager
+from scheduler_sls import Scheduler
+
+#Stub runltp, understands the runltp options used by RuntestCommand and writes ltp-pan style output and log
+RUNLTP = r'''#!/bin/sh
+LTPROOT=$(cd "$(dirname "$0")" && pwd)
+ITER=1
+while [ $# -gt 0 ]; do
+	case "$1" in
+	-I) ITER=$2; shift;;
+	-f) SUITE=$2; shift;;
+	-s) TEST=$2; shift;;
+	-l) LOG=$2; shift;;
+	-o) OUT=$2; shift;;
+	-g|-C|-T|-d) shift;;
+	esac
+	shift
+done
+CMD=$(awk -v t="$TEST" '$1 == t {$1 = ""; print; exit}' "$LTPROOT/runtest/$SUITE")
+mkdir -p "$(dirname "$LOG")" "$(dirname "$OUT")"
+: > "$OUT"
+FAIL=0
+i=0
+while [ $i -lt $ITER ]; do
+	START=$(date +%s)
+	printf '<<<test_start>>>\ntag=%s stime=%s\n<<<test_output>>>\n' "$TEST" "$START" >> "$OUT"
+	PATH="$LTPROOT/testcases/bin:$PATH" sh -c "$CMD" >> "$OUT" 2>&1
+	RC=$?
+	[ $RC -ne 0 ] && FAIL=$((FAIL + 1))
+	printf '<<<execution_status>>>\ninitiation_status="ok"\nduration=%d termination_type=exited termination_id=%d corefile=no\n<<<test_end>>>\n' $(( $(date +%s) - START )) $RC >> "$OUT"
+	i=$((i + 1))
+done
+printf 'Total Tests: %d\nTotal Skipped Tests: 0\nTotal Failures: %d\n' $ITER $FAIL > "$LOG"
+'''
+
+STUB_PASS = '#!/bin/sh\nsleep %.3f\necho "%s 1 TPASS : bench"\nexit 0\n'
+STUB_FAIL = '#!/bin/sh\nsleep %.3f\necho "%s 1 TFAIL : bench"\nexit 1\n'
+
+
+def WriteScript(path, content):
+	with open(path, 'w') as g:
+		g.write(content)
+	os.chmod(path, 0o755)
+
+
+def MakeFakeLTP(ltp_path, tests, suites, min_duration, max_duration, fail_rate, seed=0):
+	rnd = random.Random(seed)
+	ltpbin = '%s/testcases/bin' % ltp_path
+	runtest = '%s/runtest' % ltp_path
+	for d in [ltpbin, runtest, '%s/results' % ltp_path, '%s/output' % ltp_path]:
+		os.makedirs(d)
+	lines = dict(('bench%02d' % s, []) for s in range(suites))
+	for t in range(tests):
+		test = 'bench%05d' % t
+		duration = rnd.uniform(min_duration, max_duration)
+		stub = STUB_FAIL if rnd.random() < fail_rate else STUB_PASS
+		WriteScript('%s/%s' % (ltpbin, test), stub % (duration, test))
+		lines['bench%02d' % (t % suites)].append('%s %s\n' % (test, test))
+	for suite, tlines in lines.items():
+		with open('%s/%s' % (runtest, suite), 'w') as g:
+			g.write('#Fake runtest file of bench_sls.py\n')
+			g.write(''.join(tlines))
+	WriteScript('%s/runltp' % ltp_path, RUNLTP)
+	return sorted(lines)
+
+
+def BenchEnv(prefix, ltp_path, suites, io_dirs=2):
+	#Last suite is an IO suite, its tests get /tmp/ltp_io* like targets under prefix from IOAllocator
+	sls_logdir = '%s/sls' % prefix
+	output = '%s/output' % prefix
+	io_root = '%s/tmp' % prefix
+	dirs = [sls_logdir, output, '%s/LTP_HTML_LOG' % output, io_root] + ['%s/ltp_io%d' % (io_root, x) for x in range(io_dirs)]
+	for d in dirs:
+		if not os.path.exists(d):
+			os.makedirs(d)
+	SetLtpPaths({'LTPROOT': ltp_path})
+	os.environ['TC_OUTPUT'] = output
+	os.environ['TC_HTML_PATH'] = output
+	os.environ['RIT'] = ''
+	os.environ['WAIT_SCENARIO'] = 'YES'
+	os.environ['BASE_LIST'] = ' '.join(suites[:-1] if len(suites) > 1 else suites)
+	os.environ['IO_LIST'] = suites[-1] if len(suites) > 1 else ''
+	for area in ['NFS_LIST', 'NW1_LIST', 'NW2_LIST']:
+		os.environ[area] = ''
+	return sls_logdir, output, io_root
+
+
+class BenchScheduler(Scheduler):
+	#Scheduler of go_sls.py, timing each launch and the busy time of each test
+	def __init__(self, *args, **kwargs):
+		Scheduler.__init__(self, *args, **kwargs)
+		self.lock = threading.Lock()
+		self.launch = []
+		self.finish = []
+		self.busy = []
+		self.launched = 0
+		self.completed = 0
+		self.first_launch = None
+		self.stopped = None
+
+	def Launch(self, test):
+		start = time.time()
+		th = Scheduler.Launch(self, test)
+		now = time.time()
+		with self.lock:
+			self.launch.append(now - start)
+			self.launched += 1
+			if self.first_launch is None:
+				self.first_launch = now
+		Record('bench launch', now - start)
+		return th
+
+	def CallLtp(self, run):
+		start = time.time()
+		Scheduler.CallLtp(self, run)
+		now = time.time()
+		with self.lock:
+			#Exit of runltp to result in aggregator and cost profile
+			if run.end is not None:
+				self.finish.append((datetime.datetime.now() - run.end).total_seconds())
+			self.busy.append((start, now))
+			self.completed += 1
+
+	def Drain(self):
+		self.stopped = time.time()
+		Scheduler.Drain(self)
+
+
+class Bench(object):
+	def __init__(self, prefix, sls_logdir, output, io_root, slots, run_seconds, mode, iterations,
+			targets=None, cgroup=False, timeout_factor=''):
+		self.prefix = prefix
+		self.sls_logdir = sls_logdir
+		self.output = output
+		self.io_root = io_root
+		self.slots = slots
+		self.run_seconds = run_seconds
+		self.mode = mode
+		self.targets = targets or [None, None]
+		self.cgroup = cgroup
+		self.ltp_vars = {'SLS_DIR': sls_logdir, 'ITERATIONS': str(iterations), 'MIN_TEST_PER_SCENARIO': str(slots),
+			'MAX_TEST_PER_SCENARIO': str(slots), 'TIMEOUT_FACTOR': timeout_factor}
+		self.log = '%s/START.LTP_log' % output
+		self.tlog = '%s/go_sls.log' % sls_logdir
+		self.scheduler = None
+
+	def Sample(self, window=None):
+		#Same sampler as go_sls.py, / usage of the bench filesystem only
+		return TakeSnapshot(window, self.prefix)
+
+	def Run(self):
+		self.start = time.time()
+		catalog = LoadCatalog(self.sls_logdir)
+		self.catalog_time = time.time() - self.start
+		tests = ListTests(catalog, '')
+		ltp_meta = LoadMetadata(self.sls_logdir)
+		registry = TestRegistry(self.sls_logdir, '%s/IN-PROGRESS-TEST' % self.output)
+		self.aggregator = ResultAggregator('%s/REPORT.json' % self.output, datetime.datetime.now(),
+			journal='%s/%s' % (self.output, RESULT_JOURNAL))
+		self.aggregator.Start()
+		costs = CostProfiles(self.sls_logdir)
+		costs.Load()
+		iotargets = IOAllocator(self.io_root)
+		iotargets.Refresh()
+		cgroups = None
+		if self.cgroup:
+			manager = CgroupManager({}, catalog, lambda line: lg(self.log, line, 0, 1))
+			if manager.Setup() == 0:
+				cgroups = manager
+		self.scheduler = BenchScheduler(self.ltp_vars, tests, catalog, registry, self.aggregator, costs,
+			self.log, self.tlog, self.sls_logdir, '%s/SCENARIO_LIST' % self.output, ltp_meta, KernelVersion(),
+			None, iotargets, cgroups, False, sample=self.Sample)
+		if self.targets[0] is not None or self.targets[1] is not None:
+			self.scheduler.controller = UtilController(self.targets[0], self.targets[1], self.slots, self.slots)
+
+		end_time = datetime.datetime.now() + datetime.timedelta(seconds=self.run_seconds)
+		if self.mode == 'SLOT':
+			self.scheduler.SlotLoop(end_time, self.run_seconds // 3600)
+		else:
+			self.scheduler.ScenarioLoop(end_time, self.run_seconds // 3600)
+		self.stop = self.scheduler.stopped or time.time()
+		self.drain = time.time() - self.stop
+		self.aggregator.SetStatus('Completed')
+		self.aggregator.Stop()
+		costs.Save()
+		WriteProfile('%s/%s' % (self.output, PROFILE_FILE), self.start)
+
+	def IdleSlots(self):
+		#Slot seconds between start and end of scheduling not used by a running test
+		busy = 0.0
+		for start, end in self.scheduler.busy:
+			busy += max(0.0, min(end, self.stop) - max(start, self.start))
+		return max(self.slots * (self.stop - self.start) - busy, 0.0)
+
+	def Report(self):
+		elapsed = self.stop - self.start
+		scheduler = self.scheduler
+		idle = self.IdleSlots()
+		report = {
+			'MODE': self.mode,
+			'SLOTS': self.slots,
+			'ELAPSED': round(elapsed, 3),
+			'DRAIN': round(self.drain, 3),
+			'SCENARIOS': scheduler.scen,
+			'SCENARIOS_PER_HOUR': round(scheduler.scen * 3600 / elapsed, 1),
+			'TESTS_LAUNCHED': scheduler.launched,
+			'TESTS_COMPLETED': scheduler.completed,
+			'TESTS_PER_HOUR': round(scheduler.completed * 3600 / elapsed, 1),
+			'IDLE_SLOT_SECONDS': round(idle, 3),
+			'IDLE_SLOT_PERCENT': round(100 * idle / (self.slots * elapsed), 2),
+			'CATALOG_SECONDS': round(self.catalog_time, 6),
+			'STARTUP_LATENCY': round(scheduler.first_launch - self.start, 6) if scheduler.first_launch else None,
+			'LAUNCH_OVERHEAD': Summary(scheduler.launch),
+			'FINISH_OVERHEAD': Summary(scheduler.finish),
+			'REPORT': self.aggregator.Report()['RESULTS']['OVERVIEW'],
+		}
+		return report
+
+
+def Summary(values):
+	if len(values) == 0:
+		return {'COUNT': 0, 'AVG': 0, 'MAX': 0, 'P95': 0}
+	values = sorted(values)
+	return {'COUNT': len(values), 'AVG': round(sum(values) / len(values), 6), 'MAX': round(values[-1], 6),
+		'P95': round(values[int(0.95 * (len(values) - 1))], 6)}
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark SLS scheduler against a fake LTP tree')
+	parser.add_argument('-t', type=int, dest='tests', default=2000, help='Stub tests to create (default 2000)')
+	parser.add_argument('-u', type=int, dest='suites', default=20, help='Runtest files to create (default 20)')
+	parser.add_argument('--min-duration', type=float, default=0.5, help='Shortest stub test run in seconds (default 0.5)')
+	parser.add_argument('--max-duration', type=float, default=2.0, help='Longest stub test run in seconds (default 2)')
+	parser.add_argument('-f', type=float, dest='fail_rate', default=0.1, help='Share of stub tests printing TFAIL (default 0.1)')
+	parser.add_argument('-s', type=int, dest='slots', default=8, help='Tests running at once (default 8)')
+	parser.add_argument('-d', type=float, dest='seconds', default=60, help='Seconds to schedule new tests (default 60)')
+	parser.add_argument('-m', dest='mode', default='SLOT', choices=['SLOT', 'SCENARIO'], help='Scheduler (default SLOT)')
+	parser.add_argument('-I', type=int, dest='iterations', default=1, help='Iterations per test (default 1)')
+	parser.add_argument('--target-cpu', type=int, default=None, help='TARGET_CPU_UTIL of the controller (default none)')
+	parser.add_argument('--target-mem', type=int, default=None, help='TARGET_MEM_UTIL of the controller (default none)')
+	parser.add_argument('--timeout-factor', default='', help='TIMEOUT_FACTOR for hung tests (default none)')
+	parser.add_argument('-c', action='store_true', dest='cgroup', help='Run tests in cgroups, needs root and cgroup v2')
+	parser.add_argument('-p', dest='prefix', default=None, help='Directory for fake tree and results (default temp dir)')
+	parser.add_argument('-o', dest='json', default=None, help='Write results as JSON to this file')
+	parser.add_argument('-k', action='store_true', dest='keep', help='Keep fake tree and results')
+	args = parser.parse_args()
+
+	if args.min_duration > args.max_duration or args.slots < 1 or args.tests < 1 or args.suites < 1:
+		print("Invalid arguments, see %s --help" % sys.argv[0])
+		sys.exit(1)
+
+	prefix = args.prefix
+	if prefix is None:
+		prefix = tempfile.mkdtemp(prefix='sls_bench_')
+	ltp_path = '%s/ltp' % prefix
+	if os.path.exists(ltp_path):
+		print("%s exists, use a new directory with -p" % ltp_path)
+		sys.exit(1)
+
+	start = time.time()
+	suites = MakeFakeLTP(ltp_path, args.tests, args.suites, args.min_duration, args.max_duration, args.fail_rate)
+	print("Created %d stub tests in %d suites under %s in %.2fs" % (args.tests, args.suites, ltp_path, time.time() - start))
+	sls_logdir, output, io_root = BenchEnv(prefix, ltp_path, suites)
+
+	bench = Bench(prefix, sls_logdir, output, io_root, args.slots, args.seconds, args.mode, args.iterations,
+		[args.target_cpu, args.target_mem], args.cgroup, args.timeout_factor)
+	try:
+		bench.Run()
+	except KeyboardInterrupt:
+		if bench.scheduler is not None:
+			bench.scheduler.registry.KillAll()
+		sys.exit(1)
+	report = bench.Report()
+
+	print("Mode                : %s, %d slots, %.1fs (+%.1fs drain)" % (report['MODE'], report['SLOTS'], report['ELAPSED'], report['DRAIN']))
+	print("Scenarios per hour  : %.1f (%d scenarios)" % (report['SCENARIOS_PER_HOUR'], report['SCENARIOS']))
+	print("Tests per hour      : %.1f (%d launched, %d completed)" % (report['TESTS_PER_HOUR'], report['TESTS_LAUNCHED'], report['TESTS_COMPLETED']))
+	print("Idle slot time      : %.2fs (%.2f%%)" % (report['IDLE_SLOT_SECONDS'], report['IDLE_SLOT_PERCENT']))
+	print("Startup latency     : %ss (catalog %.4fs)" % (report['STARTUP_LATENCY'], report['CATALOG_SECONDS']))
+	for key in ['LAUNCH_OVERHEAD', 'FINISH_OVERHEAD']:
+		s = report[key]
+		print("%-20s: avg %.4fs p95 %.4fs max %.4fs (%d tests)" % (key.replace('_', ' ').capitalize(), s['AVG'], s['P95'], s['MAX'], s['COUNT']))
+	print("Results             : %s" % report['REPORT'])
+
+	if args.json is not None:
+		with open(args.json, 'w') as g:
+			json.dump(report, g, indent=1, sort_keys=True)
+	if args.keep:
+		print("Fake tree and results kept under %s" % prefix)
+	else:
+		#Queued log lines of the tree are written before it goes, not dropped by the writer at exit
+		LogFlush()
+		shutil.rmtree(prefix, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
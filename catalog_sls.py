@@ -0,0 +1,221 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Test catalog used by SLS to find suite and iterations of a test without forking grep.
+#           1. TestCatalog : In memory index of test -> suites, runtest command lines, RIT flag and focus area
+#           2. BuildCatalog : Reads ltp runtest files and testcases/bin once and builds the catalog
+#           3. LoadCatalog : Returns catalog persisted under SLS_DIR, rebuilds it if LTP tree has changed
+#           4. SaveCatalog : Persists the catalog under SLS_DIR
+#           5. OmitRegex : Converts FULL_OMIT_LIST of tc_group to a regex
+#           6. ListTests : Lists testcases/bin entries which are not part of FULL_OMIT_LIST
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. go_sls.py loads the catalog once at start and keeps it in memory.
+#
+
+import os
+import re
+import json
+
+CATALOG_VERSION = 1
+CATALOG_FILE = 'cache/ltp_catalog.json'
+FOCUS_LISTS = ['BASE_LIST', 'IO_LIST', 'NFS_LIST', 'NW1_LIST', 'NW2_LIST']
+
+
+class TestCatalog(object):
+	def __init__(self):
+		self.binaries = []
+		self.suites = {}
+		self.cmdlines = {}
+		self.rit = {}
+		self.focus = {}
+		self.signature = {}
+		self._binset = None
+
+	def HasTest(self, test):
+		return test in self._bins()
+
+	def Suites(self, test):
+		return self.suites.get(test, [])
+
+	def Cmdline(self, test, suite):
+		return self.cmdlines.get(test, {}).get(suite, '')
+
+	def IsRIT(self, test):
+		return self.rit.get(test, False)
+
+	def FocusArea(self, suite):
+		return self.focus.get(suite, '')
+
+	def HasSuite(self, suite):
+		return suite in self.signature.get('RUNTEST', {})
+
+	def SuiteTests(self, suites):
+		#Set of tests referenced by any of the given runtest files
+		suites = set(suites)
+		tests = set()
+		for test, tsuites in self.suites.items():
+			for suite in tsuites:
+				if suite in suites:
+					tests.add(test)
+					break
+		return tests
+
+	def _bins(self):
+		if self._binset is None:
+			self._binset = set(self.binaries)
+		return self._binset
+
+	def ToDict(self):
+		return {'VERSION': CATALOG_VERSION, 'SIGNATURE': self.signature, 'BINARIES': self.binaries,
+			'SUITES': self.suites, 'CMDLINES': self.cmdlines, 'RIT': self.rit}
+
+	def FromDict(self, data):
+		self.signature = data['SIGNATURE']
+		self.binaries = data['BINARIES']
+		self.suites = data['SUITES']
+		self.cmdlines = data['CMDLINES']
+		self.rit = data['RIT']
+		self._binset = None
+
+
+def CatalogSignature(ltp_path, rit):
+	#mtime of runtest directory, each runtest file and testcases/bin decides if catalog is stale
+	runtest = ltp_path + '/runtest'
+	ltpbin = ltp_path + '/testcases/bin'
+	signature = {'RIT': rit, 'LTP_PATH': ltp_path, 'RUNTEST': {}}
+	signature['RUNTEST_DIR'] = os.stat(runtest).st_mtime if os.path.isdir(runtest) else 0
+	signature['BIN_DIR'] = os.stat(ltpbin).st_mtime if os.path.isdir(ltpbin) else 0
+	if os.path.isdir(runtest):
+		for f in os.listdir(runtest):
+			fpath = runtest + '/' + f
+			if os.path.isfile(fpath):
+				signature['RUNTEST'][f] = os.stat(fpath).st_mtime
+	return signature
+
+
+def RITRegex(rit):
+	R = rit.strip().split('|')
+	R = list(dict.fromkeys(R))
+	R = [re.escape(i) for i in R if i]
+	if len(R) == 0:
+		return None
+	return re.compile('|'.join(R), re.I)
+
+
+def BuildCatalog(ltp_path=None, rit=None):
+	if ltp_path is None:
+		ltp_path = os.environ.get('ltp_path', '/opt/ltp')
+	if rit is None:
+		rit = os.environ.get('RIT', '')
+	catalog = TestCatalog()
+	catalog.signature = CatalogSignature(ltp_path, rit)
+
+	ltpbin = ltp_path + '/testcases/bin'
+	if os.path.isdir(ltpbin):
+		catalog.binaries = sorted(os.listdir(ltpbin))
+	bins = catalog._bins()
+
+	#Read each runtest file once, a test belongs to every suite which references it as a word
+	runtest = ltp_path + '/runtest'
+	for suite in sorted(catalog.signature['RUNTEST'].keys()):
+		with open(runtest + '/' + suite, 'rb') as fp:
+			lines = fp.read().decode('utf-8', 'replace').splitlines()
+		for line in lines:
+			line = line.strip()
+			if line == '' or line.startswith('#'):
+				continue
+			for token in line.split():
+				test = os.path.basename(token.strip('"\''))
+				if test not in bins:
+					continue
+				if test not in catalog.cmdlines:
+					catalog.cmdlines[test] = {}
+					catalog.suites[test] = []
+				if suite not in catalog.cmdlines[test]:
+					catalog.cmdlines[test][suite] = line
+					catalog.suites[test].append(suite)
+
+	rit_re = RITRegex(rit)
+	for test in catalog.binaries:
+		catalog.rit[test] = rit_re is not None and rit_re.search(test) is not None
+	return catalog
+
+
+def OmitRegex(omit_list):
+	#Same as grep -E on the list, '*_16' style glob entries are matched as substring and empty entries are dropped
+	O = omit_list.strip().split('|')
+	O = [i.lstrip('*') for i in O]
+	O = [i for i in O if i]
+	if len(O) == 0:
+		return None
+	return re.compile('|'.join(O))
+
+
+def ListTests(catalog, omit_list):
+	omit_re = OmitRegex(omit_list)
+	tests = []
+	for test in catalog.binaries:
+		if re.match('[1-9]', test):
+			continue
+		if omit_re is not None and omit_re.search(test):
+			continue
+		tests.append(test)
+	return tests
+
+
+def SetFocus(catalog):
+	for area in FOCUS_LISTS:
+		if area not in os.environ:
+			continue
+		for suite in os.environ[area].split(' '):
+			suite = suite.strip()
+			if suite != '' and suite not in catalog.focus:
+				catalog.focus[suite] = area.replace('_LIST', '')
+	return catalog
+
+
+def SaveCatalog(catalog, sls_logdir):
+	cfile = '%s/%s' % (sls_logdir, CATALOG_FILE)
+	cdir = os.path.dirname(cfile)
+	if not os.path.exists(cdir):
+		os.makedirs(cdir)
+	tmpfile = '%s.%d' % (cfile, os.getpid())
+	with open(tmpfile, 'w') as fp:
+		json.dump(catalog.ToDict(), fp)
+	os.rename(tmpfile, cfile)
+
+
+def LoadCatalog(sls_logdir, ltp_path=None, rit=None):
+	if ltp_path is None:
+		ltp_path = os.environ.get('ltp_path', '/opt/ltp')
+	if rit is None:
+		rit = os.environ.get('RIT', '')
+	cfile = '%s/%s' % (sls_logdir, CATALOG_FILE)
+	if os.path.exists(cfile):
+		try:
+			with open(cfile, 'r') as fp:
+				data = json.load(fp)
+			if data['VERSION'] == CATALOG_VERSION and data['SIGNATURE'] == CatalogSignature(ltp_path, rit):
+				catalog = TestCatalog()
+				catalog.FromDict(data)
+				return SetFocus(catalog)
+		except (ValueError, KeyError, IOError, OSError):
+			pass
+
+	catalog = BuildCatalog(ltp_path, rit)
+	try:
+		SaveCatalog(catalog, sls_logdir)
+	except (IOError, OSError):
+		pass
+	return SetFocus(catalog)
@@ -0,0 +1,278 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Runs each test of go_sls.py in its own cgroup v2 under /sys/fs/cgroup/sls.slice.
+#           1. ParseLimits : Parses CGROUP_TEST_LIMITS, CGROUP_RIT_LIMITS and CGROUP_IO_LIMITS of sls_config, memory may be a percent
+#           2. CgroupProcs, KillCgroup, RemoveCgroup : Processes of a cgroup, kill all of them, remove the cgroup
+#           3. CgroupStats : memory.peak, memory.events oom_kill, cpu.stat and io.stat of a test cgroup
+#           4. CgroupManager : Enables controllers on sls.slice, creates a cgroup per test with limits of
+#                              its class RIT, IO or TEST, and releases it with its stats when the test ends
+#
+#  SETUP:   1. Kernel with cgroup v2 mounted on /sys/fs/cgroup, CGROUP='NO' in sls_config runs tests without it
+#           2. go_sls.py passes its CgroupManager to StartTest and FinishTest of runner_sls.py
+#
+
+import os
+import re
+import time
+import signal
+import threading
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+CGROUP_SLICE = 'sls.slice'
+CGROUP_CONTROLLERS = ['cpu', 'io', 'memory', 'pids']
+CGROUP_CLASSES = ['TEST', 'RIT', 'IO']
+#Seconds to wait for processes of a killed cgroup to exit before rmdir
+CGROUP_DRAIN = 5
+LIMIT_FILE = re.compile(r'^(cpu|io|memory|pids)\.[a-z_.]+$')
+#Child shell waits until the parent has moved it into the cgroup, then execs runltp, so runltp and all
+#its children start inside it. Anything but 'go' on stdin means the move failed and the test does not run
+JOIN_SCRIPT = 'read go; [ "$go" = go ] || exit 126; exec "$@" < /dev/null'
+
+
+def ParseLimits(value):
+	#'memory.max:4G,pids.max:2048,cpu.max:200000 100000' -> {file: value}
+	limits = {}
+	for item in value.split(','):
+		item = item.strip()
+		if item == '':
+			continue
+		if ':' not in item:
+			raise ValueError('%s is not <file>:<value>' % item)
+		key, val = item.split(':', 1)
+		key = key.strip()
+		if not LIMIT_FILE.match(key):
+			raise ValueError('%s is not a cpu, io, memory or pids cgroup file' % key)
+		val = val.strip()
+		if val.endswith('%'):
+			if not key.startswith('memory.') or not val[:-1].isdigit() or int(val[:-1]) > 100:
+				raise ValueError('%s of %s can be a percent of memory only for memory files' % (val, key))
+		limits[key] = val
+	return limits
+
+
+def LimitValue(key, value):
+	#memory.max:50% is 50% of MemTotal in bytes
+	if not value.endswith('%'):
+		return value
+	with open('/proc/meminfo', 'r') as fp:
+		for line in fp:
+			if line.startswith('MemTotal:'):
+				return str(int(line.split()[1]) * 1024 * int(value[:-1]) // 100)
+	return 'max'
+
+
+def CgroupV2(root=CGROUP_ROOT):
+	return os.path.exists('%s/cgroup.controllers' % root)
+
+
+def ReadFile(path):
+	try:
+		with open(path, 'r') as fp:
+			return fp.read()
+	except (IOError, OSError):
+		return None
+
+
+def WriteFile(path, value):
+	with open(path, 'w') as fp:
+		fp.write(value)
+
+
+def ReadKeyed(path):
+	#Flat keyed files like cpu.stat and memory.events
+	data = ReadFile(path)
+	values = {}
+	if data is None:
+		return values
+	for line in data.splitlines():
+		fields = line.split()
+		if len(fields) == 2 and fields[1].isdigit():
+			values[fields[0]] = int(fields[1])
+	return values
+
+
+def CgroupProcs(path):
+	data = ReadFile('%s/cgroup.procs' % path)
+	if data is None:
+		return []
+	return [int(x) for x in data.split()]
+
+
+def Populated(path):
+	data = ReadFile('%s/cgroup.events' % path)
+	if data is None:
+		return False
+	return re.search(r'^populated 1', data, re.M) is not None
+
+
+def KillCgroup(path, sig=signal.SIGKILL):
+	#cgroup.kill of 5.14+ kills every process at once, older kernels kill what cgroup.procs lists
+	if sig == signal.SIGKILL:
+		try:
+			WriteFile('%s/cgroup.kill' % path, '1')
+			return 0
+		except (IOError, OSError):
+			pass
+	pids = CgroupProcs(path)
+	for pid in pids:
+		try:
+			os.kill(pid, sig)
+		except OSError:
+			continue
+	return 0 if len(pids) != 0 else 1
+
+
+def RemoveCgroup(path):
+	end = time.time() + CGROUP_DRAIN
+	while Populated(path):
+		KillCgroup(path)
+		if time.time() > end:
+			return 1
+		time.sleep(0.05)
+	try:
+		os.rmdir(path)
+	except OSError:
+		return 1
+	return 0
+
+
+def CgroupStats(path):
+	stats = {}
+	peak = ReadFile('%s/memory.peak' % path)
+	if peak is not None and peak.strip().isdigit():
+		stats['MEMORY_PEAK'] = int(peak)
+	events = ReadKeyed('%s/memory.events' % path)
+	if 'oom_kill' in events:
+		stats['OOM_KILL'] = events['oom_kill']
+	cpu = ReadKeyed('%s/cpu.stat' % path)
+	if len(cpu) != 0:
+		stats['CPU_STAT'] = cpu
+	#io.stat has one line per device, '8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0 dios=0'
+	data = ReadFile('%s/io.stat' % path)
+	if data is not None:
+		io = {}
+		for line in data.splitlines():
+			fields = line.split()
+			if len(fields) < 2:
+				continue
+			io[fields[0]] = dict((k, int(v)) for k, v in (x.split('=', 1) for x in fields[1:]) if v.isdigit())
+		stats['IO_STAT'] = io
+	return stats
+
+
+class CgroupManager(object):
+	def __init__(self, limits=None, catalog=None, report=None, root=CGROUP_ROOT, name=CGROUP_SLICE):
+		#limits is {class: {file: value}}, report is called with warnings
+		self.limits = limits or {}
+		self.catalog = catalog
+		self.report = report
+		self.parent = '%s/%s' % (root, name)
+		self.root = root
+		self.controllers = []
+		self.lock = threading.Lock()
+		self.count = 0
+		self.failed = set()
+
+	def Report(self, line):
+		if self.report is not None:
+			self.report(line)
+
+	def Setup(self):
+		#Returns 0 if tests can run in cgroups, controllers missing on the kernel are left out
+		if not CgroupV2(self.root):
+			self.Report('[cgroup] cgroup v2 is not mounted on %s, tests run without cgroups' % self.root)
+			return 1
+		available = (ReadFile('%s/cgroup.controllers' % self.root) or '').split()
+		wanted = [x for x in CGROUP_CONTROLLERS if x in available]
+		for path in [self.root, self.parent]:
+			if path == self.parent and not os.path.isdir(path):
+				try:
+					os.mkdir(path)
+				except OSError as e:
+					self.Report('[cgroup] Cannot create %s: %s, tests run without cgroups' % (path, str(e)))
+					return 1
+			for c in wanted:
+				try:
+					WriteFile('%s/cgroup.subtree_control' % path, '+' + c)
+				except (IOError, OSError):
+					continue
+		enabled = (ReadFile('%s/cgroup.subtree_control' % self.parent) or '').split()
+		self.controllers = [x for x in wanted if x in enabled]
+
+		#Test cgroups left by an earlier run which did not finish
+		for name in os.listdir(self.parent):
+			path = '%s/%s' % (self.parent, name)
+			if os.path.isdir(path) and RemoveCgroup(path) != 0:
+				self.Report('[cgroup] Could not remove old cgroup %s' % path)
+		self.Report('[cgroup] Tests run in %s, controllers: %s' % (self.parent, ' '.join(self.controllers)))
+		return 0
+
+	def TestClass(self, run):
+		if run.io_dir is not None:
+			return 'IO'
+		if self.catalog is not None and self.catalog.IsRIT(run.test):
+			return 'RIT'
+		return 'TEST'
+
+	def Create(self, run):
+		#Returns cgroup path of the run, None if it could not be created
+		with self.lock:
+			self.count += 1
+			name = '%s-%d' % (re.sub(r'[^\w.-]', '_', run.test), self.count)
+		path = '%s/%s' % (self.parent, name)
+		try:
+			os.mkdir(path)
+		except OSError as e:
+			self.Report('[cgroup] Cannot create %s: %s' % (path, str(e)))
+			return None
+		run.cgroup_class = self.TestClass(run)
+		for key, value in self.limits.get(run.cgroup_class, {}).items():
+			try:
+				WriteFile('%s/%s' % (path, key), LimitValue(key, value))
+			except (IOError, OSError) as e:
+				#Same bad limit would fail for every test, so it is reported once
+				if key not in self.failed:
+					self.failed.add(key)
+					self.Report('[cgroup] Cannot set %s=%s: %s' % (key, value, str(e)))
+		run.cgroup = path
+		return path
+
+	def Command(self, run, command):
+		#Started with stdin=PIPE, Join lets it exec command
+		if run.cgroup is None:
+			return command
+		return ['/bin/sh', '-c', JOIN_SCRIPT, 'sls-join'] + command
+
+	def Join(self, run, proc):
+		#Moves the child shell of Command into the cgroup of run. On error the shell exits 126 and
+		#the error is raised, stats of the cgroup would not be of the test
+		try:
+			WriteFile('%s/cgroup.procs' % run.cgroup, str(proc.pid))
+		except (IOError, OSError):
+			proc.stdin.close()
+			proc.wait()
+			raise
+		proc.stdin.write(b'go\n')
+		proc.stdin.close()
+
+	def Release(self, run):
+		#Stats of the finished test, then its leftover processes are killed and the cgroup removed
+		if run.cgroup is None:
+			return None
+		path = run.cgroup
+		stats = CgroupStats(path)
+		stats['CLASS'] = run.cgroup_class
+		if RemoveCgroup(path) != 0:
+			self.Report('[cgroup] Could not remove %s of %s' % (path, run.test))
+		run.cgroup = None
+		return stats
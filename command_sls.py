@@ -0,0 +1,177 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Command execution layer behind RunCommand and python replacements of ls/grep/wc/ps/mount pipelines.
+#           1. CommandResult : rc, output, duration, bytes and timeout status of one command
+#           2. Execute : Runs a command, argv list without shell or string with shell, optional timeout and streaming
+#           3. KillGroup : Sends SIGTERM then SIGKILL to process group of a command
+#           4. ListDir : Entries of a directory matching a pattern, same as ls <dir>|grep [-w] <pattern>
+#           5. GrepFile : Lines of a file matching a pattern, same as grep [-w] <pattern> <file>
+#           6. CountInFiles : Matching lines in a set of files, same as grep [-w] <pattern> <files>|wc -l
+#           7. ProcessCount : Processes whose command line matches a pattern, same as ps -eaf|grep|grep -v grep|wc -l
+#           8. MountPoints : Mount points matching patterns, same as mount|grep|awk '{print $3}'
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. Functions in command_sls.py will get called internally from SLS scripts.
+#
+
+import os
+import re
+import time
+import glob
+import signal
+import subprocess
+
+#Seconds a timed out command gets after SIGTERM before SIGKILL
+KILL_GRACE = 5
+#Timeouts of commands known to hang on a bad disk or unreachable host
+UMOUNT_TIMEOUT = 120
+SSH_TIMEOUT = 60
+
+
+class CommandResult(object):
+	def __init__(self, command):
+		self.command = command
+		self.rc = None
+		self.output = ''
+		self.duration = 0
+		self.bytes = 0
+		self.timed_out = False
+
+
+def KillGroup(proc, grace=KILL_GRACE):
+	try:
+		os.killpg(proc.pid, signal.SIGTERM)
+	except OSError:
+		return
+	try:
+		proc.wait(timeout=grace)
+	except subprocess.TimeoutExpired:
+		try:
+			os.killpg(proc.pid, signal.SIGKILL)
+		except OSError:
+			pass
+
+
+def Execute(command, timeout=None, stream=None):
+	#A string runs through the shell as before, an argv list runs without shell.
+	#stream appends output to that file as it comes instead of holding it in memory, output is then empty
+	result = CommandResult(command)
+	shell = not isinstance(command, list)
+	start = time.time()
+	if stream is None:
+		out = subprocess.PIPE
+	else:
+		out = open(stream, 'ab')
+		offset = out.tell()
+	#Own process group only when it may need to be killed, so SIGINT to go_sls.py group still reaches it
+	try:
+		proc = subprocess.Popen(command, shell=shell, stdout=out, stderr=subprocess.STDOUT, start_new_session=(timeout is not None))
+	except OSError as e:
+		result.rc = 127
+		result.output = '%s\n' % str(e)
+		result.duration = time.time() - start
+		if stream is not None:
+			out.close()
+		return result
+	try:
+		output, stderr = proc.communicate(timeout=timeout)
+	except subprocess.TimeoutExpired:
+		result.timed_out = True
+		KillGroup(proc)
+		output, stderr = proc.communicate()
+	result.rc = proc.returncode
+	result.duration = time.time() - start
+	if stream is None:
+		result.bytes = len(output)
+		result.output = output.decode('utf-8', 'replace')
+	else:
+		out.close()
+		result.bytes = os.path.getsize(stream) - offset
+	return result
+
+
+def _matcher(pattern, word=False, ignore_case=False):
+	flags = re.I if ignore_case else 0
+	if word:
+		return re.compile(r'(?<![\w])%s(?![\w])' % re.escape(pattern), flags)
+	return re.compile(pattern, flags)
+
+
+def ListDir(path, pattern=None, word=False):
+	try:
+		entries = sorted(os.listdir(path))
+	except OSError:
+		return []
+	if pattern is None:
+		return entries
+	match = _matcher(pattern, word)
+	return [x for x in entries if match.search(x)]
+
+
+def GrepFile(path, pattern, word=False, ignore_case=False):
+	match = _matcher(pattern, word, ignore_case)
+	lines = []
+	try:
+		with open(path, 'r', errors='replace') as fp:
+			for line in fp:
+				if match.search(line):
+					lines.append(line.rstrip('\n'))
+	except (IOError, OSError):
+		return []
+	return lines
+
+
+def CountInFiles(paths, pattern, word=False, ignore_case=False):
+	if not isinstance(paths, list):
+		paths = glob.glob(paths)
+	count = 0
+	for path in paths:
+		if os.path.isfile(path):
+			count += len(GrepFile(path, pattern, word, ignore_case))
+	return count
+
+
+def ProcessCount(pattern, exclude=None):
+	count = 0
+	match = re.compile(pattern)
+	for pid in os.listdir('/proc'):
+		if not pid.isdigit() or int(pid) == os.getpid():
+			continue
+		try:
+			with open('/proc/%s/cmdline' % pid, 'rb') as fp:
+				cmdline = fp.read().replace(b'\0', b' ').decode('utf-8', 'replace').strip()
+		except (IOError, OSError):
+			continue
+		if cmdline == '' or not match.search(cmdline):
+			continue
+		if exclude is not None and re.search(exclude, cmdline):
+			continue
+		count += 1
+	return count
+
+
+def MountPoints(patterns):
+	points = []
+	with open('/proc/mounts', 'r') as fp:
+		for line in fp:
+			fields = line.split()
+			if len(fields) < 2:
+				continue
+			#/proc/mounts escapes space as \040
+			mp = fields[1].replace('\\040', ' ')
+			for p in patterns:
+				if p in line:
+					points.append(mp)
+					break
+	return points
@@ -12,31 +12,29 @@
 #  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
 #  PURPOSE: Contains definitions of all common functions used by SLS.
 #           1. GetVars : Reads input file argument and returns a dictionary of values
-#           2. lg : Logs the input argument into required log file 
-#           3. RunCommand : Executes shell command passed as argument
+#           2. lg : Logs the input argument into required log file, written by logger_sls.py in background
+#           3. RunCommand : Executes shell command or argv list passed as argument, with optional timeout
 #           4. GetOS : Read /etc/os-release and returns OS release related information
-#           5. InstallPackage : Installs package passed as argument
-#           6. LoadModule : Loads the Module passed as argument
+#           5. InstallPackage : Installs package passed as argument, InstallPackages installs a list in one transaction
+#           6. LoadModule : Loads the Module passed as argument, LoadModules loads a list from one modules.dep lookup
 #           7. ExportVars : Exports the dictionary argument to shell environment
-#           8. ChangeLTP : Replaces rsh related tests with ssh, drop unsupported tests
-#           9. DropIPV6 : Drops IPV6 related tests
-#          10. DropNfsv3UDP : Drops NFS version3 related tests
-#          11. CopyDataFiles : copies the datafiles to /opt/ltp/datafiles required for Network/IO tests
-#          12. StartService : Starts the services required for SLS execution
-#          13. ValidIP : Verifies if the argument is a valid IP or not
-#          14. CheckNetwork : Checks and exports LHOST and RHOST values required for Network/NFS tests
-#          15. GetRandom : Generates a random number in given range, used to pick random tests to execute
-#          16. MachineInfo : Executes commands mentioned in MACHINE_INFO_COMMANDS in sls_config file
-#          17. CheckNw : Checks if RHOST is pingable if Network tests are running
-#          18. GetFreeCPU : Check how much free CPU is available, based on this next set of tests will be selected
-#          19. GetFreeMem : Check how much free Memory is available, based on this next set of tests will be selected
-#          20. GetFsSpace : Check how much free space is available on boot disk
-#          21. SetMinFree : Sets min_free_kbytes and swappiness as per SLS requirement
-#          22. CreateFS : Creates Filesystem/LVM on IO disks
-#          23. OOMKill : Kills SLS related processes if free memory goes below 10% of total memory
-#          24. ParseScenFile : Parses scenario file if SLS is executed with -r option
-#          25. GetSuiteIterations : Finds to which suite a test belongs to and decides how many iterations a test should be executed
-#          26. CreatePMEMFS : Creates pmem namespaces and filesystem required for IO test
+#           8. ChangeLTP : Rewrites runtest files in one pass, rsh to ssh, drops unsupported, newer kernel, IPV6 and NFSv3 UDP tests
+#           9. CopyDataFiles : copies the datafiles to LTPROOT/datafiles required for Network/IO tests
+#          10. StartService : Starts the services required for SLS execution
+#          11. ValidIP : Verifies if the argument is a valid IP or not
+#          12. CheckNetwork : Checks and exports LHOST and RHOST values required for Network/NFS tests
+#          13. GetRandom : Generates a random number in given range, used to pick random tests to execute
+#          14. MachineInfo : Executes commands mentioned in MACHINE_INFO_COMMANDS in sls_config file
+#          15. CheckNw : Checks if RHOST is pingable if Network tests are running
+#          16. GetFreeCPU : Check how much free CPU is available, based on this next set of tests will be selected
+#          17. GetFreeMem : Check how much free Memory is available, based on this next set of tests will be selected
+#          18. GetFsSpace : Check how much free space is available on boot disk
+#          19. SetMinFree : Sets min_free_kbytes and swappiness as per SLS requirement
+#          20. CreateFS : Creates Filesystem/LVM on IO disks, mkfs and mount of all disks run in parallel, all or nothing
+#          21. ParseScenFile : Parses scenario file if SLS is executed with -r option
+#          22. GetSuiteIterations : Finds to which suite a test belongs to and decides how many iterations a test should be executed
+#          23. CreatePMEMFS : Creates pmem namespaces and filesystem required for IO test
+#          24. SetLtpPaths : Exports ltp_path, ltp_bin and ltp_results from LTPROOT and LTP_RESULTS of sls_config
 #
 
 #  SETUP:   1. Install SLS : ./install_sls.py 
@@ -45,11 +43,22 @@
 
 import os
 import re
-import subprocess
 import random
 import time
 import datetime
-import threading
+import signal
+from catalog_sls import LoadCatalog
+from sampler_sls import TakeSnapshot
+from command_sls import Execute, MountPoints, UMOUNT_TIMEOUT, SSH_TIMEOUT
+from profile_sls import Profiled, Record, CommandTemplate
+from logger_sls import GetWriter, LogFlush, SetLogConfig, LOG_LEVELS
+from runtest_sls import LTPFilters, RewriteFiles
+from ltpmeta_sls import LoadMetadata, KernelVersion
+from cgroup_sls import ParseLimits, CGROUP_CLASSES
+from disks_sls import BlockDevices, FindTools, DisksInUse, DiskJob, PrepareDisks, FS_WORKERS
+
+#LTP install prefix, LTPROOT in sls_config overrides it
+LTPROOT = '/opt/ltp'
 
 
 def GetVars(filename='sls_config'):
@@ -123,6 +132,71 @@ def GetVars(filename='sls_config'):
 			except Exception as e:
 				print('Error in sls_config: ITERATIONS should be a positive integer')
 				return None
+		if 'SAMPLE_WINDOW' in ltp_variables and ltp_variables['SAMPLE_WINDOW'] != '':
+			try:
+				if float(ltp_variables['SAMPLE_WINDOW']) <= 0:
+					print('Error in sls_config: SAMPLE_WINDOW should be a positive number')
+					return None
+			except Exception as e:
+				print('Error in sls_config: SAMPLE_WINDOW should be a positive number')
+				return None
+		if 'LOG_FLUSH' in ltp_variables and ltp_variables['LOG_FLUSH'] != '':
+			try:
+				if float(ltp_variables['LOG_FLUSH']) < 0:
+					print('Error in sls_config: LOG_FLUSH should be a number, 0 writes logs immediately')
+					return None
+			except Exception as e:
+				print('Error in sls_config: LOG_FLUSH should be a number, 0 writes logs immediately')
+				return None
+		if 'LOG_LEVEL' in ltp_variables and ltp_variables['LOG_LEVEL'].lower() not in [''] + LOG_LEVELS:
+			print('Error in sls_config: LOG_LEVEL can be one of %s' % ', '.join(LOG_LEVELS))
+			return None
+		SetLogConfig(ltp_variables.get('LOG_FLUSH', ''), ltp_variables.get('LOG_LEVEL', ''))
+		for TU, TMAX in [('TARGET_CPU_UTIL', 100), ('TARGET_MEM_UTIL', 89)]:
+			if TU in ltp_variables and ltp_variables[TU] != '':
+				try:
+					if int(ltp_variables[TU]) <= 0 or int(ltp_variables[TU]) > TMAX:
+						print('Error in sls_config: %s should be a percent between 1 and %d' % (TU, TMAX))
+						return None
+				except Exception as e:
+					print('Error in sls_config: %s should be a percent between 1 and %d' % (TU, TMAX))
+					return None
+		if 'TEST_TIMEOUT' in ltp_variables and ltp_variables['TEST_TIMEOUT'] != '':
+			try:
+				if int(ltp_variables['TEST_TIMEOUT']) <= 0:
+					print('Error in sls_config: TEST_TIMEOUT should be a positive integer')
+					return None
+			except Exception as e:
+				print('Error in sls_config: TEST_TIMEOUT should be a positive integer')
+				return None
+		if 'TIMEOUT_FACTOR' in ltp_variables and ltp_variables['TIMEOUT_FACTOR'] != '':
+			try:
+				if float(ltp_variables['TIMEOUT_FACTOR']) <= 1:
+					print('Error in sls_config: TIMEOUT_FACTOR should be a number greater than 1')
+					return None
+			except Exception as e:
+				print('Error in sls_config: TIMEOUT_FACTOR should be a number greater than 1')
+				return None
+		if 'HANG_SYSRQ' in ltp_variables and ltp_variables['HANG_SYSRQ'] not in ['', 'YES', 'NO']:
+			print('Error in sls_config: HANG_SYSRQ can either be YES or NO')
+			return None
+		if 'CGROUP' in ltp_variables and ltp_variables['CGROUP'] not in ['', 'YES', 'NO']:
+			print('Error in sls_config: CGROUP can either be YES or NO')
+			return None
+		for CL in CGROUP_CLASSES:
+			try:
+				ParseLimits(ltp_variables.get('CGROUP_%s_LIMITS' % CL, ''))
+			except ValueError as e:
+				print('Error in sls_config: CGROUP_%s_LIMITS, %s' % (CL, str(e)))
+				return None
+		for LP in ['LTPROOT', 'LTP_RESULTS']:
+			if LP in ltp_variables and ltp_variables[LP] != '' and not ltp_variables[LP].startswith('/'):
+				print('Error in sls_config: %s should be an absolute directory name' % LP)
+				return None
+		SetLtpPaths(ltp_variables)
+		if 'SCHEDULER' in ltp_variables and ltp_variables['SCHEDULER'] not in ['', 'SCENARIO', 'SLOT']:
+			print('Error in sls_config: SCHEDULER can either be SCENARIO or SLOT')
+			return None
 		if ltp_variables['WAIT_SCENARIO'] != 'YES' and ltp_variables['WAIT_SCENARIO'] != 'NO':
 			print('Error in sls_config: WAIT_SCENARIO can either be YES or NO')
 			return None	
@@ -140,34 +214,50 @@ def lg(logfile, data, tostdout=1, timestamp=0):
 		if logdir is not None:
 			break
 		print("logdir is None, LOGS NFS issue")
-	if not os.path.exists(logdir):
-		print ("%s directory does not exist") % (logdir)
-		exit(1)
+	writer = GetWriter()
+	if logdir not in writer.dirs:
+		if not os.path.exists(logdir):
+			print("%s directory does not exist" % logdir)
+			exit(1)
+		writer.dirs.add(logdir)
 	if timestamp != 0:
 		d = datetime.datetime.now().strftime('%Y/%m/%d,%H:%M:%S')
 		data = '[' + d + '] ' + data
 	if tostdout == 1:
 		print(data)
 
-	f = open(logfile, "ab")
-	line = "%s\n" % data
-	f.write(line.encode('utf-8'))
-	f.close()
+	if writer.Wanted(data):
+		line = "%s\n" % data
+		writer.Write(logfile, line.encode('utf-8'))
 
 
-def RunCommand(command, log, needexit=1, tostdout=1):
-	if re.search('go_sls.py', command, re.M):
-		os.system(command)
+def RunCommand(command, log, needexit=1, tostdout=1, timeout=None, stream=None):
+	#stream is a file for output of long running commands, it is not buffered and not copied to log.
+	#Not the log itself, its lines are written by the log writer thread
+	if isinstance(command, list):
+		cmdline = " ".join(command)
+	else:
+		cmdline = command
+	if re.search('go_sls.py', cmdline, re.M):
+		LogFlush()
+		os.system(cmdline)
 		exit(0)
-	#status, output = commands.getstatusoutput(command)
-	proc = subprocess.Popen(command, shell=True, stdout = subprocess.PIPE,stderr = subprocess.STDOUT,)
-	output, stderr = proc.communicate()
-	output = output.decode("utf-8") 
-	status = proc.returncode
+	if stream is not None:
+		with open(stream, 'a') as g:
+			g.write("command: %s\n" % cmdline)
+	result = Execute(command, timeout, stream)
+	output = result.output
+	status = result.rc
+	command = cmdline
+	Record('RunCommand: %s' % CommandTemplate(command), result.duration)
 	if log is not None:
 		lg(log,"command: " + command, 0)
 		if output != '':
 			lg(log,output,0)
+		if stream is not None:
+			lg(log, "Output : %s (%d bytes)" % (stream, result.bytes), 0)
+		if result.timed_out:
+			lg(log, "Command : %s timed out after %d seconds, killed" % (command, timeout), 0)
 	if status != 0:
 		if log is None:
 			print("Command : " + command + " Failed")
@@ -177,6 +267,7 @@ def RunCommand(command, log, needexit=1, tostdout=1):
 		if needexit == 1:
 			if tostdout == 1:
 				print( "Log:" + log)
+			LogFlush(1)
 			exit(1)
 	if needexit == 2:
 		return output
@@ -217,14 +308,79 @@ def InstallPackage(package, log, check=1):
 			RunCommand("apt-get update; apt-get install " + package, log)
 
 
-def LoadModule(module, log):
-	command = "find /lib/modules/$(uname -r) -type f -name *%s*|tr '\n' '^'" % module
-	mods = str(RunCommand(command, log, 2, 0))
-	modules = mods.split('^')
-	for m in modules:
-		if m == '' or m == ' ':	
+def InstalledPackages(packages, log):
+	#Packages already installed, from one rpm or dpkg query, names with wildcards are left to the package manager
+	names = [p for p in packages if not re.search(r'[*?\[]', p)]
+	if len(names) == 0:
+		return []
+	if GetOS() in ['rhel', 'fedora', 'sles']:
+		output = RunCommand(['rpm', '-q', '--qf', '%{NAME}\n'] + names, log, 2, 0)
+		return [p for p in names if p in output.split('\n')]
+	output = RunCommand(['dpkg-query', '-W', '-f', '${Package} ${Status}\n'] + names, log, 2, 0)
+	return [l.split()[0] for l in output.split('\n') if l.endswith(' installed')]
+
+
+def InstallPackages(packages, log):
+	#One transaction for the whole set, per package installs only to find the failing one
+	packages = list(dict.fromkeys(p.strip() for p in packages if p.strip()))
+	installed = InstalledPackages(packages, log)
+	packages = [p for p in packages if p not in installed]
+	if len(installed) != 0:
+		lg(log, 'Already installed : %s' % ' '.join(installed))
+	if len(packages) == 0:
+		return 0
+	lg(log, 'Installing : %s' % ' '.join(packages))
+	#Package manager output can be long, it goes to its own file next to log
+	stream = '%s/install_packages.out' % os.path.dirname(os.path.abspath(log))
+	distro = GetOS()
+	if distro == 'rhel' or distro == 'fedora':
+		command = ['yum', 'install', '-y']
+	elif distro == 'sles':
+		command = ['zypper', '--non-interactive', 'install']
+	else:
+		RunCommand(['apt-get', 'update'], log, 0, 0, None, stream)
+		command = ['apt-get', 'install', '-y']
+	if RunCommand(command + packages, log, 0, 0, None, stream) == 0:
+		return 0
+	lg(log, 'Batched install failed, installing packages one by one')
+	for p in packages:
+		RunCommand(command + [p], log, 1, 1, None, stream)
+	return 0
+
+
+MODULE_INDEX = None
+def ModuleIndex():
+	#Module files of the running kernel, from modules.dep or one walk of /lib/modules
+	global MODULE_INDEX
+	if MODULE_INDEX is None:
+		moddir = '/lib/modules/%s' % os.uname()[2]
+		MODULE_INDEX = []
+		try:
+			with open('%s/modules.dep' % moddir, 'r') as fp:
+				for line in fp:
+					path = line.split(':')[0].strip()
+					if path != '':
+						MODULE_INDEX.append(path if path.startswith('/') else '%s/%s' % (moddir, path))
+		except (IOError, OSError):
+			for root, dirs, files in os.walk(moddir):
+				MODULE_INDEX.extend('%s/%s' % (root, f) for f in files)
+	return MODULE_INDEX
+
+
+def LoadModules(modules, log):
+	#Same match as find -name *<module>*, every module file containing the name is loaded
+	index = ModuleIndex()
+	for module in modules:
+		if module.strip() == '':
 			continue
-		RunCommand("insmod " + m, log, 2, 0)	
+		lg(log, 'Loading : ' + module)
+		for m in index:
+			if module in os.path.basename(m):
+				RunCommand(['insmod', m], log, 2, 0)
+
+
+def LoadModule(module, log):
+	LoadModules([module], log)
 
 
 def ExportVars(ltp_vars, log):
@@ -246,8 +402,7 @@ def ExportVars(ltp_vars, log):
 		ltp_vars['TC_HTML_PATH'] = html_path
 
 	os.environ['ltp_log_dir'] = ltp_vars['TC_HTML_PATH'] + '/' + os.environ['HOSTNAME'] + "/ltpresult" + os.environ['TMP']
-	os.environ['ltp_path'] = "/opt/ltp"
-	os.environ['ltp_bin'] = "/opt/ltp/testcases/bin"
+	SetLtpPaths(ltp_vars)
 	os.environ['KERNEL_LEVEL'] = RunCommand("uname -r | sed s/-default//", log, 2).strip()
 	os.environ['BUILD_LEVEL'] = os.environ['KERNEL_LEVEL']
 	OS_RELEASE = GetOS('NAME').strip()
@@ -286,12 +441,14 @@ def ExportVars(ltp_vars, log):
 				os.environ[key] = value
 				lg(log, 'Exported %s' % evar)
 		
-	os.environ['LTPROOT'] = '/opt/ltp'
 	#os.environ['PS1'] = '\[\e[31m\]\u@\h:\w\[\e[0m\] '
 	os.environ['NS_DURATION'] = '127'
 	os.environ['CONNECTION_TOTAL'] = '27'
 	os.environ['DOWNLOAD_REGFILESIZE'] = '2147483627'
 	os.environ['UPLOAD_REGFILESIZE'] = '214748364727'
+	#LTPROOT binaries go first, so a stale /opt/ltp in PATH of sls_config cannot shadow them
+	ltp_dirs = [os.environ['ltp_path'], os.environ['ltp_bin'], os.environ['ltp_path'] + '/testscripts']
+	os.environ['PATH'] = ':'.join(ltp_dirs + [x for x in os.environ['PATH'].split(':') if x not in ltp_dirs])
 	if 'PATH' in ltp_vars and ltp_vars['PATH'] != '':
 		os.environ['PATH'] = os.environ['PATH'] + ':' + ltp_vars['PATH']
 		ltp_vars['PATH'] = os.environ['PATH']
@@ -299,123 +456,49 @@ def ExportVars(ltp_vars, log):
 	return ltp_vars
 
 
-def ChangeLTP(log):
-	ltpbin = os.environ['ltp_bin']
-	command = "ls %s|grep -w rcp01.sh|grep -v grep|grep -v new|wc -l" % ltpbin
-	if int(RunCommand(command, log, 2, 0)) != 0:
-		lg(log, "Fixing LTP Code to enable rcp01")
-		command = "sed 's/rsh/ssh/g' %s/rcp01.sh > %s/rcp01.sh.new" % (ltpbin, ltpbin)
-		RunCommand(command, log, 1)
-		command = "mv -f %s/rcp01.sh.new %s/rcp01.sh" % (ltpbin, ltpbin)
-		RunCommand(command, log, 1)
-
-	command = "ls %s|grep -w ftp01.sh|grep -v grep|grep -v new|wc -l" % ltpbin
-	if int(RunCommand(command, log, 2, 0)) != 0:
-		lg(log, "Fixing LTP Code to ftp01")
-		command = "sed 's/rsh/ssh/g' %s/ftp01.sh > %s/ftp01.sh.new" % (ltpbin, ltpbin)
-		RunCommand(command, log, 1)
-		command = "mv -f %s/ftp01.sh.new %s/ftp01.sh" % (ltpbin, ltpbin)
-		RunCommand(command, log, 1)
-
-	command = "ls %s|grep -w check_envval|grep -v grep|grep -v new|wc -l" % ltpbin
-	if int(RunCommand(command, log, 2, 0)) != 0:
-		lg(log, "Fixing LTP code to enable mcast4-queryfld related tests")
-		command = "sed 's/exists cut locale rsh/exists cut locale ssh/g' %s/check_envval > %s/check_envval.new" % (ltpbin, ltpbin)
-		RunCommand(command, log, 1)
-		command = "mv -f %s/check_envval.new %s/check_envval" % (ltpbin, ltpbin)
-		RunCommand(command, log, 1)
-
-	lg(log, "Change IO tests to use $TMPDIR")
-	command = "sed -i 's/\/test\//$TMPDIR\//g' /opt/ltp/runtest/lvm.part1"
-	RunCommand(command, log, 0, 0)
-	command = "sed -i 's/\/test\//$TMPDIR\//g' /opt/ltp/runtest/lvm.part2"
-	RunCommand(command, log, 0, 0)
-	command = "sed -i 's/\/test\//$TMPDIR\//g' /opt/ltp/runtest/scsi_debug.part1"
-	RunCommand(command, log, 0, 0)
-	command = "sed -i 's/\/tmp\//$TMPDIR\//g' /opt/ltp/runtest/fcntl-locktests"
-	RunCommand(command, log, 0, 0)
-	
-	lg(log, "Dropping unsupported tests")
-	arch = RunCommand("uname -i",log,2,0).strip()
-	if arch == 'ppc64' or arch == 'ppc64le':
-		command = "sed -i '/_16/d' /opt/ltp/runtest/syscalls"
-		RunCommand(command, log, 0, 0)
-	ltppath = os.environ['ltp_path'] + '/runtest'
-	command = "uname -r|awk -F'.' '{print $1\".\"$2}'"
-	uname_val = RunCommand(command, log, 2, 0)
-	uname1 = int(uname_val.strip().split('.')[0])
-	uname2 = int(uname_val.strip().split('.')[1])
-	command = "grep TST_MIN_KVER /opt/ltp/testcases/bin/* 2>/dev/null|grep =|sed 's/TST_MIN_KVER=//g'|sed 's/\"//g'|tr '\n' '^'"
-	tests = RunCommand(command, log, 2, 0)
-	testlist = tests.split('^')
-	for test in testlist:
-		if test == '':
-			continue
-		tst = test.split(':')[0]
-		testname = test.split(':')[0].replace('/opt/ltp/testcases/bin/','')
-		test_version1 = int(test.split(':')[1].split('.')[0])
-		test_version2 = int(test.split(':')[1].split('.')[1])
-		if test_version1 >= uname1:
-			if test_version1 == uname1 and test_version2 < uname2:
-				continue
-			lg(log, 'Removing test:%s,  supported on: %d.%d kernel, current kernel: %d.%d' % (testname,test_version1,test_version2,uname1,uname2))
-			command = "grep -i '%s'  %s/* | cut -f 1 -d :|tr '\n' '^'" % (testname, ltppath)
-			output = RunCommand(command, log, 2, 0)
-			tsts = output.split('^')
-			for te in tsts:
-				if te == '' or te == ' ':
-					continue
-				command = "sed \"/%s/d\" %s > %s.new" % (testname,te,te)
-				RunCommand(command, log, 1)
-				command = "mv -f %s.new %s" % (te,te)
-				RunCommand(command, log, 1)
-
-
-def DropIPV6(log):
-	lg(log, "Removing IPV6 tests")
-	ltppath = os.environ['ltp_path'] + '/runtest'
-	ipv6_pattern = ['\-6', 'v6', 'ipv6', 'route6', 'mcast6']
-	for i in ipv6_pattern:
-		command = "grep -i '%s'  %s/* | cut -f 1 -d :|tr '\n' '^'" % (i, ltppath)
-		output = RunCommand(command, log, 2, 0)
-		tests = output.split('^')
-		for t in tests:
-			if t == '' or t == ' ':
-				continue
-			command = "sed \"/%s/d\" %s > %s.new" % (i,t,t)
-			RunCommand(command, log, 1)
-			command = "mv -f %s.new %s" % (t,t)
-			RunCommand(command, log, 1)
-
-
-def DropNfsv3UDP(log):
-	lg(log, "Removing unsupported nfsv3_udp tests")
-	ltppath = os.environ['ltp_path'] + '/runtest'
-	command = "grep '\-v 3 \-t udp' %s/net.nfs|wc -l" % ltppath
-	num_entries = int(RunCommand(command, log, 2, 0))
-	i = 0
-	while i < num_entries:
-		command = "sed -i '/\-v 3 \-t udp/d' %s/net.nfs" % ltppath
-		RunCommand(command, log, 1)
-		i+=1
-	
-	command = "sed -i '/nfs01_06/d' %s/net.nfs" % ltppath
-	RunCommand(command, log, 1)
-	command = "sed -i '/nfs02_06/d' %s/net.nfs" % ltppath
-	RunCommand(command, log, 1)
-	command = "echo \"nfs01_06  nfs06 -v '3,4,4,4' -t 'tcp,tcp,tcp,tcp' \" >> %s/net.nfs" % ltppath
-	RunCommand(command, log, 1)
-	command = "echo \"nfs02_06 nfs06 -v '4,4.1,4.2,4.2,4.2' -t 'tcp,tcp,tcp,tcp,tcp' \" >> %s/net.nfs" % ltppath
-	RunCommand(command, log, 1)
+def SetLtpPaths(ltp_vars=None):
+	#results and output of runltp can live on a faster filesystem than the binaries, see LTP_RESULTS
+	if ltp_vars is None:
+		ltp_vars = {}
+	ltproot = ltp_vars.get('LTPROOT', '').strip().rstrip('/')
+	if ltproot == '':
+		ltproot = LTPROOT
+	results = ltp_vars.get('LTP_RESULTS', '').strip().rstrip('/')
+	if results == '':
+		results = ltproot
+	os.environ['LTPROOT'] = ltproot
+	os.environ['ltp_path'] = ltproot
+	os.environ['ltp_bin'] = ltproot + '/testcases/bin'
+	os.environ['ltp_results'] = results
+	return ltproot, results
+
+
+def ChangeLTP(log, dry_run=False):
+	#All runtest edits in one pass, each changed file is written once, see runtest_sls.py
+	ltp_path = os.environ['ltp_path']
+	kernel = KernelVersion()
+	#Metadata index is reused across installs of the same ltp build
+	too_new = LoadMetadata(os.path.dirname(log), ltp_path).TooNew(kernel)
+	for testname in sorted(too_new):
+		lg(log, 'Removing test:%s,  supported on: %d.%d kernel, current kernel: %d.%d' % ((testname,) + too_new[testname] + kernel))
+	filters = LTPFilters(ltp_path, too_new=too_new)
+	changes = RewriteFiles(ltp_path, filters, dry_run)
+	for change in changes:
+		dropped = ', '.join('%s: %d' % (k, v) for k, v in sorted(change['DROPPED'].items()))
+		lg(log, 'Rewrote %s %s' % (change['FILE'], dropped))
+		if dry_run:
+			lg(log, change['DIFF'], 0)
+	return changes
 
 
 def CopyDataFiles(log):
-	if not os.path.exists('/opt/ltp/datafiles'):
-		if not os.path.exists('/opt/ltp/testcases/bin/datafiles'):
-			lg('Datafiles directory is not available /opt/ltp/testcases/bin/datafiles')
+	ltp_path = os.environ['ltp_path']
+	if not os.path.exists('%s/datafiles' % ltp_path):
+		if not os.path.exists('%s/testcases/bin/datafiles' % ltp_path):
+			lg(log, 'Datafiles directory is not available %s/testcases/bin/datafiles' % ltp_path)
 			return 1
-		lg(log, "Copying Datafiles to /opt/ltp/datafiles", 1)
-		command = "cp -Rf /opt/ltp/testcases/bin/datafiles /opt/ltp/"
+		lg(log, "Copying Datafiles to %s/datafiles" % ltp_path, 1)
+		command = "cp -Rf %s/testcases/bin/datafiles %s/" % (ltp_path, ltp_path)
 		RunCommand(command, log, 1)
 	
 
@@ -524,7 +607,7 @@ def CheckNetwork(ltp_vars, log, slog):
 	lg(slog, "LHOST_HWADDRS=" + LHOST_MAC)
        
 	command = "ssh -o PasswordAuthentication=no -n -q %s 'ip a' > %s/rhost_interfaces" % (RHOST, logdir) 
-	RunCommand(command, log, 1)
+	RunCommand(command, log, 1, 1, SSH_TIMEOUT)
 	command = "cat %s/rhost_interfaces|grep -B2 -w %s|head -1|awk '{print $2}'|sed 's/://g'" % (logdir, RHOST_IP)
 	RHOST_INTERFACE = RunCommand(command, log, 2)
 	RHOST_INTERFACE = RHOST_INTERFACE.strip()
@@ -565,7 +648,7 @@ def MachineInfo(log, ltp_vars):
 	lg(log, '------------------------------------------------------------------------', 0)
 	lg(log, 'LTP VERSION: ', 0)
 	lg(log, '------------------------------------------------------------------------', 0)
-	RunCommand("/opt/ltp/runltp -e", log, 0, 0)
+	RunCommand([os.environ['ltp_path'] + '/runltp', '-e'], log, 0, 0)
 	lg(log, '\n', 0)
 
 	lg(log, '------------------------------------------------------------------------', 0)
@@ -618,26 +701,11 @@ def MachineInfo(log, ltp_vars):
 				line = "%cmd is not found"
 
 
-def PingTest(command, tlog):
-	return int(RunCommand(command, tlog, 0, 1))
-
-
-class RunWithTimeout(object):
-	def __init__(self, function, args):
-		self.function = function
-		self.args = args
-		self.answer = None
-
-	def worker(self):
-		self.answer = self.function(*self.args)
-
-	def run(self, timeout):
-		thread = threading.Thread(target=self.worker)
-		thread.start()
-		thread.join(timeout)
-		return self.answer
+def PingTest(command, tlog, timeout=None):
+	return int(RunCommand(command, tlog, 0, 1, timeout))
 
 
+@Profiled('CheckNw')
 def CheckNw(log, tlog, ltp_vars):
 	ping_target = ''
 	if ('IPV4_RHOST' in os.environ) and os.environ['IPV4_RHOST'] != '':
@@ -648,17 +716,15 @@ def CheckNw(log, tlog, ltp_vars):
 		lg(log, 'Plese define either HTTP_SERVER or RHOST in ./sls_config')
 		return 1
 
-	command = "ping -c 4 -W 30 " + ping_target
-	line = "Starting ping thread for Primary RHOST: %s" % command
+	command = ['ping', '-c', '4', '-W', '30', ping_target]
+	line = "Starting ping for Primary RHOST: %s" % " ".join(command)
 	lg(log, line, 0)
-	th = RunWithTimeout(PingTest, (command, tlog))
-	thread_return = th.run(60)
+	thread_return = PingTest(command, tlog, 60)
 	if thread_return is None or thread_return != 0:
 		time.sleep(20)
 		check_iter = 0
 		while check_iter < 30:
-			th = RunWithTimeout(PingTest, (command, tlog))
-			thread_return = th.run(20)
+			thread_return = PingTest(command, tlog, 20)
 			if thread_return is None or thread_return != 0:
 				line = "[CheckNw] [info] ping to %s Failed, retry:%d" % (ping_target,check_iter)
 				lg(log, line, 0, 1)
@@ -675,18 +741,13 @@ def CheckNw(log, tlog, ltp_vars):
 		return 0
 
 
-def GetFreeCPU(log, tlog):
+@Profiled('GetFreeCPU')
+def GetFreeCPU(log, tlog, snap=None):
 	while True:
-		command = "top -b -n 4 | grep Cpu | tail -n 1 | cut -f 4 -d , | cut -f 1 -d .| sed 's/ //g'"
-		idle_cpu = int(RunCommand(command, tlog, 2, 0))
-		time.sleep(2)
-		idle_cpu += int(RunCommand(command, tlog, 2, 0))
-		time.sleep(2)
-		idle_cpu += int(RunCommand(command, tlog, 2, 0))
-		time.sleep(2)
-		idle_cpu += int(RunCommand(command, tlog, 2, 0))
-		time.sleep(1)
-		idle_cpu /= 4
+		if snap is None:
+			snap = TakeSnapshot()
+		idle_cpu = int(snap.cpu_idle)
+		snap = None
 		cpu_line = "[GetFreeCPU] [info] Avg idle_cpu is %d" % (idle_cpu)
 		lg(log, cpu_line, 0, 1)
 		
@@ -701,16 +762,18 @@ def GetFreeCPU(log, tlog):
 			break
 
 
-def GetFreeMem(log, tlog):
+@Profiled('GetFreeMem')
+def GetFreeMem(log, tlog, snap=None):
 	while True:
-		total_mem = int(RunCommand("free -m | awk '{print $2}' | grep -v [a-z] | head -n 1", tlog, 2, 0))
-		used_mem = int(RunCommand("free -m | awk '{print $3}' | grep -v [a-z] | head -n 1", tlog, 2, 0))
-		free_mem = total_mem - used_mem
-		free_mem_percent = (free_mem * 100) / total_mem
+		if snap is None:
+			snap = TakeSnapshot(0)
+		free_mem = snap.mem_free
+		free_mem_percent = snap.free_mem_percent
+		free_swap = snap.swap_free
+		snap = None
 		line = "[GetFreeMem] [info] Available free memory %s MB" % (free_mem)
 		lg(log, line, 0, 1)
-		free_swap = RunCommand("free -m | awk '{print $4}' | grep -v [a-z] | tail -n 1", tlog, 2, 0)
-		line = "[GetFreeMem] [info] Available swap space %s MB" % (free_swap.strip())
+		line = "[GetFreeMem] [info] Available swap space %s MB" % (free_swap)
 		lg(log, line, 0, 1)
 		
 		if int(free_mem) < 427:
@@ -719,15 +782,18 @@ def GetFreeMem(log, tlog):
 			lg(log, line, 0, 1)
 			time.sleep(rnum)
 		else:
-			line = "[GetFreeMem] [info] Free Memory %s MB" % (free_mem_percent)
+			line = "[GetFreeMem] [info] Free Memory percent %.2f" % (free_mem_percent)
 			lg(log, line, 0, 1)
 			break
 
 
-def GetFsSpace(log, tlog):
+@Profiled('GetFsSpace')
+def GetFsSpace(log, tlog, snap=None):
 	while True:
-		command = "df -hl | grep -w '/$' | awk ' {print $5}' | cut -f 1 -d '%'"
-		root_fs_size = int(RunCommand(command, tlog, 2, 0))
+		if snap is None:
+			snap = TakeSnapshot(0)
+		root_fs_size = snap.root_fs_used
+		snap = None
 		if root_fs_size > 90:
 			wline = "[GetFsSpace] [warn] / is more than 90%%. IO tests using /tmp will fail"
 			lg(log, wline, 0, 1)
@@ -755,79 +821,61 @@ def SetMinFree(log):
 def CreateFS(DISKS, FSTYPES, log):
 	#Check Disks
 	IODISKS = DISKS.split(',')
-	IODISKS = [x for x in IODISKS if x]
+	IODISKS = [x.strip() for x in IODISKS if x.strip()]
 	if len(IODISKS) == 0:
 		lg(log, 'No disks mentioned in sls_config')	
 		return 2
+	#One pass over /sys/block and /dev/mapper instead of ls /dev|grep per disk
+	devices = BlockDevices()
 	DISKS = []
 	for D in IODISKS:
-		command = "ls /dev/|grep -w %s" % D
-		if int(RunCommand(command, log, 0, 0)) == 0:
-			DISKS.append('/dev/%s' % D)
-		else:
-			command = "ls /dev/mapper/|grep -w %s" % D
-			if int(RunCommand(command, log, 0, 0)) == 0:
-				DISKS.append('/dev/mapper/%s' % D)
-			else:
-				lg(log, "Disk: %s not found" % D)
-				return 1
-
-		#Check if already mounted
-		command = "mount |grep -w %s" % D
-		if int(RunCommand(command, log, 0, 0)) == 0:
-			lg(log,'Looks like %s is already in use, please check : %s' % (D,command)) 	
+		if D not in devices:
+			lg(log, "Disk: %s not found" % D)
 			return 1
+		DISKS.append(devices[D])
+
+	#Check if already mounted
+	for D in DisksInUse(IODISKS):
+		lg(log,'Looks like %s is already in use, please check : mount |grep %s' % (D,D)) 	
+		return 1
 
-		command = "mount |grep -e '%s_' -e '%s-'" % (D,D)
-		if int(RunCommand(command, log, 0, 0)) == 0:
-			lg(log,'Looks like %s is already in use, please check : %s' % (D,command)) 	
-			return 1
 	#Remove old io directories
-	command = "ls -d /tmp/ltp_io|tr '\n' ' '"
-	io_dirs = RunCommand(command, log, 2, 0)
-	iodirs = io_dirs.split(' ')
-	for d in iodirs:
-		command = "rm -rf %s" % d
-		RunCommand(command, log, 0, 0)
-
-	#decide on FS or LVM
+	if os.path.isdir('/tmp/ltp_io') and not os.path.ismount('/tmp/ltp_io'):
+		RunCommand(['rm', '-rf', '/tmp/ltp_io'], log, 0, 0)
+
+	#decide on FS or LVM, each tool is looked up once
 	FS_AVAILABLE = []
 	lvm = 0;
-	if FSTYPES.strip() != '' and len(FSTYPES.split(',')) != 0:
-		FS_TYPES = FSTYPES.split(',')
+	DEFAULT_FS = ['xfs', 'btrfs', 'ext3', 'ext4', 'ext2']
+	FS_TYPES = [T.strip() for T in FSTYPES.split(',') if T.strip()]
+	tools = FindTools(['vgcreate'] + ['mkfs.%s' % T for T in FS_TYPES + DEFAULT_FS if T.lower() != 'lvm'])
+	if len(FS_TYPES) != 0:
 		for T in FS_TYPES:
-			T = T.strip()
 			if T == 'lvm' or T == 'LVM':
 				lvm = 1
-				command = "which vgcreate"
-				if int(RunCommand(command, log, 0, 0))  != 0:
+				if tools['vgcreate'] is None:
 					lg(log, 'vgcreate command not found')
 					return 1
 				continue
-			command = "which mkfs.%s" % T
-			if int(RunCommand(command, log, 0, 0)) == 0:
+			if tools['mkfs.%s' % T] is not None:
 				FS_AVAILABLE.append(T)
 			else:
 				lg(log, 'mkfs.%s command not found' % T)
 				return 1
 	else:
-		FS_TYPES = ['xfs', 'btrfs', 'ext3', 'ext4', 'ext2']
-		for FS in FS_TYPES:
-			command = "which mkfs.%s" % FS
-			if int(RunCommand(command, log, 0, 0)) == 0:
-				FS_AVAILABLE.append(FS)
+		FS_TYPES = DEFAULT_FS
+		FS_AVAILABLE = [FS for FS in DEFAULT_FS if tools['mkfs.%s' % FS] is not None]
 	if len(FS_AVAILABLE) == 0:
 		if lvm == 0:
 			lg(log, 'None of mkfs command available for FS TYPES: %s' % ' '.join(FS_TYPES))
 			return 1	
-		FS_TYPES = ['xfs', 'btrfs', 'ext3', 'ext4', 'ext2']
-		for FS in FS_TYPES:
-			command = "which mkfs.%s" % FS
-			if int(RunCommand(command, log, 0, 0)) == 0:
-				FS_AVAILABLE.append(FS)		
+		FS_TYPES = DEFAULT_FS
+		FS_AVAILABLE = [FS for FS in DEFAULT_FS if tools['mkfs.%s' % FS] is not None]
 		if len(FS_AVAILABLE) == 0:
 			lg(log, 'None of mkfs command available for FS TYPES: %s' % ' '.join(FS_TYPES))
 			return 1
+	#mkfs output of each disk goes to its own file next to log
+	logdir = os.path.dirname(os.path.abspath(log))
 	#Create LVM if required
 	if lvm == 1:
 		command = 'vgs 2>/dev/null|grep -w ltp_io'
@@ -846,66 +894,45 @@ def CreateFS(DISKS, FSTYPES, log):
 		lg(log, command)
 		if int(RunCommand(command, log, 0, 1)) != 0:
 			lg(log, 'LV creation failed')
+			RollbackLVM(DISKS, log)
 			return 1
 
-		if len(FS_AVAILABLE) == 1:
-			FSINDEX = 0
-		else:
-			FSINDEX = GetRandom(len(FS_AVAILABLE)-1, 0)
-		FS = FS_AVAILABLE[FSINDEX]
+		FS = random.choice(FS_AVAILABLE)
 		lg(log, 'Creating FS : %s on LV:ltp_io' % FS)
-		if FS in ['ext2', 'ext3', 'ext4']:
-			force_option = '-F'
-		else:
-			force_option = '-f'
-		command = 'mkfs.%s %s /dev/mapper/ltp_io-ltp_io' % (FS, force_option)
-		lg(log, command)
-		if int(RunCommand(command, log, 0, 1)) != 0:
-			lg(log, '%s : Failed' % command)
-			return 1
-		command = 'mkdir -p /tmp/ltp_io0'
-		RunCommand(command, log, 1, 1)
-		lg(log, 'Mounting LV:/dev/mapper/ltp_io-ltp_io to /tmp/ltp_io0')
-		command = 'mount /dev/mapper/ltp_io-ltp_io /tmp/ltp_io0'
-		lg(log,command)
-		if int(RunCommand(command, log, 0, 1)) != 0:
-			lg(log, '%s : Failed' % command)
-			return 1
+		jobs = [DiskJob('/dev/mapper/ltp_io-ltp_io', FS, '/tmp/ltp_io0', tools['mkfs.%s' % FS], '%s/mkfs_ltp_io.out' % logdir)]
 	else:
-		dnum = 0
-		for D in DISKS:
-			if len(FS_AVAILABLE) == 1:
-				FSINDEX = 0
-			else:
-				FSINDEX = GetRandom(len(FS_AVAILABLE)-1, 0)
-			FS = FS_AVAILABLE[FSINDEX]
+		jobs = []
+		for dnum, D in enumerate(DISKS):
+			FS = random.choice(FS_AVAILABLE)
+			jobs.append(DiskJob(D, FS, '/tmp/ltp_io%d' % dnum, tools['mkfs.%s' % FS], '%s/mkfs_%s.out' % (logdir, os.path.basename(D))))
 			lg(log,'Creating FS:%s on Disk:%s' % (FS,D))
-			if FS in ['ext2', 'ext3', 'ext4']:
-				force_option = '-F'
-			else:
-				force_option = '-f'
-			command = 'mkfs.%s %s %s' % (FS, force_option, D)
-			lg(log,command)
-			if int(RunCommand(command, log, 0, 1)) != 0:
-				chkcommand = "blkid %s|grep -w 'TYPE='|wc -l" % D
-				if int(RunCommand(chkcommand, log, 2, 1)) == 0:
-					lg(log, '%s : Failed' % command)
-					return 1	
-				else:
-					lg(log, 'FS exists on %s, so proceeding' % D)
-			command = 'mkdir -p /tmp/ltp_io%d' % dnum
-			RunCommand(command, log, 1, 1)
-			lg(log, 'Mounting Disk:%s to /tmp/ltp_io%d' % (D,dnum))
-			command = 'mount %s /tmp/ltp_io%d' % (D,dnum)
-			lg(log,command)
-			if int(RunCommand(command, log, 0, 1)) != 0:
-				lg(log, '%s : Failed' % command)
-				return 1
-			dnum += 1
-			
+
+	#mkfs and mount of all disks run in parallel, outcome of each disk is logged as it completes
+	def report(job):
+		if job.output != '':
+			lg(log, job.output, 0)
+		if job.message != '':
+			lg(log, job.message)
+		lg(log, 'Disk:%s FS:%s Mount:%s : %s (%.1fs)' % (job.disk, job.fs, job.mountpoint, job.status, job.duration))
+
+	ret, busy = PrepareDisks(jobs, FS_WORKERS, report)
+	if ret != 0:
+		lg(log, 'Preparing IO disks failed, unmounted all prepared disks')
+		for mp in busy:
+			lg(log, 'Failed to unmount %s, please unmount it manually' % mp)
+		if lvm == 1:
+			RollbackLVM(DISKS, log)
+		return 1
 	return 0 
 
 
+def RollbackLVM(DISKS, log):
+	lg(log, 'Removing VG: ltp_io')
+	RunCommand(['lvremove', '-f', 'ltp_io'], log, 0, 1)
+	RunCommand(['vgremove', '-f', 'ltp_io'], log, 0, 1)
+	RunCommand(['pvremove', '-f'] + DISKS, log, 0, 1)
+
+
 def CreatePMEMFS(log):
 	command = 'which ndctl'
 	if int(RunCommand(command, log, 0, 0)) != 0:
@@ -979,83 +1006,6 @@ def CreatePMEMFS(log):
 	return 0
 
 
-def OOMKill(log, slog):
-	while True:
-		#If free memory is low, kill processes
-		command = "free -m | awk '{print $2}' | grep -v [a-z] | head -n 1"
-		total_mem = int(RunCommand(command, log, 2, 0))
-		command = "free -m | awk '{print $3}' | grep -v [a-z] | head -n 1"
-		used_mem = int(RunCommand(command, log, 2, 0))
-		free_mem = total_mem - used_mem
-		free_mem_percent = (free_mem*100)/total_mem
-		if free_mem_percent <= 10:
-			line = "Free Memory is %d%%" % free_mem_percent
-			lg(slog, line, 0)
-			command = "ps -eaf|grep memcg|grep -v grep|awk '{print $2}'|tr '\n' '^'"
-			output = RunCommand(command, log, 2, 0)
-			pids = output.split('^')
-			pids = [i for i in pids if i]
-			for pid in pids:
-				if pid == '' or pid == ' ':
-					continue
-				line = "Calling kill -9 %s" % pid
-				lg(slog, line, 0)
-				command = "kill -9 %s" % (pid)
-				RunCommand(command, log, 0)	
-
-			command = "ps -eo pid,ppid,cmd,%mem,%cpu --sort=-%mem | head|awk -F' ' '{print $1\":\"$2\" \"$3}'|tr '/' ' '|awk -F' ' '{print $1\" \"$NF}'|tr ':' ' ' | awk '{ print $3}' |grep -v CMD|tr '\n' '^'"
-			output = RunCommand(command, log, 2, 0)
-			ship = output.split('^')	
-			ship = [i for i in ship if i]
-			for boat in ship:
-				boat = boat.replace('[','').replace(']','')
-				if boat == 'sh':
-					continue
-				command = "grep -w %s /opt/ltp/runtest/*|grep -v 'grep'|wc -l" % boat
-				if int(RunCommand(command, log, 2, 0)) != 0:
-					line = "Calling killall -I %s" % boat
-					lg(slog, line, 0)
-					command = "killall  -I %s" % boat
-					RunCommand(command, log, 0)
-					line = "Calling pkill %s" % boat
-					lg(slog, line, 0)
-					command = "pkill %s" % boat
-					RunCommand(command, log, 0)
-					lg(slog, "Free Mem < 10%%. Killed %s process!!" % boat, 0)
-				
-				command = "echo %s | grep -i memcg*|grep -v 'grep'|wc -l" % boat
-				if int(RunCommand(command, log, 2, 0)) != 0:
-					line = "Calling killall -I %s" % boat
-					lg(slog, line, 0)
-					command = "killall  -I %s" % boat
-					RunCommand(command, log, 0)
-					line = "Calling pkill %s" % boat
-					lg(slog, line, 0)
-					command = "pkill %s" % boat
-					RunCommand(command, log, 0)
-			
-
-
-		#To remove any local ltp interface getting created. This may impact lab network
-		command = "ip a | grep -i -e dummy -e ltp|wc -l"
-		if int(RunCommand(command, log, 2, 0)) != 0:
-			command = "ls /sys/class/net/|grep ltp|tr '\n' '^'"
-			output = RunCommand(command, log, 2, 0)
-			ltp_interfaces = output.split('^')
-			ltp_interfaces = [i for i in ltp_interfaces if i]
-			for i in ltp_interfaces:
-				line = "Deleting unwanted interface %s" % i
-				lg(slog, line, 0)
-				command = "ip link delete %s" % i
-				RunCommand(command, log, 0)
-			
-		time.sleep(2)
-	
-		command = 'ps -eaf|grep go_sls|grep -v grep|wc -l'
-		if int(RunCommand(command, log, 2, 0)) <= 1:
-			lg(slog, "Looks like go_sls is completed, OOMKiller is exiting")
-
-
 def ParseScenFile(log, sfile):
 	with open(sfile) as fp:
 		lines = fp.readlines()
@@ -1104,45 +1054,31 @@ def ParseScenFile(log, sfile):
 	return 0
 
 
-def GetSuiteIterations(tlog, test, ltp_vars):
+@Profiled('GetSuiteIterations')
+def GetSuiteIterations(tlog, test, ltp_vars, catalog=None):
 	suite = ''; 
 	iterations = 0
 
+	#Suite lookup is a dictionary access on the test catalog built at start
+	if catalog is None:
+		catalog = LoadCatalog(ltp_vars.get('SLS_DIR', '/var/log/sls/'))
+
 	#get Test suite
-	command = "ls /opt/ltp/testcases/bin/%s | wc -l" % (test)	
-	if int(RunCommand(command, tlog, 0, 0)) != 0:
-		line = "Test_%s_ not_found_under_/opt/ltp/testcases/bin/" % test
+	if not catalog.HasTest(test):
+		line = "Test_%s_ not_found_under_%s/testcases/bin/" % (test, catalog.signature['LTP_PATH'])
 		return [line, iterations]
 
-	runtest = '/opt/ltp/runtest/'
-	command = "grep -w %s %s/* |wc -l" % (test, runtest)
-	suite_c = int(RunCommand(command, tlog, 2, 0).strip())
-	if suite_c == 0:
+	suites = catalog.Suites(test)
+	if len(suites) == 0:
 		line  = "Test_suite_for_test_:%s_not_found" % test
 		return [ line, iterations]
-	elif suite_c > 1:
-		command = "grep -w %s %s/* | cut -f 1 -d : |sort -u|tr '\n' '^'" % (test, runtest)
-		output = RunCommand(command, tlog, 2, 0)
-		suite_m = output.split('^')
-		suite_len = len(suite_m)
-		rnum = GetRandom(suite_len) - 1
-		if rnum < 0:
-			rnum = 0
-		suite = suite_m[rnum]
+	elif len(suites) > 1:
+		suite = random.choice(suites)
 	else:
-		command = "grep -w %s %s/* | cut -f 1 -d :" % (test, runtest)
-		suite = RunCommand(command, tlog, 2, 0)
-
-	suite = suite.replace(runtest,'').strip().replace('/','')
+		suite = suites[0]
 
 	#get Iterations
-	RIT = os.environ['RIT'].strip()
-	R = RIT.split('|')
-	R = list(dict.fromkeys(R))
-	R = [i for i in R if i]
-	RIT_PATTERN = " -e ".join(R)
-	command = "echo %s|grep -i -e %s|grep -v grep|wc -l" % (test,RIT_PATTERN)
-	if int(RunCommand(command, tlog, 2, 0)) != 0:
+	if catalog.IsRIT(test):
 		if 'ITERATIONS' in ltp_vars and ltp_vars['ITERATIONS'] != '':
 			iterations = int(ltp_vars['ITERATIONS'])
 			if iterations > 4:
@@ -1163,7 +1099,13 @@ def GetSuiteIterations(tlog, test, ltp_vars):
 	return [suite, iterations]
 
 
-def cleanup(log, slog):
+def cleanup(log, slog, registry=None, blocking=True):
+	#blocking=False from signal handlers, see TestRegistry.Flush
+	#Tests started by go_sls.py run in their own process groups
+	if registry is not None:
+		lg(log, "Trying to kill %d running ltp tests..." % registry.Count())
+		registry.KillAll(signal.SIGKILL)
+
 	i = 0
 	while i < 2:
 		command = "ps -eaf|grep -e run_test -e runltp -e ltp-pan -e growfiles|grep -v grep |grep -v stop_sls|awk '{print $2}'|tr '\n' '^'"
@@ -1180,22 +1122,28 @@ def cleanup(log, slog):
 		time.sleep(10)
 		i += 1
 
+	#Threads of killed tests have unregistered them by now, IN-PROGRESS-TEST gets the final state
+	if registry is not None:
+		try:
+			if registry.Flush(blocking) == 0:
+				lg(log, 'IN-PROGRESS-TEST is being written, not updated')
+		except (IOError, OSError):
+			lg(log, 'Failed to update IN-PROGRESS-TEST')
+
 	#Unmount IO filesystems if any
 	lg(log, 'Trying to umount sls related filesystems, if any...')
-	command = "mount |grep -e '/tmp/ltp-' -e '/tmp/ltp_'|awk '{print $3}'|tr '\n' '^'"
-	mntpoints = RunCommand(command, slog, 2, 0).strip().split('^')
-	mntpoints = [x for x in mntpoints if x]
+	mntpoints = MountPoints(['/tmp/ltp-', '/tmp/ltp_'])
 	for mp in mntpoints:
 		lg(slog, 'Unmounting : %s' % mp)
-		command = 'umount %s' % mp
-		lg(slog,command)
-		if int(RunCommand(command, slog, 0, 0)) != 0:
-			command = 'umount -f %s' % mp
-			lg(slog,command)
-			if int(RunCommand(command, slog, 0, 0)) != 0:
-				command = 'umount -l %s' % mp
-				lg(slog,command)
-				if int(RunCommand(command, slog, 0, 0)) != 0:
+		command = ['umount', mp]
+		lg(slog,' '.join(command))
+		if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
+			command = ['umount', '-f', mp]
+			lg(slog,' '.join(command))
+			if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
+				command = ['umount', '-l', mp]
+				lg(slog,' '.join(command))
+				if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
 					lg(slog,'Failed to umount : %s, please umount manually' % mp)
 	
 	
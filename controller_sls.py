@@ -0,0 +1,103 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Closed loop controller of go_sls.py, holds the machine at TARGET_CPU_UTIL and TARGET_MEM_UTIL of sls_config.
+#           1. Utilization : CPU and memory used percent of a sampler_sls.py Snapshot
+#           2. UtilController : PID loop on the distance to target, gives tests to run together between
+#                               MIN_TEST_PER_SCENARIO and MAX_TEST_PER_SCENARIO and a scale for iterations
+#
+#  SETUP:   1. TARGET_CPU_UTIL and/or TARGET_MEM_UTIL in sls_config, empty keeps the fixed resource gates
+#           2. Start SLS : ./start_sls.py <options>, go_sls.py updates the controller from each Snapshot
+#
+
+import time
+
+#Gains on the error in fraction of 100%, output is fraction of MIN to MAX tests
+CONTROL_KP = 0.3
+CONTROL_KI = 0.01
+CONTROL_KD = 0.5
+#Seconds between two controller updates, snapshots taken in between are not used
+CONTROL_PERIOD = 10
+#Weight of the latest period in the filtered error the derivative is taken on
+CONTROL_FILTER = 0.5
+#Iterations shrink to this fraction when load is far above target, so the overload drains sooner
+MIN_ITERATION_SCALE = 0.1
+
+
+def Utilization(snap):
+	return (100.0 - snap.cpu_idle, 100.0 - snap.free_mem_percent)
+
+
+class UtilController(object):
+	def __init__(self, target_cpu=None, target_mem=None, min_tests=1, max_tests=5,
+			kp=CONTROL_KP, ki=CONTROL_KI, kd=CONTROL_KD, period=CONTROL_PERIOD):
+		self.target_cpu = target_cpu
+		self.target_mem = target_mem
+		self.min_tests = min_tests
+		self.max_tests = max_tests
+		self.kp = kp
+		self.ki = ki
+		self.kd = kd
+		self.period = period
+		self.integral = 0.0
+		self.error = None
+		self.filtered = None
+		self.last = None
+		self.output = 0.0
+		self.tests = min_tests
+
+	def Error(self, snap):
+		#Resource closest to or over its target decides, positive means room for more load
+		cpu_util, mem_util = Utilization(snap)
+		errors = []
+		if self.target_cpu is not None:
+			errors.append((self.target_cpu - cpu_util) / 100.0)
+		if self.target_mem is not None:
+			errors.append((self.target_mem - mem_util) / 100.0)
+		if len(errors) == 0:
+			return 0.0
+		return min(errors)
+
+	def Update(self, snap, now=None):
+		#Returns tests to run together. Output changes once per period, whatever the rate tests complete at,
+		#so the operating point does not depend on how often the scheduler wakes up
+		if now is None:
+			now = time.time()
+		if self.last is not None and now - self.last < self.period:
+			return self.tests
+		error = self.Error(snap)
+		dt = now - self.last if self.last is not None else 0
+		#Derivative of a low pass filtered error, a single noisy sample should not move the output
+		filtered = error if self.filtered is None else self.filtered + CONTROL_FILTER * (error - self.filtered)
+		derivative = (filtered - self.filtered) / dt if dt > 0 else 0.0
+		#Anti windup, integral term alone stays within the output range
+		self.integral = max(0.0, min(1.0 / self.ki, self.integral + filtered * dt))
+		self.output = max(0.0, min(1.0, self.kp * filtered + self.ki * self.integral + self.kd * derivative))
+		self.error = error
+		self.filtered = filtered
+		self.last = now
+		self.tests = self.min_tests + int(round((self.max_tests - self.min_tests) * self.output))
+		return self.tests
+
+	def FreeSlots(self, snap, running):
+		return max(self.Update(snap) - running, 0)
+
+	def IterationScale(self):
+		if self.filtered is None or self.filtered >= 0:
+			return 1.0
+		return max(MIN_ITERATION_SCALE, 1.0 + 2 * self.filtered)
+
+	def Iterations(self, iterations):
+		return max(1, int(round(iterations * self.IterationScale())))
+
+	def Describe(self):
+		return "error %.1f%% output %.2f tests %d iteration scale %.2f" % (100 * (self.error or 0), self.output, self.tests, self.IterationScale())
@@ -0,0 +1,178 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Cost profiles of tests learnt from past runs, used by go_sls.py to pack scenarios against headroom.
+#           1. CostProfiles : Duration per iteration, peak memory and CPUs used of each test, suite and kernel,
+#                             persisted under SLS_DIR and updated as each test completes
+#           2. Estimate : Cost of a test, median of known tests if the test never ran on this kernel
+#           3. Headroom : Free CPUs and memory above the CPU gate and the 10% free memory OOM path, or below TARGET_*_UTIL
+#           4. Pack : Admits picked tests largest first while they fit in headroom, first fit decreasing
+#
+#  SETUP:   1. Start SLS : ./start_sls.py <options>, CGROUP of sls_config gives peak memory and CPU time of tests
+#           2. go_sls.py updates profiles in call_ltp and packs each scenario or free slots with them
+#
+
+import os
+import json
+import time
+import threading
+
+COST_VERSION = 1
+COST_FILE = 'cache/test_cost.json'
+#Weight of the latest run in the moving average of a test
+COST_ALPHA = 0.3
+#Seconds between two writes of the profile file
+COST_SAVE = 60
+#Tests started within these seconds may not have reached their peak, their estimate is held back
+COST_RAMP = 30
+#Headroom is what is left above 27% idle CPU and 15% free memory, 5% above the OOM watchdog
+COST_IDLE_CPU = 27
+COST_FREE_MEM_PERCENT = 15
+#Tests picked per free place, so Pack has a choice
+COST_CHOICE = 2
+#Cost of a test when no test has a profile yet
+DEFAULT_MEM_MB = 64
+DEFAULT_CPUS = 0.5
+
+
+class CostProfiles(object):
+	def __init__(self, sls_logdir, kernel=None):
+		self.path = '%s/%s' % (sls_logdir, COST_FILE)
+		self.kernel = kernel if kernel is not None else os.uname()[2]
+		self.lock = threading.Lock()
+		self.profiles = {}
+		self.saved = time.time()
+		self.dirty = False
+		self.default = None
+
+	def Key(self, test, suite):
+		return '%s|%s|%s' % (test, suite, self.kernel)
+
+	def Load(self):
+		try:
+			with open(self.path, 'r') as fp:
+				data = json.load(fp)
+			if data['VERSION'] == COST_VERSION:
+				self.profiles = data['PROFILES']
+		except (ValueError, KeyError, IOError, OSError):
+			self.profiles = {}
+		return len(self.profiles)
+
+	def Save(self):
+		with self.lock:
+			if not self.dirty:
+				return
+			data = json.dumps({'VERSION': COST_VERSION, 'PROFILES': self.profiles})
+			self.dirty = False
+			self.saved = time.time()
+		cdir = os.path.dirname(self.path)
+		if not os.path.exists(cdir):
+			os.makedirs(cdir)
+		tmpfile = '%s.%d' % (self.path, os.getpid())
+		with open(tmpfile, 'w') as fp:
+			fp.write(data)
+		os.rename(tmpfile, self.path)
+
+	def Update(self, run, result):
+		#result is the record of FinishTest, CGROUP has peak memory and CPU time if test ran in a cgroup
+		if run.end is None:
+			return
+		secs = (run.end - run.start).total_seconds()
+		if secs <= 0:
+			return
+		iterations = max(int(result.get('ITERATIONS', 1)), 1)
+		sample = {'SECS_PER_ITER': secs / iterations}
+		cgroup = result.get('CGROUP', {})
+		if 'MEMORY_PEAK' in cgroup:
+			sample['PEAK_MB'] = cgroup['MEMORY_PEAK'] / (1024.0 * 1024)
+		if 'usage_usec' in cgroup.get('CPU_STAT', {}):
+			sample['CPUS'] = cgroup['CPU_STAT']['usage_usec'] / (secs * 1000000.0)
+
+		key = self.Key(run.test, run.suite)
+		with self.lock:
+			profile = self.profiles.setdefault(key, {'RUNS': 0})
+			for k, v in sample.items():
+				if k not in profile:
+					profile[k] = v
+				elif k == 'PEAK_MB':
+					#Peak memory decays slowly, so one small run does not hide a big one
+					profile[k] = max(v, profile[k] * (1 - COST_ALPHA / 3))
+				else:
+					profile[k] = COST_ALPHA * v + (1 - COST_ALPHA) * profile[k]
+			profile['RUNS'] += 1
+			self.dirty = True
+			self.default = None
+			save = time.time() - self.saved >= COST_SAVE
+		if save:
+			try:
+				self.Save()
+			except (IOError, OSError):
+				pass
+
+	def Default(self):
+		#Median cost of tests known on this kernel
+		if self.default is None:
+			suffix = '|' + self.kernel
+			known = [v for k, v in self.profiles.items() if k.endswith(suffix)]
+			mems = sorted(v['PEAK_MB'] for v in known if 'PEAK_MB' in v)
+			cpus = sorted(v['CPUS'] for v in known if 'CPUS' in v)
+			self.default = (mems[len(mems) // 2] if len(mems) != 0 else DEFAULT_MEM_MB,
+				cpus[len(cpus) // 2] if len(cpus) != 0 else DEFAULT_CPUS)
+		return self.default
+
+	def Estimate(self, test, suite):
+		#Returns (peak memory MB, CPUs used)
+		with self.lock:
+			default = self.Default()
+			profile = self.profiles.get(self.Key(test, suite), {})
+			return (profile.get('PEAK_MB', default[0]), profile.get('CPUS', default[1]))
+
+	def Duration(self, test, suite, iterations):
+		with self.lock:
+			profile = self.profiles.get(self.Key(test, suite), {})
+		if 'SECS_PER_ITER' not in profile:
+			return None
+		return profile['SECS_PER_ITER'] * iterations
+
+	def Headroom(self, snap, runs=None, target_cpu=None, target_mem=None):
+		#Recently started runs are charged their estimate, their use is not in snap yet
+		ncpu = os.cpu_count() or 1
+		free_mem_percent = COST_FREE_MEM_PERCENT if target_mem is None else 100 - target_mem
+		idle_cpu = COST_IDLE_CPU if target_cpu is None else 100 - target_cpu
+		mem = snap.mem_free - snap.mem_total * free_mem_percent / 100.0
+		cpus = ncpu * (snap.cpu_idle - idle_cpu) / 100.0
+		now = time.time()
+		for run in runs or []:
+			if now - time.mktime(run.start.timetuple()) < COST_RAMP:
+				cost = self.Estimate(run.test, run.suite)
+				mem -= cost[0]
+				cpus -= cost[1]
+		return (mem, cpus)
+
+	def Pack(self, candidates, count, headroom, fixed=None):
+		#candidates and fixed are [(entry, test, suite)], fixed ones are always kept and charged first
+		mem, cpus = headroom
+		for entry, test, suite in fixed or []:
+			cost = self.Estimate(test, suite)
+			mem -= cost[0]
+			cpus -= cost[1]
+		costs = dict((c[0], self.Estimate(c[1], c[2])) for c in candidates)
+		admitted = []
+		for entry in sorted(costs, key=lambda x: costs[x], reverse=True):
+			if len(admitted) >= count:
+				break
+			if costs[entry][0] <= mem and costs[entry][1] <= cpus:
+				admitted.append(entry)
+				mem -= costs[entry][0]
+				cpus -= costs[entry][1]
+		#Keep the picked order, it is the order logged in SCENARIO_LIST
+		return [c[0] for c in candidates if c[0] in admitted]
@@ -0,0 +1,174 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Disk discovery and parallel filesystem preparation of IO_DISKS, used by CreateFS of common_sls.py
+#           1. BlockDevices : Block devices and device mapper names from /sys/block, /sys/class/block and /dev/mapper in one pass
+#           2. FindTools : Path of each needed mkfs/lvm tool, looked up once
+#           3. DisksInUse : Disks which are already mounted, from one read of /proc/mounts
+#           4. DiskJob : mkfs and mount of one disk, with its outcome
+#           5. PrepareDisks : Runs DiskJobs in a bounded worker pool, rolls back all mounts if any disk fails
+#           6. Rollback : Unmounts and removes mount points of prepared disks
+#
+#  SETUP:   1. IO_DISKS and IO_FS in sls_config
+#           2. ./start_sls.py -i calls CreateFS, which uses functions of disks_sls.py
+#
+
+import os
+import re
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from command_sls import Execute, UMOUNT_TIMEOUT
+from profile_sls import Record
+
+#Disks formatted at once, mkfs of large LUNs is mostly waiting on the storage
+FS_WORKERS = 8
+#mkfs of a large disk can take long, but not forever
+MKFS_TIMEOUT = 3600
+
+
+def BlockDevices():
+	devices = {}
+	for sysdir in ['/sys/block', '/sys/class/block']:
+		try:
+			names = os.listdir(sysdir)
+		except OSError:
+			continue
+		for name in names:
+			devices.setdefault(name, '/dev/%s' % name)
+			#dm-N carries the /dev/mapper name of multipath and LVM devices
+			try:
+				with open('%s/%s/dm/name' % (sysdir, name), 'r') as fp:
+					dmname = fp.read().strip()
+			except (IOError, OSError):
+				continue
+			if dmname != '':
+				devices[dmname] = '/dev/mapper/%s' % dmname
+	try:
+		for name in os.listdir('/dev/mapper'):
+			devices.setdefault(name, '/dev/mapper/%s' % name)
+	except OSError:
+		pass
+	return devices
+
+
+def FindTools(tools):
+	paths = {}
+	for tool in tools:
+		if tool not in paths:
+			paths[tool] = shutil.which(tool)
+	return paths
+
+
+def DisksInUse(disks):
+	#Same as mount|grep -w <disk> and mount|grep -e <disk>_ -e <disk>-
+	with open('/proc/mounts', 'r') as fp:
+		mounts = fp.read()
+	used = []
+	for D in disks:
+		if re.search(r'(?<![\w])%s(?![\w])' % re.escape(D), mounts) or ('%s_' % D) in mounts or ('%s-' % D) in mounts:
+			used.append(D)
+	return used
+
+
+class DiskJob(object):
+	def __init__(self, disk, fs, mountpoint, mkfs, stream=None):
+		self.disk = disk
+		self.fs = fs
+		self.mountpoint = mountpoint
+		self.mkfs = mkfs
+		#File mkfs output is streamed to, None keeps it in output
+		self.stream = stream
+		self.status = 'PENDING'
+		self.message = ''
+		self.output = ''
+		self.mounted = False
+		self.created = False
+		self.duration = 0
+
+	def MkfsCommand(self):
+		force_option = '-F' if self.fs in ['ext2', 'ext3', 'ext4'] else '-f'
+		return [self.mkfs, force_option, self.disk]
+
+	def Run(self):
+		start = time.time()
+		try:
+			self._run()
+		except (IOError, OSError) as e:
+			self.status = 'FAIL'
+			self.message = '%s : %s' % (self.disk, str(e))
+		finally:
+			self.duration = time.time() - start
+			Record('CreateFS disk', self.duration)
+		return self
+
+	def _run(self):
+		result = Execute(self.MkfsCommand(), MKFS_TIMEOUT, self.stream)
+		if self.stream is None:
+			self.output = result.output
+		else:
+			self.output = 'mkfs output : %s' % self.stream
+		if result.rc != 0:
+			#mkfs refuses some disks that already carry a filesystem, such a disk is used as is
+			blkid = Execute(['blkid', self.disk])
+			if 'TYPE=' not in blkid.output:
+				self.status = 'FAIL'
+				self.message = '%s : Failed' % ' '.join(self.MkfsCommand())
+				return
+			self.message = 'FS exists on %s, so proceeding' % self.disk
+		if not os.path.isdir(self.mountpoint):
+			os.makedirs(self.mountpoint)
+			self.created = True
+		result = Execute(['mount', self.disk, self.mountpoint], UMOUNT_TIMEOUT)
+		if result.rc != 0:
+			self.status = 'FAIL'
+			self.message = 'mount %s %s : Failed %s' % (self.disk, self.mountpoint, result.output.strip())
+			return
+		self.mounted = True
+		self.status = 'PASS'
+
+
+def Rollback(jobs):
+	failed = []
+	for job in jobs:
+		if job.mounted:
+			result = Execute(['umount', job.mountpoint], UMOUNT_TIMEOUT)
+			if result.rc != 0:
+				failed.append(job.mountpoint)
+				continue
+			job.mounted = False
+		if job.created:
+			try:
+				os.rmdir(job.mountpoint)
+				job.created = False
+			except OSError:
+				pass
+	return failed
+
+
+def PrepareDisks(jobs, workers=FS_WORKERS, report=None):
+	#All or nothing, a failed disk unmounts every disk this call has mounted
+	lock = threading.Lock()
+
+	def run(job):
+		job.Run()
+		if report is not None:
+			with lock:
+				report(job)
+		return job
+
+	with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+		list(pool.map(run, jobs))
+	if all(job.status == 'PASS' for job in jobs):
+		return 0, []
+	return 1, Rollback(jobs)
@@ -13,13 +13,14 @@
 #  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
 #  PURPOSE: This script get called internally from start_sls.py
 #           1. Parses the arguments.
-#           2. Spawns a process to kill SLS processes if there is OOM
+#           2. Starts a watchdog thread to kill SLS tests if there is OOM
 #           3. If start_sls.py is called with -r:
 #              3.1 Parse scenario file given as input
 #              3.2 Calls execute scenario for each line in scenario file
 #           4. If start_sls.py is called to execute one more focus area:
 #              4.1 Creates list of tests to execute
-#              4.2 Creates a scenario with subset of tests to execute continously until TEST_HOURS reached
+#              4.2 Scheduler of scheduler_sls.py creates a scenario with subset of tests to execute continously
+#                  until TEST_HOURS reached, SCHEDULER=SLOT starts a test as soon as one completes instead
 #              4.3 Calls execute scenario to execute a scenario
 #              4.4 Waits for scenario to complete, if required.
 #              4.5 Once TST_HOURS completes, concludes testing by updating REPORT.json
@@ -35,14 +36,24 @@ import sys
 import re
 import argparse
 import datetime
-import multiprocessing
 import subprocess
-import threading
-import fcntl
 import time
 import json
 import signal
+import random
 from common_sls import *
+from catalog_sls import LoadCatalog, ListTests
+from sampler_sls import TakeSnapshot
+from results_sls import ResultAggregator, RESULT_SOCKET, RESULT_JOURNAL, WriteReport
+from runner_sls import TestRegistry, STATUS_SOCKET
+from iotarget_sls import IOAllocator
+from cgroup_sls import CgroupManager, ParseLimits, CGROUP_CLASSES
+from cost_sls import CostProfiles
+from controller_sls import UtilController
+from scheduler_sls import Scheduler
+from ltpmeta_sls import LoadMetadata, KernelVersion
+from oomwatch_sls import OOMWatchdog
+from profile_sls import StartProfile, WriteProfile, PROFILE_FILE
 
 def usage():
 	print("\n--------------------------------------------------------------")
@@ -69,62 +80,48 @@ def signal_handler(signum, frame):
     tlog = "%s/go_sls.log" % sls_logdir
     log = os.environ['TC_OUTPUT'] + '/START.LTP_log'
     MASTER_FILE = os.environ['TC_OUTPUT'] + '/REPORT.json'  
-    with open(MASTER_FILE, 'r') as g:
-        REPORT = json.load(g)
-    g.close()
-    REPORT['RESULTS']['STATUS'] = 'ABORTED: STOPPED_BY_OS'
-    with open(MASTER_FILE, 'w') as g:
-        json.dump(REPORT, g)
-    g.close()
+    if 'aggregator' in globals():
+        aggregator.SetStatus('ABORTED: STOPPED_BY_OS')
+        aggregator.Flush()
+    else:
+        with open(MASTER_FILE, 'r') as g:
+            REPORT = json.load(g)
+        g.close()
+        REPORT['RESULTS']['STATUS'] = 'ABORTED: STOPPED_BY_OS'
+        WriteReport(MASTER_FILE, REPORT)
 
     line = "Updated STATUS to ABORTED: STOPPED_BY_OS in signal handler"
     lg(log, line, 0)
+    LogFlush(1)
+    if 'registry' in globals():
+        #Tests running when SLS was stopped, before they are killed. Not blocking, the signal may
+        #have interrupted a Flush of this thread
+        try:
+            registry.Flush(False)
+        except (IOError, OSError):
+            pass
     os.killpg(0, signal.SIGINT)
-    cleanup(log,tlog)
+    if 'registry' in globals():
+        cleanup(log, tlog, registry, False)
+    else:
+        cleanup(log, tlog)
 
 START_TIME = datetime.datetime.now()
 str_time = START_TIME.strftime('%Y%m%d%H%M%S')
 
-def call_ltp(testcase, iterations, suite, dat, str_time, sls_logdir):
-	command = "./run_test.py %s %d %s %s %s %s > %s/run_test.log 2>&1" % (testcase, iterations, suite, dat, str_time, sls_logdir, sls_logdir)
-	os.system(command)
-
-ltp_threads = []
-test_pids = []
-def execute_scenario(tests_scenario, sls_logdir):
-	test_pids = []
-	ltp_threads = []
-
-	tcount = 0
-	for test in tests_scenario:
-		testcase = test.split('(')[0]
-		suite = test.split('(')[1].split('|')[0]
-		iterations = int(test.split('|')[1].replace(')',''))
-
-		d = datetime.datetime.now()
-		dat = "%s%s" % (d.strftime('%Y%m%d%H%M%S'), str(d.microsecond)[:3])
-		dat2 = "%s/%s/%s,%s:%s:%s" % (d.strftime('%Y'),d.strftime('%m'),d.strftime('%d'),d.strftime('%H'),d.strftime('%M'),d.strftime('%S'))
-		dat = dat.strip()
-
-		in_progess_file = os.environ['TC_OUTPUT'] + '/IN-PROGRESS-TEST'
-		f = open(in_progess_file, "a")
-		line = "%s:%s:%d: %s\n" % (testcase, suite, iterations, dat2)
-		f.write(line)
-		f.close()
-
-		th = threading.Thread(target=call_ltp, args=(testcase, iterations, suite, dat, str_time, sls_logdir,))
-		th.start()
-
-		ltp_threads.append(th)
-		
-	#Wait till this scenario completes
-	if re.search('YES', os.environ['WAIT_SCENARIO'], re.M|re.I):
-		line = "Waiting for scenario to complete"
-		lg(log, line, 0)
-		for th in ltp_threads:
-			th.join()
-
-	
+def network_check():
+	#Returns 1 if SLS has to stop, runs with BASE or IO tests go on without Network/NFS tests
+	if CheckNw(log, tlog, ltp_vars) == 1:
+		scheduler.network_fail = 1
+		if b or i or s:
+			lg(log, 'Network check failed, so will pick only BASE & IO tests...')
+			return 0
+		lg(log, 'Network check failed, exiting...')
+		return 1
+	scheduler.network_fail = 0
+	return 0
+
+
 #Read LTP variables from ./sls_config file
 ltp_vars = GetVars()
 if not ltp_vars:
@@ -134,6 +131,8 @@ if 'SLS_DIR' not in ltp_vars:
 elif ltp_vars['SLS_DIR'].strip() == '':
 	ltp_vars['SLS_DIR'] = '/var/log/sls/'
 sls_logdir = ltp_vars['SLS_DIR']
+if 'SAMPLE_WINDOW' in ltp_vars and ltp_vars['SAMPLE_WINDOW'] != '':
+	os.environ['SAMPLE_WINDOW'] = ltp_vars['SAMPLE_WINDOW']
 
 log = os.environ['TC_OUTPUT'] + '/START.LTP_log'
 parser = argparse.ArgumentParser(description='Start SLS program')
@@ -163,36 +162,54 @@ omit_list = GetVars('./tc_group')
 for k,v in omit_list.items():
 	os.environ[str(k)] = str(v)	
 
+#Load test catalog, suite and iterations lookup for picked tests uses this
+lg(log, "[go_sls] Loading LTP test catalog", 0, 1)
+catalog = LoadCatalog(sls_logdir)
+#TST_MIN_KVER and TST_NEEDS_* of tests, same index install_sls.py used
+ltp_meta = LoadMetadata(sls_logdir)
+KERNEL = KernelVersion()
+
 #Get Machine Info
 mlog = os.environ['TC_OUTPUT'] + '/MACHINE_INFO'
 MachineInfo(mlog, ltp_vars)
 
-#Set OOM Killer
-lg(log, "[go_sls] Starting SLS OOM Monitor. Kills nasty OOM process", 0, 1)
-olog = '%s/oom_debug' % sls_logdir
-process = multiprocessing.Process(target=OOMKill, args=(olog,log))
-process.start()
 
-#write empty REPORT.json
+#Aggregate results of tests, REPORT.json starts empty
 MASTER_FILE=os.environ['TC_HTML_PATH'] + '/REPORT.json'
-OUTPUT = {}
-RESULTS = {}
-RESULTS['PASS%'] = 0
-RESULTS['FAIL%'] = 0
-RESULTS['SKIP%'] = 0
-RESULTS['CONF%'] = 0
-RESULTS['BROK%'] = 0
-RESULTS['STATUS'] = 'In Progress'
-RESULTS['RUNTIME'] = '0:00:00'
-RESULTS['OVERVIEW'] = ''
-
-OUTPUT['RESULTS'] = RESULTS
-
-TESTS = {}
-OUTPUT['TESTS'] = TESTS
-with open(MASTER_FILE, 'w') as outfile:
-	json.dump(OUTPUT, outfile)
-outfile.close()
+aggregator = ResultAggregator(MASTER_FILE, START_TIME, '%s/%s' % (sls_logdir, RESULT_SOCKET), os.environ['TC_OUTPUT'] + '/' + RESULT_JOURNAL)
+aggregator.Start()
+
+#Running tests, used for duplicate checks, IN-PROGRESS-TEST and cleanup
+registry = TestRegistry(sls_logdir)
+registry.Serve('%s/%s' % (sls_logdir, STATUS_SOCKET))
+
+#Duration, peak memory and CPUs of tests from earlier runs on this kernel
+costs = CostProfiles(sls_logdir)
+lg(log, "[go_sls] Loaded cost profiles of %d tests" % costs.Load(), 0)
+
+#Set OOM Killer, only kills processes of tests in registry
+lg(log, "[go_sls] Starting SLS OOM Monitor. Kills nasty OOM process", 0, 1)
+olog = '%s/oom_debug' % sls_logdir
+oomwatch = OOMWatchdog(registry, olog, log)
+oomwatch.Start()
+
+#IO tests get the least loaded /tmp/ltp_io* target as runltp -d
+iotargets = IOAllocator()
+iotargets.Refresh()
+for target in iotargets.Snapshot():
+	lg(log, "[go_sls] IO target %s, free %dMB" % (target['PATH'], target['FREE_MB']), 0)
+
+#Each test runs in its own cgroup with limits of its class, CGROUP='NO' runs tests without it
+cgroups = None
+if ltp_vars.get('CGROUP', '') != 'NO':
+	limits = dict((CL, ParseLimits(ltp_vars.get('CGROUP_%s_LIMITS' % CL, ''))) for CL in CGROUP_CLASSES)
+	manager = CgroupManager(limits, catalog, lambda line: lg(log, line, 0))
+	if manager.Setup() == 0:
+		cgroups = manager
+
+#Time spent in scheduler phases, written to PROFILE.json periodically
+PROFILE_PATH = os.environ['TC_OUTPUT'] + '/' + PROFILE_FILE
+PROFILE_START = StartProfile(PROFILE_PATH)
 
 tlog = '%s/go_sls.log' % sls_logdir
 command = "rm -f %s/go_sls.log" % sls_logdir
@@ -208,14 +225,15 @@ RunCommand(command, tlog, 1, 0)
 command = "rm -f %s/ltp-*/test.img" % sls_logdir
 RunCommand(command, tlog, 0, 0)
 
-command = "mkdir -p  /opt/ltp/results"
+ltp_results = os.environ['ltp_results']
+command = "mkdir -p  %s/results" % ltp_results
 RunCommand(command, tlog, 1, 1)
-command = "rm -rf /opt/ltp/results/*"
+command = "rm -rf %s/results/*" % ltp_results
 RunCommand(command, tlog, 1, 1)
 
-command = "mkdir -p  /opt/ltp/output"
+command = "mkdir -p  %s/output" % ltp_results
 RunCommand(command, tlog, 1, 1)
-command = "rm -rf /opt/ltp/output/*"
+command = "rm -rf %s/output/*" % ltp_results
 RunCommand(command, tlog, 1, 1)
 
 RunCommand('ulimit -l unlimited', tlog, 0, 0)
@@ -257,43 +275,27 @@ full_omit_list = os.environ['FULL_OMIT_LIST']
 ltp_path = os.environ['ltp_path']
 ITR_NUM = []; TS = []; TCP_LIST=''; TCP_SUITE = ''; TCP_READY = ''; TWAIT = "None|None"
 
-#Get total number of tests
-command = "ls -1 %s| grep -v -E \"%s\" | grep -v \"^[1-9]\"|wc -l" % (ltp_bin, full_omit_list)
-total_tests = int(RunCommand(command, tlog, 2, 0))
-total_tests = total_tests - 1
-
-#Get Tests List
+#Get Tests List, omitted tests are filtered from the catalog and focus suites are read from it
 lg(log, "Preparing all tests list ...", 0)
-command = "ls -1 %s| grep -v -E \"%s\" | sort -R|grep -v \"^[1-9]\"|tr '\n' '^'" % (ltp_bin, full_omit_list)
-output = RunCommand(command, tlog, 2, 0)
+all_test_suite = ListTests(catalog, full_omit_list)
+random.shuffle(all_test_suite)
 if FOCUS_AREA == '' and not s:
-	test_suite = output.split('^')
-	test_suite = [x for x in test_suite if x]
+	test_suite = all_test_suite
 else:
-	all_test_suite = output.split('^')
-	all_test_suite = [x for x in all_test_suite if x]
-	test_suite = []
 	focus_suites = []
 	if s:
 		AREALIST = s[0].split(',')
 	else:
 		AREALIST = FOCUS_AREA.split(' ')
-	AREALIST = [x for x in AREALIST if x]
+	AREALIST = [x.strip() for x in AREALIST if x]
 	for fcs in AREALIST:
-		if fcs != '':
-			command = "ls /opt/ltp/runtest/|grep %s|wc -l" % fcs
-			if int(RunCommand(command, tlog, 2, 0)) != 0:
-				focus_suites.append('/opt/ltp/runtest/%s' % fcs)
-
-	for tst in all_test_suite:
-		command = "grep %s %s|wc -l" % (tst, " ".join(focus_suites))
-		if int(RunCommand(command, tlog, 2, 0)) != 0:
-			test_suite.append(tst)
-	
-	total_tests = len(test_suite) - 1
-
-command = 'echo "ALL TESTS : %s" >> %s/go_sls.log' % (" ".join(test_suite),sls_logdir)
-RunCommand(command, tlog, 0, 0)
+		if fcs != '' and catalog.HasSuite(fcs):
+			focus_suites.append(fcs)
+
+	focus_tests = catalog.SuiteTests(focus_suites)
+	test_suite = [x for x in all_test_suite if x in focus_tests]
+
+lg(tlog, "ALL TESTS : %s" % " ".join(test_suite), 0)
 
 #Check if wait is required for each scenario to complete
 if ('WAIT_SCENARIO' not in ltp_vars):
@@ -330,10 +332,30 @@ if s:
 	if net_or_nfs == 1:
 		os.environ['WAIT_SCENARIO'] = 'YES'
 
-network_fail = 0
+#Slot scheduler keeps tests running as slots free up, Network/NFS only runs stay scenario by scenario
+SCHEDULER = ltp_vars.get('SCHEDULER', '').strip().upper()
+if SCHEDULER == '':
+	SCHEDULER = 'SCENARIO'
+if SCHEDULER == 'SLOT' and (((t or n) and not (b or i)) or net_or_nfs == 1):
+	lg(log, "Network/NFS tests run scenario by scenario, overriding SCHEDULER to SCENARIO")
+	SCHEDULER = 'SCENARIO'
+
+#Stack and wchan of hung tests are always captured, sysrq w also dumps blocked tasks to dmesg
+HANG_SYSRQ = ltp_vars.get('HANG_SYSRQ', '') == 'YES'
+if ltp_vars.get('TEST_TIMEOUT', '') != '' or ltp_vars.get('TIMEOUT_FACTOR', '') != '':
+	lg(log, "Test timeout: %s seconds, %s times usual duration" % (ltp_vars.get('TEST_TIMEOUT', '') or 'no fixed', ltp_vars.get('TIMEOUT_FACTOR', '') or 'not'))
 
-scen = 0
 scenario_file = "%s/SCENARIO_LIST" % os.environ['TC_OUTPUT']
+scheduler = Scheduler(ltp_vars, test_suite, catalog, registry, aggregator, costs, log, tlog, sls_logdir,
+	scenario_file, ltp_meta, KERNEL, None, iotargets, cgroups, HANG_SYSRQ)
+
+#TARGET_CPU_UTIL and TARGET_MEM_UTIL replace the fixed resource gates with a closed loop
+if ltp_vars.get('TARGET_CPU_UTIL', '') != '' or ltp_vars.get('TARGET_MEM_UTIL', '') != '':
+	targets = [int(ltp_vars[x]) if ltp_vars.get(x, '') != '' else None for x in ['TARGET_CPU_UTIL', 'TARGET_MEM_UTIL']]
+	min_test_scenario, max_test_scenario = scheduler.ScenarioLimits()
+	scheduler.controller = UtilController(targets[0], targets[1], min_test_scenario, max_test_scenario)
+	lg(log, "Controller: target CPU %s%%, target memory %s%%" % (targets[0], targets[1]))
+
 #If Scaenario file given as input
 if r:
 	rfile = r[0]
@@ -349,10 +371,10 @@ if r:
 			if len(l.split('=')) != 2:
 				line = "Wrong line number:%d  : %s" % (lnum,l)
 				lg(log, line, 0)
-				network_fail = 1
-				process.terminate()
+				scheduler.network_fail = 1
+				oomwatch.Stop()
 				os.killpg(0, signal.SIGINT)
-				cleanup(log, tlog)
+				cleanup(log, tlog, registry)
 				exit(1)
 			key = l.split('=')[0]
 			val = l.split('=')[1]
@@ -374,60 +396,38 @@ if r:
 			line = "Test : %s will be executed" % test.strip()
 			lg(log, line, 0)
 
-		d = datetime.datetime.now()
-		dat = "%s/%s/%s,%s:%s:%s" % (d.strftime('%Y'),d.strftime('%m'),d.strftime('%d'),d.strftime('%H'),d.strftime('%M'),d.strftime('%S'))
-		line = "[%s] [go_sls] [notice] Scenario_%d:  %s\n" % (dat,scen," ".join(test_list))
-		f = open(scenario_file, "a")
-		f.write(line)
-		f.close()
-
-		execute_scenario(test_list, sls_logdir)
-		scen += 1
+		scheduler.LogScenario(test_list)
+		scheduler.ExecuteScenario(test_list)
+		scheduler.scen += 1
 
 		lg(log, " ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ", 0)
-		GetFreeCPU(log, tlog)
-		GetFreeMem(log, tlog)
-		GetFsSpace(log, tlog)
+		snap = TakeSnapshot()
+		GetFreeCPU(log, tlog, snap)
+		GetFreeMem(log, tlog, snap)
+		GetFsSpace(log, tlog, snap)
 		if network_testing == 1 and CheckNw(log, tlog, ltp_vars) == 1:	
 			lg(log, 'Network check failed, exiting...')
-			network_fail = 1
-			process.terminate()
-			cleanup(log, tlog)
+			scheduler.network_fail = 1
+			oomwatch.Stop()
+			cleanup(log, tlog, registry)
 			os.killpg(0, signal.SIGINT)
 			break
 		time.sleep(2)
 	lg(log, "Completed all test scenario execution.", 0)
 
 	#Update STATUS in REPORT.json
-	lock_file = open('%s/ltp.lock' % sls_logdir, "w")
-	while True:
-		line = "Trying to update STATUS to COMPLETE in REPORT.json"
-		lg(log, line, 0)
-		try:
-			fcntl.lockf(lock_file.fileno(), fcntl.LOCK_EX|fcntl.LOCK_NB)
-		except IOError:
-			time.sleep(GetRandom(10))
-		else:
-			break
-	with open(MASTER_FILE, 'r') as g:
-		REPORT = json.load(g)
-	g.close()
-	if network_fail == 0:
-		REPORT['RESULTS']['STATUS'] = 'Completed'
+	if scheduler.network_fail == 0:
+		aggregator.SetStatus('Completed')
 	else:
-		REPORT['RESULTS']['STATUS'] = 'ABORTED: RHOST_DOWN'
-
-	CURRENT_TIME = datetime.datetime.now()
-	REPORT['RESULTS']['RUNTIME'] = str(CURRENT_TIME - START_TIME)
-	with open(MASTER_FILE, 'w') as g:
-		json.dump(REPORT, g)
-	g.close()
-	fcntl.flock(lock_file, fcntl.LOCK_UN)
+		aggregator.SetStatus('ABORTED: RHOST_DOWN')
+	aggregator.Stop()
+	WriteProfile(PROFILE_PATH, PROFILE_START)
+	costs.Save()
 	line = "Updated STATUS to COMPLETE in REPORT.json"
 	lg(log, line, 0)
 	lg(log, "Completed full suite, Thanks for using SLS Tool", 0)
-	process.terminate() 
-	cleanup(log, tlog)
+	oomwatch.Stop()
+	cleanup(log, tlog, registry)
 	exit(0)
 
 if 'TEST_HOURS' in ltp_vars:
@@ -442,250 +442,29 @@ line = "LTP Tests will run for %d hours and will end by : %s" % (TEST_HOURS, END
 lg(log, line, 0)
 line = "Scenario completion criteria: %s" % os.environ['WAIT_SCENARIO'].strip()
 lg(log, line, 0)
+line = "Scheduler: %s" % SCHEDULER
+lg(log, line, 0)
 
-
-while True:
-	#Pick tests for scenario
-	tests_scenario = []
-	if 'MIN_TEST_PER_SCENARIO' in ltp_vars:
-		min_test_scenario = int(ltp_vars['MIN_TEST_PER_SCENARIO'].strip())
-	else:
-		min_test_scenario = 3
-
-	if 'MAX_TEST_PER_SCENARIO' in ltp_vars:
-		max_test_scenario = int(ltp_vars['MAX_TEST_PER_SCENARIO'].strip())
-	else:
-		max_test_scenario = 8
-
-	if max_test_scenario > min_test_scenario:
-		total_tests_scenario = GetRandom(max_test_scenario, min_test_scenario)
-	else:
-		total_tests_scenario = max_test_scenario
-
-	if 'MUST_TEST' in ltp_vars:
-		if ltp_vars['MUST_TEST'].strip() != '':
-			must_tests = ltp_vars['MUST_TEST'].strip().split(',')
-			must_tests = [x for x in must_tests if x]
-			if max_test_scenario > len(must_tests):
-				total_tests_scenario = max_test_scenario - len(must_tests)
-		if total_tests_scenario < 0:
-			total_tests_scenario = 0
-		elif total_tests_scenario > min_test_scenario:
-			total_tests_scenario = GetRandom(total_tests_scenario, min_test_scenario)
-	tlist = []
-	for x in range(total_tests_scenario):
-		valid_test = 0
-		while valid_test == 0:
-			#Pick a Random test
-			if total_tests <= 0:
-				test = test_suite[0]
-			else:
-				rnum = GetRandom(total_tests, 0)
-				if rnum >= len(test_suite):
-					rnum = len(test_suite) - 1
-				test = test_suite[rnum]
-			if test == "" or test == " ":
-				continue
-			test = test.strip()
-
-			#If not valid test, then pick some other test
-			suite_iter = GetSuiteIterations(tlog, test, ltp_vars)		
-			if suite_iter[1] == 0:
-				continue
-
-			#If already running, then pick some other test
-			command = "ps -eaf|grep %s|grep -v grep|wc -l" % (test)
-			if int(RunCommand(command, tlog, 2, 0)) != 0:
-				continue
-
-			#Check if skip or brok or conf count this test is more than 2, if so dont pick
-			command = "cat %s/sls_skip_conf_brok|grep -w '%s:%s'|wc -l" % (sls_logdir, test,suite_iter[0])
-			if int(RunCommand(command, tlog, 2, 0)) >= 2:
-				continue
-
-			#If test is already picked in this scenario, pick another
-			tentry = "%s|%s" % (test, suite_iter[0])
-			if tentry in tlist:
-				valid_test = 0
-				continue
-
-			#If test is part of EXCLUDE_TEST, exclude it
-			if 'EXCLUDE_TEST' in ltp_vars:
-				if ltp_vars['EXCLUDE_TEST'] != '':
-					etests = ltp_vars['EXCLUDE_TEST'].split(',')
-					if test in etests:
-						continue
-
-			tlist.append(tentry)
-
-			#If test belongs to Network focus area, cap iterations max to 10
-			if re.search(suite_iter[0], os.environ['NW1_LIST'], re.M):
-				if suite_iter[1] > 10:
-					suite_iter[1] = 10
-			if re.search(suite_iter[0], os.environ['NW2_LIST'], re.M):
-				if suite_iter[1] > 10:
-					suite_iter[1] = 10
-			if re.search(suite_iter[0], os.environ['NFS_LIST'], re.M):
-				if suite_iter[1] > 10:
-					suite_iter[1] = GetRandom(10)
-
-			#If network_fail then pick skip NFS and Network tests
-			if network_fail == 1:
-				if re.search(suite_iter[0], os.environ['NW1_LIST'], re.M):
-					iline = 'Ignoring network test:%s, as RHOSTS ping failed' % test
-					lg(log, iline, 0)
-					continue
-
-				if re.search(suite_iter[0], os.environ['NW2_LIST'], re.M):
-					iline = 'Ignoring network test:%s, as RHOSTS ping failed' % test
-					lg(log, iline, 0)
-					continue
-
-				if re.search(suite_iter[0], os.environ['NFS_LIST'], re.M):
-					iline = 'Ignoring NFS test:%s, as RHOSTS ping failed' % test
-					lg(log, iline, 0)
-					continue
-
-			
-			test_detail = "%s(%s|%d)" % (test, suite_iter[0], suite_iter[1])
-			tests_scenario.append(test_detail)
-			valid_test = 1
-
-	#Add must test testcases
-	if 'MUST_TEST' in ltp_vars:
-		must_tests = ltp_vars['MUST_TEST'].strip().split(',')
-		must_tests = [x for x in must_tests if x]
-		for test in must_tests:
-			test = test.strip()
-			if test == '':
-				continue
-			if test in tests_scenario:
-				continue
-
-			#If already running, then pick some other test
-			command = "ps -eaf|grep %s|grep -v grep|wc -l" % (test)
-			if int(RunCommand(command, tlog, 2, 0)) != 0:
-				line = "Must test:%s, already running. So not picking it for this scenario" % test
-				lg(log, line, 0)
-				continue
-
-			suite_iter = GetSuiteIterations(tlog, test, ltp_vars)
-			if suite_iter[1] == 0:
-				lg(log, suite_iter[0], 0)
-				continue
-
-			#If test belongs to Network focus area, cap iterations max to 10
-			if re.search(suite_iter[0], os.environ['NW1_LIST'], re.M):
-				if suite_iter[1] > 10:
-					suite_iter[1] = 10
-			if re.search(suite_iter[0], os.environ['NW2_LIST'], re.M):
-				if suite_iter[1] > 10:
-					suite_iter[1] = 10
-			if re.search(suite_iter[0], os.environ['NFS_LIST'], re.M):
-				if suite_iter[1] > 10:
-					suite_iter[1] = GetRandom(10)
-
-			#Add test to test list
-			test_detail = "%s(%s|%d)" % (test, suite_iter[0], suite_iter[1])
-			tests_scenario.append(test_detail)
-
-	if len(tests_scenario) == 0:
-		lg(log, "Not allowed to start any new tests, sleeping for a minute", 0)
-		time.sleep(60)
-	else:		
-		d = datetime.datetime.now()
-		dat = "%s/%s/%s,%s:%s:%s" % (d.strftime('%Y'),d.strftime('%m'),d.strftime('%d'),d.strftime('%H'),d.strftime('%M'),d.strftime('%S'))
-		line = "[%s] [go_sls] [notice] Scenario_%d:  %s\n" % (dat,scen," ".join(tests_scenario))
-		f = open(scenario_file, "a")
-		f.write(line)
-		f.close()
-
-		#Check free memory and launch only 1 test if less tahn 10% memory is available
-		total_mem = int(RunCommand("free -m | awk '{print $2}' | grep -v [a-z] | head -n 1", tlog, 2, 0))
-		used_mem = int(RunCommand("free -m | awk '{print $3}' | grep -v [a-z] | head -n 1", tlog, 2, 0))
-		free_mem = total_mem - used_mem
-		free_mem_percent = (free_mem * 100) / total_mem
-		if free_mem_percent <= 10:
-			line = "Alert !! Less than 10%% memory is available, so launching only 1 test for this scenario"
-			lg(log, line, 0)
-			test = tests_scenario[-1].split('(')[0]
-			testsuite = tests_scenario[-1].split('(')[1].split('|')[0]
-			tests_scenario = []
-			test_detail = "%s(%s|1)" % (test,testsuite)
-			tests_scenario.append(test_detail)
-			line = "[%s] [go_sls] [info] Starting only 1 test:%s for 1 iteration" % (dat, test)
-			lg(log, line, 0)
-		else:
-			line = "[%s] [go_sls] [info] Starting %d TESTS CONCURRENTLY" % (dat, len(tests_scenario))
-			lg(log, line, 0)
-	
-		execute_scenario(tests_scenario, sls_logdir)
-		scen += 1
-
-		#Check Resources
-		lg(log, " ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ", 0)
-		GetFreeCPU(log, tlog)
-		GetFreeMem(log, tlog)
-		GetFsSpace(log, tlog)
-		if t or n or net_or_nfs == 1:
-			if CheckNw(log, tlog, ltp_vars) == 1:
-				network_fail = 1
-				if b or i or s:
-					lg(log, 'Network check failed, so will pick only BASE & IO tests...')
-				else:
-					lg(log, 'Network check failed, exiting...')
-					break
-			else:
-				network_fail = 0
-		time.sleep(2)
-
-	CURRENT_TIME = datetime.datetime.now()
-	if CURRENT_TIME > END_TIME:
-		line = "LTP Tests executed for %d hours and now its ending" % TEST_HOURS
-		lg(log, line, 0)
-		line = "Current Time: %s , End Time: %s" % (CURRENT_TIME, END_TIME)
-		lg(log, line, 0)
-
-		line = "Waiting for Last scenario to complete" 
-		lg(log, line, 0)
-		for chpid in test_pids:
-			chpid.wait()
-		
-		break
-	else:
-		line = "Enough resources are available, going for next iteration"
-		lg(log, line, 0)
+#Network/NFS tests need RHOST, checked after each scenario or every minute
+nw_check = network_check if (t or n or net_or_nfs == 1) else None
+if SCHEDULER == 'SLOT':
+	scheduler.SlotLoop(END_TIME, TEST_HOURS, nw_check)
+else:
+	scheduler.ScenarioLoop(END_TIME, TEST_HOURS, nw_check)
 
 
 #Update STATUS in REPORT.json
-lock_file = open('%s/ltp.lock' % sls_logdir, "w")
-while True:
-	line = "Trying to update STATUS to COMPLETE in REPORT.json"
-	lg(log, line, 0)
-	try:
-		fcntl.lockf(lock_file.fileno(), fcntl.LOCK_EX|fcntl.LOCK_NB)
-	except IOError:
-		time.sleep(GetRandom(10))
-	else:
-		break
-
-with open(MASTER_FILE, 'r') as g:
-	REPORT = json.load(g)
-g.close()
-if network_fail == 0:
-	REPORT['RESULTS']['STATUS'] = 'Completed'
+if scheduler.network_fail == 0:
+	aggregator.SetStatus('Completed')
 	lg(log, "Completed full suite, Thanks for using SLS Tool", 0)
 else:
-	REPORT['RESULTS']['STATUS'] = 'ABORTED: RHOST_DOWN'
-REPORT['RESULTS']['RUNTIME'] = str(CURRENT_TIME - START_TIME)
-with open(MASTER_FILE, 'w') as g:
-	json.dump(REPORT, g)
-g.close()
-
-fcntl.flock(lock_file, fcntl.LOCK_UN)
+	aggregator.SetStatus('ABORTED: RHOST_DOWN')
+aggregator.Stop()
+WriteProfile(PROFILE_PATH, PROFILE_START)
+costs.Save()
 
 line = "Updated STATUS to COMPLETE in REPORT.json"
 lg(log, line, 0)
 os.killpg(0, signal.SIGINT)
-cleanup(log, tlog)
-process.terminate() 
+cleanup(log, tlog, registry)
+oomwatch.Stop()
@@ -26,6 +26,7 @@ import os
 import sys
 
 from common_sls import *
+from command_sls import ProcessCount
 
 #reload(sys)
 #sys.setdefaultencoding('utf-8')
@@ -54,8 +55,7 @@ RunCommand('mkdir -p ' + logdir, None, 0, 0)
 ilog = logdir + '/install_ltp.log'
 
 #Check if SLS is already Running
-command = "ps -eaf|grep go_sls|grep -v grep |wc -l"
-if int(RunCommand(command,ilog,2,0)) > 0:
+if ProcessCount('go_sls') > 0:
 	print("SLS is already running, if u wish to stop SLS please use: ./stop_sls.py")
 	exit(1)
 
@@ -68,13 +68,11 @@ pack = "automake sysstat make gcc"
 packages = pack.split(' ')
 packages = [x for x in packages if x]
 
-ret = RunCommand('/opt/ltp/runltp --help > /dev/null 2>&1', ilog, 0, 0)
+ret = RunCommand("%s/runltp --help > /dev/null 2>&1" % os.environ['ltp_path'], ilog, 0, 0)
 if ret != 0:
 	#Clone or copy ltp source code
 	lg(ilog,'GET LTP:\n-------------------------')
-	for p in packages:
-		lg(ilog, 'Installing : ' + p)
-		InstallPackage(p, ilog, 0) 
+	InstallPackages(packages, ilog)
 	
 	ret = RunCommand('ping -c 2 github.com > /dev/null 2>&1', ilog, 0, 0)
 	if ret != 0:
@@ -93,7 +91,7 @@ if ret != 0:
 	lg(ilog,'Running : make autotools')
 	RunCommand('cd %s/sls_ltp ; make autotools' % logdir, ilog)
 	lg(ilog,'Running : ./configure')
-	RunCommand('cd %s/sls_ltp ; ./configure' % logdir, ilog)
+	RunCommand('cd %s/sls_ltp ; ./configure --prefix=%s' % (logdir, os.environ['ltp_path']), ilog)
 	lg(ilog,'Running : make all')
 	RunCommand('cd %s/sls_ltp ; make all' % logdir, ilog)
 	lg(ilog,'Running : make install')
@@ -104,8 +102,6 @@ else:
 
 ltp_vars = ExportVars(ltp_vars, ilog)
 ChangeLTP(ilog)
-DropIPV6(ilog)
-DropNfsv3UDP(ilog)
 SetMinFree(ilog)
 CopyDataFiles(ilog)
 
@@ -113,12 +109,11 @@ CopyDataFiles(ilog)
 os.environ['os_version'] = GetOS('ID')
 os.environ['VERSION'] = GetOS('VERSION')
 lg(ilog,'\nInstalling required packages:\n-------------------------')
+#PACKAGE_LIST and SLS packages go in one package manager transaction
+user_packages = []
 if 'PACKAGE_LIST' in ltp_vars and ltp_vars['PACKAGE_LIST'].strip() != '':
-	packages = ltp_vars['PACKAGE_LIST'].split(',')
-	packages = [x for x in packages if x]
-	for p in packages:
-		lg(ilog, 'Installing : ' + p)
-		InstallPackage(p, ilog, 0)
+	user_packages = ltp_vars['PACKAGE_LIST'].split(',')
+	user_packages = [x for x in user_packages if x]
 
 if os.environ['os_version'] == 'rhel' or os.environ['os_version'] == 'fedora':
 	if re.search('7', os.environ['VERSION'], re.M):
@@ -134,24 +129,16 @@ elif os.environ['os_version'] == 'sles':
 	
 	mods = ''
 
-if 'MODULES' in ltp_vars and ltp_vars['MODULES'] != '':
-	modules = ltp_vars['MODULES'].split(' ')
-	modules = [x for x in modules if x]
-	for m in modules:
-		lg(ilog, 'Loading : ' + m)
-		LoadModule(m, ilog)
-
 packages = pack.split(' ')
 packages = [x for x in packages if x]
-for p in packages:
-	lg(ilog, 'Installing : ' + p)
-	InstallPackage(p, ilog, 0) 
+InstallPackages(user_packages + packages, ilog)
 
-modules = mods.split(' ')
-modules = [x for x in modules if x]
-for m in modules:
-	lg(ilog, 'Loading : ' + m)
-	LoadModule(m, ilog)
+#MODULES and SLS modules are looked up in one index of /lib/modules
+modules = []
+if 'MODULES' in ltp_vars and ltp_vars['MODULES'] != '':
+	modules = ltp_vars['MODULES'].split(' ')
+modules = [x for x in modules + mods.split(' ') if x]
+LoadModules(modules, ilog)
 
 lg(ilog,'Starting Required OS services')
 if StartService(ilog) != 0:
@@ -167,8 +154,11 @@ command = "cp -f ./bashrc.sls /root/.bashrc"
 if int(RunCommand(command, ilog, 0, 0)):
 	lg(ilog, 'Failed to update .bashrc')
 	exit(1)
+if os.environ['ltp_path'] != LTPROOT:
+	command = "sed -i 's#%s#%s#g' /root/.bashrc" % (LTPROOT, os.environ['ltp_path'])
+	RunCommand(command, ilog, 1, 0)
 
-ret = RunCommand('/opt/ltp/runltp --help > /dev/null 2>&1', ilog, 0)
+ret = RunCommand("%s/runltp --help > /dev/null 2>&1" % os.environ['ltp_path'], ilog, 0)
 if ret != 0:
 	lg(ilog, "FAILED to Install LTP. Refer "+ ilog)
 else:
@@ -0,0 +1,145 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Spreads IO tests of go_sls.py across /tmp/ltp_io* and /tmp/ltp_io_pmem* targets by load.
+#           1. IOTarget : One IO directory with its device, running tests, free space and recent throughput
+#           2. DiskStats : Sectors read and written per device from /proc/diskstats
+#           3. IOAllocator : Finds IO targets and gives each IO test the least loaded one as runltp -d
+#
+#  SETUP:   1. IO_DISKS or PMEM in sls_config, ./start_sls.py -i mounts them as /tmp/ltp_io*
+#           2. go_sls.py passes its IOAllocator to StartTest of runner_sls.py
+#
+
+import os
+import time
+import threading
+from command_sls import ListDir
+
+#Seconds between two refreshes of targets, free space and /proc/diskstats
+IO_REFRESH = 5
+SECTOR_SIZE = 512
+
+
+class IOTarget(object):
+	def __init__(self, path, device):
+		self.path = path
+		self.device = device
+		self.users = 0
+		self.free = 0
+		self.throughput = 0.0
+
+	def ToDict(self):
+		return {'PATH': self.path, 'TESTS': self.users, 'FREE_MB': self.free // (1024 * 1024),
+			'MB_PER_SEC': round(self.throughput / (1024 * 1024), 2)}
+
+
+def DiskStats():
+	stats = {}
+	try:
+		with open('/proc/diskstats', 'r') as fp:
+			for line in fp:
+				fields = line.split()
+				if len(fields) < 10:
+					continue
+				#sectors read is field 6 and sectors written is field 10
+				stats[(int(fields[0]), int(fields[1]))] = int(fields[5]) + int(fields[9])
+	except (IOError, OSError):
+		pass
+	return stats
+
+
+def MountDevices():
+	devices = {}
+	try:
+		with open('/proc/mounts', 'r') as fp:
+			for line in fp:
+				fields = line.split()
+				if len(fields) >= 2:
+					devices[fields[1].replace('\\040', ' ')] = fields[0]
+	except (IOError, OSError):
+		pass
+	return devices
+
+
+def TargetDevice(path, mounts):
+	#Block device behind the mount, btrfs and tmpfs report an anonymous st_dev so the source device is used
+	source = mounts.get(path)
+	if source is not None and source.startswith('/dev/'):
+		try:
+			rdev = os.stat(source).st_rdev
+			return (os.major(rdev), os.minor(rdev))
+		except OSError:
+			pass
+	try:
+		dev = os.stat(path).st_dev
+	except OSError:
+		return None
+	return (os.major(dev), os.minor(dev))
+
+
+class IOAllocator(object):
+	def __init__(self, root='/tmp', pattern='ltp_io', refresh=IO_REFRESH):
+		self.root = root
+		self.pattern = pattern
+		self.refresh = refresh
+		self.lock = threading.Lock()
+		self.targets = {}
+		self.assigned = {}
+		self.last = 0
+		self.sectors = {}
+
+	def Refresh(self):
+		now = time.time()
+		paths = ['%s/%s' % (self.root, x) for x in ListDir(self.root, self.pattern)]
+		paths = [x for x in paths if os.path.isdir(x)]
+		mounts = MountDevices()
+		for path in paths:
+			if path not in self.targets:
+				self.targets[path] = IOTarget(path, TargetDevice(path, mounts))
+		for path in list(self.targets):
+			if path not in paths and self.targets[path].users == 0:
+				del self.targets[path]
+
+		stats = DiskStats()
+		elapsed = now - self.last
+		for target in self.targets.values():
+			try:
+				st = os.statvfs(target.path)
+				target.free = st.f_bavail * st.f_frsize
+			except OSError:
+				target.free = 0
+			if target.device in stats and target.device in self.sectors and elapsed > 0:
+				target.throughput = (stats[target.device] - self.sectors[target.device]) * SECTOR_SIZE / elapsed
+		self.sectors = stats
+		self.last = now
+
+	def Acquire(self, run):
+		#Least running tests first, then least recent IO, then most free space
+		with self.lock:
+			if time.time() - self.last >= self.refresh:
+				self.Refresh()
+			if len(self.targets) == 0:
+				return self.root
+			target = min(self.targets.values(), key=lambda x: (x.users, x.throughput, -x.free, x.path))
+			target.users += 1
+			self.assigned[run] = target
+			return target.path
+
+	def Release(self, run):
+		with self.lock:
+			target = self.assigned.pop(run, None)
+			if target is not None:
+				target.users -= 1
+
+	def Snapshot(self):
+		with self.lock:
+			return [self.targets[x].ToDict() for x in sorted(self.targets)]
@@ -0,0 +1,203 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Buffered log writer behind lg() of common_sls.py
+#           1. LogLevel : Finds level of a log line from its [debug]/[info]/.../[error] tag
+#           2. LogWriter : Keeps one open handle per log file, a background thread writes queued lines
+#           3. GetWriter : Returns the LogWriter of this process, a forked child gets an unbuffered one
+#           4. SetLogConfig : Applies LOG_FLUSH and LOG_LEVEL of sls_config
+#           5. LogFlush : Writes all queued lines now, fsync when called on fatal paths
+#
+#  SETUP:   1. LOG_FLUSH and LOG_LEVEL in sls_config tune the writer, both optional
+#           2. Functions in logger_sls.py will get called internally from lg() of common_sls.py
+#
+
+import os
+import re
+import sys
+import time
+import atexit
+import threading
+import collections
+from profile_sls import Record
+
+#Seconds between two writes of queued lines, LOG_FLUSH in sls_config overrides it
+LOG_FLUSH = 1.0
+#Queued lines after which the caller writes them itself instead of waiting for the thread
+LOG_QUEUE = 10000
+LOG_LEVELS = ['debug', 'info', 'notice', 'warning', 'error']
+LEVEL_TAG = re.compile(r'\[(debug|info|notice|warning|warn|error|fatal)\]', re.I)
+
+
+def LogLevel(data):
+	match = LEVEL_TAG.search(data)
+	if not match:
+		return 'info'
+	level = match.group(1).lower()
+	if level == 'warn':
+		return 'warning'
+	if level == 'fatal':
+		return 'error'
+	return level
+
+
+class LogWriter(object):
+	def __init__(self, interval=None, level=None):
+		if interval is None:
+			interval = os.environ.get('LOG_FLUSH', '').strip()
+			interval = float(interval) if interval != '' else LOG_FLUSH
+		if level is None:
+			level = os.environ.get('LOG_LEVEL', '').strip().lower()
+		self.interval = interval
+		self.min_level = LOG_LEVELS.index(level) if level in LOG_LEVELS else 0
+		self.pid = os.getpid()
+		#deque append/popleft need no lock, so lg() stays safe to call from signal handlers
+		self.lines = collections.deque()
+		self.wlock = threading.RLock()
+		self.handles = {}
+		#Log directories lg() has checked
+		self.dirs = set()
+		#Log files which could not be opened, reported once
+		self.failed = set()
+		self.thread = None
+		if self.interval > 0:
+			self._start()
+
+	def _start(self):
+		self.thread = threading.Thread(target=self._run)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def Configure(self, interval, level):
+		if interval != '':
+			self.interval = float(interval)
+		if level != '':
+			self.min_level = LOG_LEVELS.index(level.lower())
+		if self.interval > 0 and self.thread is None:
+			self._start()
+
+	def Wanted(self, data):
+		return LOG_LEVELS.index(LogLevel(data)) >= self.min_level
+
+	def Write(self, logfile, line):
+		if self.interval <= 0 or len(self.lines) >= LOG_QUEUE:
+			self.Drain()
+		self.lines.append((logfile, line))
+		if self.interval <= 0:
+			self.Drain()
+
+	def Drain(self, sync=False):
+		start = time.time()
+		with self.wlock:
+			#Log file removed under us, e.g. rm -f SLS_DIR/* of start_sls.py, open it again
+			for logfile in list(self.handles):
+				try:
+					removed = os.fstat(self.handles[logfile].fileno()).st_nlink == 0
+				except (IOError, OSError):
+					removed = True
+				if removed:
+					try:
+						self.handles[logfile].close()
+					except (IOError, OSError):
+						pass
+					del self.handles[logfile]
+			#Directory of a log file may be gone, NFS TC_HTML_PATH or a removed bench tree. Lines of that
+			#file are dropped, others are still written. Opened again on the next Drain
+			unopened = set()
+			while True:
+				try:
+					logfile, line = self.lines.popleft()
+				except IndexError:
+					break
+				if logfile in unopened:
+					continue
+				try:
+					if logfile not in self.handles:
+						self.handles[logfile] = open(logfile, "ab")
+					self.handles[logfile].write(line)
+				except (IOError, OSError) as e:
+					unopened.add(logfile)
+					self.Failed(logfile, e)
+			for logfile in list(self.handles):
+				try:
+					self.handles[logfile].flush()
+					if sync:
+						os.fsync(self.handles[logfile].fileno())
+				except (IOError, OSError) as e:
+					self.Failed(logfile, e)
+		Record('log write', time.time() - start)
+
+	def Failed(self, logfile, e):
+		#Not through lg(), the log file is the one failing
+		if logfile in self.handles:
+			try:
+				self.handles[logfile].close()
+			except (IOError, OSError):
+				pass
+			del self.handles[logfile]
+		if logfile not in self.failed:
+			self.failed.add(logfile)
+			sys.stderr.write("[LogWriter] [error] Cannot write %s: %s, its lines are dropped\n" % (logfile, str(e)))
+
+	def Close(self):
+		self.Drain(sync=True)
+		with self.wlock:
+			for f in self.handles.values():
+				try:
+					f.close()
+				except (IOError, OSError):
+					pass
+			self.handles = {}
+
+	def _run(self):
+		while self.interval > 0:
+			time.sleep(self.interval)
+			try:
+				self.Drain()
+			except (IOError, OSError):
+				continue
+		self.thread = None
+
+
+writer = None
+
+
+def GetWriter():
+	global writer
+	if writer is None:
+		writer = LogWriter()
+	elif writer.pid != os.getpid():
+		#Forked child like a multiprocessing worker may exit without atexit, so it writes lines as they come
+		writer = LogWriter(interval=0)
+	return writer
+
+
+def SetLogConfig(interval='', level=''):
+	if interval != '':
+		os.environ['LOG_FLUSH'] = interval
+	if level != '':
+		os.environ['LOG_LEVEL'] = level
+	if writer is not None and writer.pid == os.getpid():
+		writer.Configure(interval, level)
+
+
+def LogFlush(sync=0):
+	if writer is not None and writer.pid == os.getpid():
+		writer.Drain(sync=(sync != 0))
+
+
+def _close():
+	if writer is not None and writer.pid == os.getpid():
+		writer.Close()
+
+
+atexit.register(_close)
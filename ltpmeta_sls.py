@@ -0,0 +1,219 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Metadata index of ltp tests, min kernel, root, device, commands and drivers, built by one scan of testcases/bin.
+#           1. ScanTest : Reads TST_MIN_KVER, TST_NEEDS_ROOT, TST_NEEDS_DEVICE, TST_NEEDS_CMDS and TST_NEEDS_DRIVERS of a test
+#           2. TestMetadata : Index of test -> metadata, with TooNew for install pruning and Eligible for the scheduler
+#           3. LtpVersion : Version of the ltp build from runltp -e
+#           4. LoadMetadata : Returns index persisted under SLS_DIR, rescans only tests changed since, full scan on a new ltp build
+#
+#  SETUP:   1. Install SLS : ./install_sls.py, ChangeLTP drops tests for newer kernels using the index
+#           2. Start SLS : ./start_sls.py <options>, go_sls.py skips tests the machine cannot run
+#
+
+import os
+import re
+import json
+import shutil
+from command_sls import Execute
+
+META_VERSION = 1
+META_FILE = 'cache/ltp_meta.json'
+#Bytes read to tell a shell test from a binary, binaries are not read any further
+SNIFF_SIZE = 8192
+META_KEYS = re.compile(r'(?:^|[\s;])(TST_MIN_KVER|TST_NEEDS_ROOT|TST_NEEDS_DEVICE|TST_NEEDS_CMDS|TST_NEEDS_DRIVERS)\s*\+?=\s*["\']?([^"\'#\n]*)')
+
+
+def KernelVersion(release=None):
+	if release is None:
+		release = os.uname()[2]
+	match = re.match(r'(\d+)\.(\d+)', release)
+	return (int(match.group(1)), int(match.group(2)))
+
+
+def ScanTest(path):
+	#Only shell tests carry these as text, same as grep which skipped binary files
+	meta = {}
+	with open(path, 'rb') as fp:
+		head = fp.read(SNIFF_SIZE)
+		if b'\0' in head:
+			return meta
+		data = head + fp.read()
+	for match in META_KEYS.finditer(data.decode('utf-8', 'replace')):
+		key, value = match.group(1), match.group(2).strip()
+		if key == 'TST_MIN_KVER':
+			kver = re.match(r'(\d+)\.(\d+)', value)
+			if kver and 'MIN_KVER' not in meta:
+				meta['MIN_KVER'] = [int(kver.group(1)), int(kver.group(2))]
+		elif key == 'TST_NEEDS_ROOT':
+			meta['NEEDS_ROOT'] = value == '1'
+		elif key == 'TST_NEEDS_DEVICE':
+			meta['NEEDS_DEVICE'] = value == '1'
+		elif key == 'TST_NEEDS_CMDS':
+			cmds = meta.setdefault('NEEDS_CMDS', [])
+			cmds.extend(x for x in value.split() if x not in cmds and not x.startswith('$'))
+		elif key == 'TST_NEEDS_DRIVERS':
+			drivers = meta.setdefault('NEEDS_DRIVERS', [])
+			drivers.extend(x for x in value.split() if x not in drivers and not x.startswith('$'))
+	return dict((k, v) for k, v in meta.items() if v)
+
+
+def LtpVersion(ltp_path):
+	result = Execute(['%s/runltp' % ltp_path, '-e'], 30)
+	if result.rc != 0:
+		return ''
+	return result.output.strip()
+
+
+class TestMetadata(object):
+	def __init__(self):
+		self.tests = {}
+		self.files = {}
+		self.signature = {}
+		self._commands = {}
+		self._drivers = None
+
+	def Get(self, test):
+		return self.tests.get(test, {})
+
+	def TooNew(self, kernel=None):
+		if kernel is None:
+			kernel = KernelVersion()
+		too_new = {}
+		for test, meta in self.tests.items():
+			if 'MIN_KVER' in meta and tuple(meta['MIN_KVER']) > kernel:
+				too_new[test] = tuple(meta['MIN_KVER'])
+		return too_new
+
+	def Drivers(self):
+		#Loadable and builtin modules of the running kernel, read once
+		if self._drivers is None:
+			self._drivers = set(os.listdir('/sys/module')) if os.path.isdir('/sys/module') else set()
+			moddir = '/lib/modules/%s' % os.uname()[2]
+			for f in ['modules.dep', 'modules.builtin']:
+				try:
+					with open('%s/%s' % (moddir, f), 'r') as fp:
+						for line in fp:
+							name = os.path.basename(line.split(':')[0].strip())
+							name = re.sub(r'\.ko(\.\w+)?$', '', name)
+							self._drivers.add(name)
+							self._drivers.add(name.replace('-', '_'))
+				except (IOError, OSError):
+					continue
+		return self._drivers
+
+	def HasCommand(self, command):
+		if command not in self._commands:
+			self._commands[command] = shutil.which(command) is not None
+		return self._commands[command]
+
+	def Eligible(self, test, kernel=None):
+		#Returns None if this machine can run the test, else the reason it cannot
+		meta = self.tests.get(test)
+		if not meta:
+			return None
+		if kernel is None:
+			kernel = KernelVersion()
+		if 'MIN_KVER' in meta and tuple(meta['MIN_KVER']) > kernel:
+			return 'needs kernel %d.%d' % tuple(meta['MIN_KVER'])
+		if meta.get('NEEDS_ROOT') and os.geteuid() != 0:
+			return 'needs root'
+		for command in meta.get('NEEDS_CMDS', []):
+			if not self.HasCommand(command):
+				return 'needs command %s' % command
+		drivers = self.Drivers()
+		if len(drivers) != 0:
+			for driver in meta.get('NEEDS_DRIVERS', []):
+				if driver not in drivers and driver.replace('-', '_') not in drivers:
+					return 'needs driver %s' % driver
+		return None
+
+	def ToDict(self):
+		return {'VERSION': META_VERSION, 'SIGNATURE': self.signature, 'FILES': self.files, 'TESTS': self.tests}
+
+	def FromDict(self, data):
+		self.signature = data['SIGNATURE']
+		self.files = data['FILES']
+		self.tests = data['TESTS']
+
+
+def ScanTree(ltpbin, old=None):
+	#Tests whose size and mtime did not change keep their old metadata
+	meta = TestMetadata()
+	try:
+		names = sorted(os.listdir(ltpbin))
+	except OSError:
+		return meta
+	for name in names:
+		path = '%s/%s' % (ltpbin, name)
+		try:
+			st = os.stat(path)
+		except OSError:
+			continue
+		if not os.path.isfile(path):
+			continue
+		stamp = [st.st_size, st.st_mtime]
+		if old is not None and old.files.get(name) == stamp:
+			test_meta = old.tests.get(name)
+		else:
+			try:
+				test_meta = ScanTest(path)
+			except (IOError, OSError):
+				continue
+		meta.files[name] = stamp
+		if test_meta:
+			meta.tests[name] = test_meta
+	return meta
+
+
+def SaveMetadata(meta, sls_logdir):
+	mfile = '%s/%s' % (sls_logdir, META_FILE)
+	mdir = os.path.dirname(mfile)
+	if not os.path.exists(mdir):
+		os.makedirs(mdir)
+	tmpfile = '%s.%d' % (mfile, os.getpid())
+	with open(tmpfile, 'w') as fp:
+		json.dump(meta.ToDict(), fp)
+	os.rename(tmpfile, mfile)
+
+
+def LoadMetadata(sls_logdir, ltp_path=None):
+	if ltp_path is None:
+		ltp_path = os.environ.get('ltp_path', '/opt/ltp')
+	ltpbin = ltp_path + '/testcases/bin'
+	signature = {'LTP_PATH': ltp_path, 'LTP_VERSION': LtpVersion(ltp_path),
+		'BIN_DIR': os.stat(ltpbin).st_mtime if os.path.isdir(ltpbin) else 0}
+
+	old = None
+	mfile = '%s/%s' % (sls_logdir, META_FILE)
+	if os.path.exists(mfile):
+		try:
+			with open(mfile, 'r') as fp:
+				data = json.load(fp)
+			if data['VERSION'] == META_VERSION:
+				old = TestMetadata()
+				old.FromDict(data)
+		except (ValueError, KeyError, IOError, OSError):
+			old = None
+	if old is not None and old.signature == signature:
+		return old
+	#A different ltp build is scanned in full, same build only rescans changed files
+	if old is not None and (old.signature.get('LTP_VERSION') != signature['LTP_VERSION'] or old.signature.get('LTP_PATH') != ltp_path):
+		old = None
+
+	meta = ScanTree(ltpbin, old)
+	meta.signature = signature
+	try:
+		SaveMetadata(meta, sls_logdir)
+	except (IOError, OSError):
+		pass
+	return meta
@@ -0,0 +1,131 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Parses results of one runltp execution without grep/sed over log and html files.
+#           1. ParseLog : Reads Total Tests, Total Skipped Tests and Total Failures from runltp -l log
+#           2. ParseOutput : Reads per iteration status and TPASS/TFAIL/TBROK/TCONF/TWARN lines from runltp -o output
+#           3. ParseResults : Combines both into one result record used by runner_sls.py
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. Functions in ltpresult_sls.py will get called internally from runner_sls.py
+#
+
+import os
+import re
+
+RESULT_TYPES = ['TPASS', 'TFAIL', 'TBROK', 'TCONF', 'TWARN']
+RESULT_LINE = re.compile(r'\b(TPASS|TFAIL|TBROK|TCONF|TWARN)\b')
+
+#Exit status bits of LTP tests, same as used by genhtml.pl for the html totals
+EXIT_FAIL = 1
+EXIT_BROK = 2
+EXIT_WARN = 4
+EXIT_CONF = 32
+
+LOG_TOTALS = {
+	'Total Tests': 'TOTAL_TEST',
+	'Total Skipped Tests': 'TOTAL_SKIP',
+	'Total Failures': 'TOTAL_FAIL',
+}
+
+
+def ParseLog(log_file):
+	totals = {'TOTAL_TEST': 0, 'TOTAL_SKIP': 0, 'TOTAL_FAIL': 0}
+	if not os.path.exists(log_file):
+		return totals
+	with open(log_file, 'r', errors='replace') as fp:
+		for line in fp:
+			if ':' not in line:
+				continue
+			key, value = line.split(':', 1)
+			key = key.strip()
+			if key in LOG_TOTALS:
+				try:
+					totals[LOG_TOTALS[key]] = int(value.strip())
+				except ValueError:
+					continue
+	return totals
+
+
+def ParseOutput(output_file):
+	#One entry per <<<test_start>>> .. <<<test_end>>> block, that is one per iteration
+	iterations = []
+	if not os.path.exists(output_file):
+		return iterations
+	current = None
+	in_output = False
+	with open(output_file, 'r', errors='replace') as fp:
+		for line in fp:
+			if line.startswith('<<<test_start>>>'):
+				current = {'TAG': '', 'TERMINATION_ID': None, 'DURATION': 0}
+				for rtype in RESULT_TYPES:
+					current[rtype] = 0
+				in_output = False
+				continue
+			if current is None:
+				continue
+			if line.startswith('<<<test_output>>>'):
+				in_output = True
+				continue
+			if line.startswith('<<<execution_status>>>'):
+				in_output = False
+				continue
+			if line.startswith('<<<test_end>>>'):
+				iterations.append(current)
+				current = None
+				continue
+			if in_output:
+				match = RESULT_LINE.search(line)
+				if match:
+					current[match.group(1)] += 1
+				continue
+			for field in line.split():
+				if '=' not in field:
+					continue
+				key, value = field.split('=', 1)
+				if key == 'tag':
+					current['TAG'] = value
+				elif key == 'termination_id':
+					try:
+						current['TERMINATION_ID'] = int(value)
+					except ValueError:
+						current['TERMINATION_ID'] = None
+				elif key == 'duration':
+					try:
+						current['DURATION'] = int(value)
+					except ValueError:
+						continue
+	#Output file cut short by a crash or stop, keep what we have
+	if current is not None:
+		iterations.append(current)
+	return iterations
+
+
+def ParseResults(log_file, output_file):
+	result = ParseLog(log_file)
+	iterations = ParseOutput(output_file)
+	result['TOTAL_BROK'] = 0
+	result['TOTAL_CONF'] = 0
+	result['TOTAL_WARN'] = 0
+	for itr in iterations:
+		tid = itr['TERMINATION_ID']
+		if tid is None or tid == 0:
+			continue
+		if tid == EXIT_CONF:
+			result['TOTAL_CONF'] += 1
+		elif tid & EXIT_BROK:
+			result['TOTAL_BROK'] += 1
+		elif tid & EXIT_WARN:
+			result['TOTAL_WARN'] += 1
+	result['ITERATIONS'] = iterations
+	return result
@@ -0,0 +1,207 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: OOM watchdog of go_sls.py, kills running SLS tests when free memory goes below 10% of total memory.
+#           1. PressureTrigger : Opens a /proc/pressure/memory trigger, kernel wakes the watchdog on memory stalls
+#           2. ReadStatus : Reads Name, PPid, NSsid and VmRSS of a process from /proc/<pid>/status
+#           3. TestProcesses : Processes of tests in TestRegistry with their RSS, found by cgroup, session and parent
+#           4. OOMWatchdog : Thread that waits on the trigger, or polls /proc/meminfo without PSI, and kills the
+#                            test using most memory until free memory is above the limit. Deletes ltp interfaces.
+#
+#  SETUP:   1. Start SLS : ./start_sls.py <options>
+#           2. go_sls.py starts OOMWatchdog with its TestRegistry, only processes of registered tests are killed
+#
+
+import os
+import time
+import select
+import signal
+import threading
+from common_sls import lg, RunCommand
+from sampler_sls import ReadMemInfo
+from cgroup_sls import CgroupProcs
+
+#Tests are killed while free memory is at or below this percent of total memory
+OOM_FREE_PERCENT = 10
+#Kernel wakes the watchdog if tasks stall on memory for 150ms within 1s
+PSI_TRIGGER = 'some 150000 1000000'
+#Seconds between /proc/meminfo reads without PSI, and between interface checks with PSI
+OOM_POLL = 0.5
+OOM_IDLE = 2
+#Seconds given to a killed test to free its memory before the next check
+OOM_SETTLE = 0.2
+
+
+def PressureTrigger(trigger=PSI_TRIGGER):
+	#Returns trigger fd, None if kernel has no PSI or does not allow triggers
+	try:
+		fd = os.open('/proc/pressure/memory', os.O_RDWR | os.O_NONBLOCK)
+	except OSError:
+		return None
+	try:
+		os.write(fd, (trigger + '\0').encode())
+	except OSError:
+		os.close(fd)
+		return None
+	return fd
+
+
+def FreeMemPercent():
+	meminfo = ReadMemInfo()
+	total = meminfo.get('MemTotal', 0)
+	if total == 0:
+		return 100.0
+	free_kb = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0) + meminfo.get('SReclaimable', 0)
+	return meminfo.get('MemAvailable', free_kb) * 100.0 / total
+
+
+def ReadStatus(pid):
+	status = {}
+	try:
+		with open('/proc/%d/status' % pid, 'r') as fp:
+			for line in fp:
+				key, _, value = line.partition(':')
+				if key in ['Name', 'PPid', 'NSsid', 'VmRSS']:
+					status[key] = value.strip()
+	except (IOError, OSError):
+		return None
+	if 'PPid' not in status:
+		return None
+	return {'NAME': status.get('Name', ''), 'PPID': int(status['PPid']),
+		'SID': int(status['NSsid'].split()[-1]) if 'NSsid' in status else None,
+		'RSS': int(status.get('VmRSS', '0 kB').split()[0])}
+
+
+def TestProcesses(runs):
+	#Returns {run: [(pid, name, rss kB)]}, a run owns processes of its cgroup, its session and their descendants
+	by_pid = dict((run.pid, run) for run in runs if run.pid is not None)
+	if len(by_pid) == 0:
+		return {}
+	by_cgroup = {}
+	for run in runs:
+		cgroup = run.cgroup
+		if cgroup is not None:
+			by_cgroup.update((pid, run) for pid in CgroupProcs(cgroup))
+	procs = {}
+	for entry in os.listdir('/proc'):
+		if not entry.isdigit():
+			continue
+		status = ReadStatus(int(entry))
+		if status is not None:
+			procs[int(entry)] = status
+
+	owned = {}
+	me = os.getpid()
+	for pid, status in procs.items():
+		if pid == me or pid == 1:
+			continue
+		run = by_cgroup.get(pid)
+		if run is None:
+			run = by_pid.get(status['SID'])
+		#Tests that call setsid still descend from runltp unless reparented
+		parent = pid
+		depth = 0
+		while run is None and parent > 1 and depth < 64:
+			run = by_pid.get(parent)
+			parent = procs[parent]['PPID'] if parent in procs else 0
+			depth += 1
+		if run is not None:
+			owned.setdefault(run, []).append((pid, status['NAME'], status['RSS']))
+	return owned
+
+
+class OOMWatchdog(object):
+	def __init__(self, registry, log, slog, free_percent=OOM_FREE_PERCENT):
+		self.registry = registry
+		self.log = log
+		self.slog = slog
+		self.free_percent = free_percent
+		self.stop = threading.Event()
+		self.thread = None
+		self.fd = None
+
+	def Start(self):
+		self.fd = PressureTrigger()
+		if self.fd is None:
+			lg(self.slog, "[OOMWatchdog] No memory PSI trigger, polling /proc/meminfo every %ss" % OOM_POLL, 0)
+		self.thread = threading.Thread(target=self.Watch)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def Stop(self):
+		self.stop.set()
+		if self.thread is not None and self.thread is not threading.current_thread():
+			self.thread.join(OOM_IDLE + 1)
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+	def Watch(self):
+		poller = None
+		if self.fd is not None:
+			poller = select.poll()
+			poller.register(self.fd, select.POLLPRI)
+		last_idle = 0
+		while not self.stop.is_set():
+			if poller is None:
+				self.stop.wait(OOM_POLL)
+			else:
+				events = poller.poll(OOM_IDLE * 1000)
+				if any(e & select.POLLERR for _, e in events):
+					lg(self.slog, "[OOMWatchdog] Memory PSI trigger failed, polling /proc/meminfo", 0)
+					poller = None
+			if self.stop.is_set():
+				break
+			try:
+				self.Check()
+				if time.time() - last_idle >= OOM_IDLE:
+					last_idle = time.time()
+					self.DeleteInterfaces()
+			except Exception as e:
+				lg(self.slog, "[OOMWatchdog] [error] %s" % str(e), 0)
+
+	def Check(self):
+		killed = set()
+		free_mem_percent = FreeMemPercent()
+		while free_mem_percent <= self.free_percent:
+			lg(self.slog, "Free Memory is %d%%" % free_mem_percent, 0)
+			owned = TestProcesses([x for x in self.registry.Running() if x not in killed])
+			if len(owned) == 0:
+				return
+			run = max(owned, key=lambda x: sum(p[2] for p in owned[x]))
+			self.Kill(run, owned[run])
+			killed.add(run)
+			time.sleep(OOM_SETTLE)
+			free_mem_percent = FreeMemPercent()
+
+	def Kill(self, run, procs):
+		rss = sum(p[2] for p in procs)
+		lg(self.slog, "Free Mem < %d%%. Killing %s of %s, %d processes using %dMB" % (self.free_percent, run.test, run.suite, len(procs), rss // 1024), 0)
+		self.registry.Kill(run)
+		for pid, name, _ in procs:
+			try:
+				os.kill(pid, signal.SIGKILL)
+			except OSError:
+				continue
+			lg(self.log, "Killed %d %s of %s" % (pid, name, run.test), 0)
+
+	def DeleteInterfaces(self):
+		#To remove any local ltp interface getting created. This may impact lab network
+		try:
+			interfaces = os.listdir('/sys/class/net')
+		except OSError:
+			return
+		for i in interfaces:
+			if 'ltp' not in i:
+				continue
+			lg(self.slog, "Deleting unwanted interface %s" % i, 0)
+			RunCommand(['ip', 'link', 'delete', i], self.log, 0)
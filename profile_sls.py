@@ -0,0 +1,139 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Wall clock profiling of SLS hot paths, written to PROFILE.json in TC_OUTPUT.
+#           1. Histogram : Count, total, min, max and log scale buckets of durations of one phase
+#           2. Record : Adds one duration of a phase
+#           3. Profiled : Decorator recording duration of every call of a function
+#           4. CommandTemplate : Reduces a command to its program names, e.g. ls|grep|wc
+#           5. WriteProfile : Writes all histograms of this process to PROFILE.json atomically
+#           6. StartProfile : Starts a thread writing PROFILE.json every PROFILE_FLUSH seconds
+#           7. TopSinks : Phases of a PROFILE.json sorted by total time, used by show_results.py -p
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. go_sls.py starts profiling, ./show_results.py -p shows top time sinks
+#
+
+import os
+import json
+import time
+import threading
+import functools
+
+#Seconds between two PROFILE.json writes
+PROFILE_FLUSH = 60
+PROFILE_FILE = 'PROFILE.json'
+#Upper bounds of histogram buckets in seconds, last bucket takes the rest
+BUCKETS = [0.001, 0.01, 0.1, 1, 10, 100, 1000]
+
+lock = threading.Lock()
+histograms = {}
+
+
+class Histogram(object):
+	def __init__(self):
+		self.count = 0
+		self.total = 0.0
+		self.min = None
+		self.max = 0.0
+		self.buckets = [0] * (len(BUCKETS) + 1)
+
+	def Add(self, seconds):
+		self.count += 1
+		self.total += seconds
+		if self.min is None or seconds < self.min:
+			self.min = seconds
+		if seconds > self.max:
+			self.max = seconds
+		i = 0
+		while i < len(BUCKETS) and seconds > BUCKETS[i]:
+			i += 1
+		self.buckets[i] += 1
+
+	def ToDict(self):
+		return {
+			'COUNT': self.count,
+			'TOTAL': round(self.total, 6),
+			'AVG': round(self.total / self.count, 6) if self.count else 0,
+			'MIN': round(self.min or 0, 6),
+			'MAX': round(self.max, 6),
+			'BUCKETS': list(self.buckets),
+		}
+
+
+def Record(name, seconds):
+	with lock:
+		if name not in histograms:
+			histograms[name] = Histogram()
+		histograms[name].Add(seconds)
+
+
+def Profiled(name):
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			start = time.time()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				Record(name, time.time() - start)
+		return wrapper
+	return decorator
+
+
+def CommandTemplate(command):
+	if isinstance(command, list):
+		return os.path.basename(command[0]) if command else ''
+	programs = []
+	for stage in command.split('|'):
+		words = stage.split()
+		if len(words) == 0:
+			continue
+		programs.append(os.path.basename(words[0]))
+	return '|'.join(programs)
+
+
+def WriteProfile(path, start_time=None):
+	with lock:
+		phases = dict((name, h.ToDict()) for name, h in histograms.items())
+	profile = {'TIME': time.strftime('%Y/%m/%d,%H:%M:%S'), 'PID': os.getpid(), 'BUCKET_LIMITS': BUCKETS, 'PHASES': phases}
+	if start_time is not None:
+		profile['ELAPSED'] = round(time.time() - start_time, 3)
+	tmpfile = '%s.%d.tmp' % (path, os.getpid())
+	with open(tmpfile, 'w') as g:
+		json.dump(profile, g, indent=1, sort_keys=True)
+	os.rename(tmpfile, path)
+
+
+def StartProfile(path, interval=PROFILE_FLUSH):
+	start_time = time.time()
+
+	def writer():
+		while True:
+			time.sleep(interval)
+			try:
+				WriteProfile(path, start_time)
+			except (IOError, OSError):
+				continue
+
+	th = threading.Thread(target=writer)
+	th.daemon = True
+	th.start()
+	return start_time
+
+
+def TopSinks(path, top=10):
+	with open(path, 'r') as g:
+		profile = json.load(g)
+	phases = sorted(profile['PHASES'].items(), key=lambda x: x[1]['TOTAL'], reverse=True)
+	return profile, phases[:top]
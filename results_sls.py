@@ -0,0 +1,281 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Aggregates LTP test results into REPORT.json.
+#           1. WriteReport : Writes REPORT.json atomically via temp file and rename
+#           2. ResultAggregator : Keeps running totals of all test results, owned by go_sls.py
+#              REPORT.json is a periodic snapshot, RESULTS.jsonl journal is the durable result store
+#           3. SendResult : Sends one test result record to the aggregator of go_sls.py
+#           4. AppendJournal : Appends one test result record to RESULTS.jsonl journal in TC_OUTPUT
+#           5. ReadJournal : Reads all complete records from RESULTS.jsonl journal
+#           6. CompactJournal : Rebuilds REPORT.json from RESULTS.jsonl journal
+#           7. UpdateReport : Rebuilds REPORT.json under ltp.lock, used when go_sls.py is not reachable
+#           8. ReportStart : Start time of a run from RUNTIME of its REPORT.json, for stop_sls.py
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. go_sls.py starts the aggregator, run_test.py sends results to it.
+#
+
+import os
+import re
+import json
+import time
+import fcntl
+import socket
+import datetime
+import threading
+from profile_sls import Record
+
+#Seconds between two REPORT.json writes by the aggregator
+REPORT_FLUSH = 10
+RESULT_SOCKET = 'sls_results.sock'
+RESULT_JOURNAL = 'RESULTS.jsonl'
+RESULT_KEYS = ['TOTAL_ITRN', 'TOTAL_FAIL', 'TOTAL_PASS', 'TOTAL_BROK', 'TOTAL_SKIP', 'TOTAL_CONF', 'TOTAL_HUNG']
+
+
+def WriteReport(master_file, report):
+	tmpfile = '%s.%d.tmp' % (master_file, os.getpid())
+	with open(tmpfile, 'w') as g:
+		json.dump(report, g)
+	os.rename(tmpfile, master_file)
+
+
+def ResultCategory(result):
+	#A test is counted once in OVERVIEW, by its worst result
+	if result.get('TOTAL_HUNG', 0) != 0:
+		return 'HU'
+	elif result['TOTAL_FAIL'] != 0:
+		return 'FL'
+	elif result['TOTAL_CONF'] != 0:
+		return 'CO'
+	elif result['TOTAL_BROK'] != 0:
+		return 'BR'
+	elif result['TOTAL_SKIP'] != 0:
+		return 'WA'
+	elif result['TOTAL_PASS'] != 0:
+		return 'TP'
+	return None
+
+
+class ResultAggregator(object):
+	def __init__(self, master_file, start_time, sock_path=None, journal=None):
+		self.master_file = master_file
+		self.start_time = start_time
+		self.sock_path = sock_path
+		self.journal = journal
+		self.lock = threading.Lock()
+		self.stop = threading.Event()
+		self.dirty = False
+		self.threads = []
+		self.sock = None
+		self.tests = {}
+		self.totals = dict((k, 0) for k in RESULT_KEYS)
+		self.counts = {'TC': 0, 'TP': 0, 'FL': 0, 'BR': 0, 'WA': 0, 'CO': 0, 'HU': 0}
+		self.status = 'In Progress'
+
+	def Load(self):
+		with open(self.master_file, 'r') as g:
+			report = json.load(g)
+		self.status = report['RESULTS']['STATUS']
+		for test, result in report['TESTS'].items():
+			self.Add(test, result)
+
+	def LoadJournal(self, journal):
+		with self.lock:
+			self.tests = {}
+			self.totals = dict((k, 0) for k in RESULT_KEYS)
+			self.counts = dict((k, 0) for k in self.counts)
+		for record in ReadJournal(journal):
+			self.Add(record['TEST'], record)
+
+	def Add(self, test, result):
+		with self.lock:
+			old = self.tests.get(test)
+			if old is None:
+				new = dict((k, 0) for k in RESULT_KEYS)
+			else:
+				new = dict((k, 0) for k in RESULT_KEYS)
+				new.update(old)
+				if old['TOTAL_ITRN'] != 0 or old.get('TOTAL_HUNG', 0) != 0:
+					self.counts['TC'] -= 1
+				category = ResultCategory(old)
+				if category is not None:
+					self.counts[category] -= 1
+			#Records written before TOTAL_HUNG existed count as not hung
+			for k in RESULT_KEYS:
+				new[k] += int(result.get(k, 0))
+				self.totals[k] += int(result.get(k, 0))
+			if new['TOTAL_ITRN'] != 0 or new['TOTAL_HUNG'] != 0:
+				self.counts['TC'] += 1
+			category = ResultCategory(new)
+			if category is not None:
+				self.counts[category] += 1
+			self.tests[test] = new
+			self.dirty = True
+
+	def SetStatus(self, status):
+		with self.lock:
+			self.status = status
+			self.dirty = True
+
+	def Report(self):
+		RESULTS = {}
+		TOT_ITRN = self.totals['TOTAL_ITRN']
+		for key in ['PASS', 'FAIL', 'SKIP', 'CONF', 'BROK']:
+			if TOT_ITRN == 0:
+				RESULTS['%s%%' % key] = 0
+			else:
+				RESULTS['%s%%' % key] = round((100 * self.totals['TOTAL_%s' % key]) / TOT_ITRN)
+		RESULTS['STATUS'] = self.status
+		CURRENT_TIME = datetime.datetime.now().replace(microsecond=0)
+		RESULTS['RUNTIME'] = str(abs(CURRENT_TIME - self.start_time.replace(microsecond=0)))
+		T = self.totals; C = self.counts
+		RESULTS['OVERVIEW'] = "TEST_CASES(%d) | TOTAL_ITR(%d/%d) | TOTAL_PASS(%d/%d) | TOTAL_FAIL(%d/%d) | TOTAL_BROK(%d/%d) | TOTAL_SKIP(%d/%d) | TOTAL_CONF(%d/%d) | TOTAL_HUNG(%d/%d)" % (C['TC'],T['TOTAL_ITRN'],C['TC'],T['TOTAL_PASS'],C['TP'],T['TOTAL_FAIL'],C['FL'],T['TOTAL_BROK'],C['BR'],T['TOTAL_SKIP'],C['WA'],T['TOTAL_CONF'],C['CO'],T['TOTAL_HUNG'],C['HU'])
+		if self.totals['TOTAL_ITRN'] == 0 and len(self.tests) == 0:
+			RESULTS['OVERVIEW'] = ''
+		return {'RESULTS': RESULTS, 'TESTS': self.tests}
+
+	def Flush(self):
+		start = time.time()
+		with self.lock:
+			report = self.Report()
+			self.dirty = False
+			WriteReport(self.master_file, report)
+		Record('REPORT.json write', time.time() - start)
+
+	def Start(self):
+		self.Flush()
+		if self.sock_path is not None:
+			if os.path.exists(self.sock_path):
+				os.remove(self.sock_path)
+			self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+			self.sock.bind(self.sock_path)
+			self.sock.settimeout(1)
+			th = threading.Thread(target=self._receive)
+			th.daemon = True
+			th.start()
+			self.threads.append(th)
+		th = threading.Thread(target=self._flusher)
+		th.daemon = True
+		th.start()
+		self.threads.append(th)
+
+	def Stop(self):
+		self.stop.set()
+		for th in self.threads:
+			th.join()
+		if self.sock is not None:
+			self.sock.close()
+			if os.path.exists(self.sock_path):
+				os.remove(self.sock_path)
+		#Journal is the durable copy, final REPORT.json is compacted from it
+		if self.journal is not None:
+			self.LoadJournal(self.journal)
+		self.Flush()
+
+	def _receive(self):
+		while not self.stop.is_set():
+			try:
+				data = self.sock.recv(65536)
+			except socket.timeout:
+				continue
+			try:
+				record = json.loads(data.decode('utf-8'))
+				self.Add(record['TEST'], record)
+			except (ValueError, KeyError):
+				continue
+
+	def _flusher(self):
+		while not self.stop.wait(REPORT_FLUSH):
+			if self.dirty:
+				self.Flush()
+
+
+def SendResult(sock_path, record):
+	if not os.path.exists(sock_path):
+		return 1
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+	try:
+		sock.sendto(json.dumps(record).encode('utf-8'), sock_path)
+	except (IOError, OSError):
+		return 1
+	finally:
+		sock.close()
+	return 0
+
+
+def AppendJournal(journal, record):
+	#One write of one line on an O_APPEND descriptor, a crash loses at most this record
+	line = json.dumps(record, sort_keys=True) + '\n'
+	fd = os.open(journal, os.O_WRONLY|os.O_APPEND|os.O_CREAT, 0o644)
+	try:
+		os.write(fd, line.encode('utf-8'))
+	finally:
+		os.close(fd)
+
+
+def ReadJournal(journal):
+	if not os.path.exists(journal):
+		return
+	with open(journal, 'r') as g:
+		for line in g:
+			#Last line may be cut short by a crash, skip anything that does not parse
+			if not line.endswith('\n'):
+				continue
+			try:
+				record = json.loads(line)
+			except ValueError:
+				continue
+			if 'TEST' not in record:
+				continue
+			yield record
+
+
+def CompactJournal(journal, master_file, start_time, status=None):
+	aggregator = ResultAggregator(master_file, start_time)
+	if status is None and os.path.exists(master_file):
+		try:
+			with open(master_file, 'r') as g:
+				status = json.load(g)['RESULTS']['STATUS']
+		except (ValueError, KeyError):
+			status = None
+	if status is not None:
+		aggregator.SetStatus(status)
+	aggregator.LoadJournal(journal)
+	aggregator.Flush()
+
+
+def ReportStart(master_file):
+	#RUNTIME is str() of a timedelta, counted up to the last write of REPORT.json
+	with open(master_file, 'r') as g:
+		runtime = json.load(g)['RESULTS'].get('RUNTIME', '')
+	end = datetime.datetime.fromtimestamp(os.path.getmtime(master_file))
+	m = re.match(r'(?:(\d+) days?, )?(\d+):(\d+):(\d+)$', runtime)
+	if m is None:
+		return end
+	days, hours, minutes, seconds = [int(x) if x else 0 for x in m.groups()]
+	return end - datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def UpdateReport(master_file, journal, start_time, logdir):
+	lock_file = open('%s/ltp.lock' % logdir, "w")
+	while True:
+		try:
+			fcntl.lockf(lock_file.fileno(), fcntl.LOCK_EX|fcntl.LOCK_NB)
+		except IOError:
+			time.sleep(1)
+		else:
+			break
+	CompactJournal(journal, master_file, start_time)
+	fcntl.flock(lock_file, fcntl.LOCK_UN)
+	lock_file.close()
@@ -0,0 +1,461 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Launches one LTP test through runltp and post processes its results.
+#           Used in process by go_sls.py and by the standalone run_test.py
+#           1. GetIODir : Picks a random /tmp/ltp_io* directory for IO tests of run_test.py, go_sls.py uses IOAllocator
+#           2. RuntestCommand : Builds runltp argument list for a test
+#           3. StartTest : Starts runltp for a test with subprocess, returns a TestRun
+#           4. RemoveInProgress : Removes test line from IN-PROGRESS-TEST file of standalone run_test.py, under flock
+#           5. TestResults : Parses runltp log and output into a result record
+#           6. FinishTest : Waits for a TestRun up to its timeout and returns its result record
+#              HangTest : Captures stack and wchan of a hung test, then kills it with SIGTERM and SIGKILL
+#           7. TestRegistry : Running tests of go_sls.py with PID, process group, cgroup and start time. Writes
+#                             IN-PROGRESS-TEST by atomic rename on change and serves it on sls_status.sock
+#           8. QueryStatus : Running tests from sls_status.sock of go_sls.py, None if go_sls.py is not running
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. Functions in runner_sls.py will get called internally from go_sls.py and run_test.py
+#
+
+import os
+import re
+import signal
+import fcntl
+import random
+import datetime
+import threading
+import subprocess
+import socket
+import json
+from common_sls import lg
+from command_sls import ListDir
+from ltpresult_sls import ParseResults
+from cgroup_sls import KillCgroup
+from oomwatch_sls import TestProcesses
+
+#Seconds a hung test gets between SIGTERM and SIGKILL
+HANG_GRACE = 30
+
+#Unix socket of go_sls.py returning running tests as JSON, read by show_results.py -i
+STATUS_SOCKET = 'sls_status.sock'
+
+
+class TestRun(object):
+	def __init__(self, test, iterations, suite, scenario=-1):
+		self.test = test
+		self.iterations = iterations
+		self.suite = suite
+		self.scenario = scenario
+		self.start = datetime.datetime.now()
+		self.end = None
+		self.proc = None
+		self.pid = None
+		self.pgid = None
+		self.returncode = None
+		self.io_dir = None
+		self.cgroup = None
+		self.cgroup_class = None
+		#Seconds the test may run, None waits forever
+		self.timeout = None
+		self.hung = False
+		c_time = self.start.strftime('%Y%m%d%H%M%S')
+		#results and output may live under LTP_RESULTS, away from the ltp binaries
+		ltp_results = os.environ.get('ltp_results', os.environ['ltp_path'])
+		self.log_file = "%s/results/%s_%s" % (ltp_results, test, c_time)
+		self.output_file = "%s/output/%s_%s" % (ltp_results, test, c_time)
+		self.html_file = "%s/LTP_HTML_LOG/%s.html" % (os.environ['TC_HTML_PATH'], test)
+
+	def Wait(self, timeout=None):
+		self.returncode = self.proc.wait(timeout)
+		self.end = datetime.datetime.now()
+		return self.returncode
+
+
+def GetIODir(tlog):
+	iodirs = ['/tmp/%s' % x for x in ListDir('/tmp', 'ltp_io') if os.path.isdir('/tmp/%s' % x)]
+	if len(iodirs) == 0:
+		return '/tmp'
+	return random.choice(iodirs)
+
+
+def RuntestCommand(run, io_dir=None):
+	ltp_path = os.environ['ltp_path']
+	command = ['%s/runltp' % ltp_path, '-I', str(run.iterations), '-f', run.suite, '-s', run.test,
+		'-g', run.html_file, '-C', '/tmp/FAILCMDFILE', '-T', '/tmp/TCONFCMDFILE',
+		'-o', run.output_file, '-l', run.log_file, '-p']
+	if io_dir is not None:
+		command.extend(['-d', io_dir])
+	return command
+
+
+def StartTest(test, iterations, suite, tlog, scenario=-1, run=None, iotargets=None, cgroups=None):
+	if run is None:
+		run = TestRun(test, iterations, suite, scenario)
+	for d in [os.path.dirname(run.log_file), os.path.dirname(run.output_file)]:
+		if not os.path.exists(d):
+			os.makedirs(d)
+
+	#If its a IO test then give temp dir
+	io_dir = None
+	if re.search(suite, os.environ['IO_LIST'], re.M):
+		if iotargets is None:
+			io_dir = GetIODir(tlog)
+		else:
+			io_dir = iotargets.Acquire(run)
+	run.io_dir = io_dir
+	command = RuntestCommand(run, io_dir)
+	if cgroups is not None:
+		cgroups.Create(run)
+		command = cgroups.Command(run, command)
+
+	#Own process group per test, so a test can be killed with all its children
+	devnull = open(os.devnull, 'w')
+	stdin = subprocess.PIPE if run.cgroup is not None else None
+	run.proc = subprocess.Popen(command, stdin=stdin, stdout=devnull, stderr=devnull, start_new_session=True)
+	devnull.close()
+	run.pid = run.proc.pid
+	run.pgid = run.proc.pid
+	if run.cgroup is not None:
+		#Test outside its cgroup would escape KillCgroup and report stats of an empty cgroup, it is not run
+		try:
+			cgroups.Join(run, run.proc)
+		except (IOError, OSError) as e:
+			lg(tlog, "[StartTest] [error] %s could not join %s: %s, not run" % (test, run.cgroup, str(e)), 0, 1)
+			raise
+	return run
+
+
+def ReplaceFile(path, data):
+	#Readers see the old or the new file, never a partly written one. Data and rename are synced,
+	#so the file is current after a panic
+	tmpfile = '%s.%d.tmp' % (path, os.getpid())
+	with open(tmpfile, 'w') as g:
+		g.write(data)
+		g.flush()
+		os.fsync(g.fileno())
+	os.rename(tmpfile, path)
+	dfd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+	try:
+		os.fsync(dfd)
+	finally:
+		os.close(dfd)
+
+
+def InProgressLine(status):
+	hung = ' HUNG' if status['HUNG'] else ''
+	return "%s:%s:%d: %s%s\n" % (status['TEST'], status['SUITE'], status['ITERATIONS'], status['START'], hung)
+
+
+def RemoveInProgress(test, logdir):
+	#Standalone run_test.py only, tests of go_sls.py are in its TestRegistry
+	in_progess_file = os.environ['TC_OUTPUT'] + '/IN-PROGRESS-TEST'
+	with open('%s/ltp_inprogress.lock' % logdir, 'w') as lock_file:
+		#flock blocks in the kernel and also excludes threads of this process
+		fcntl.flock(lock_file, fcntl.LOCK_EX)
+		try:
+			with open(in_progess_file, 'r') as g:
+				ITESTS = g.readlines()
+			inprog_tests = [x for x in ITESTS if ':' in x and x.split(':')[0] != test]
+			if len(inprog_tests) != len([x for x in ITESTS if ':' in x]):
+				ReplaceFile(in_progess_file, ''.join(inprog_tests))
+		except (IOError, OSError):
+			pass
+		fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def TestResults(run, logdir, tlog):
+	#Read TOTAL_TEST TOTAL_SKIP TOTAL_FAIL from log file and TOTAL_BROK TOTAL_CONF from output file
+	LTP_RESULT = ParseResults(run.log_file, run.output_file)
+	TOTAL_TEST = LTP_RESULT['TOTAL_TEST']
+	TOTAL_SKIP = LTP_RESULT['TOTAL_SKIP']
+	TOTAL_FAIL = LTP_RESULT['TOTAL_FAIL']
+	TOTAL_BROK = LTP_RESULT['TOTAL_BROK']
+	TOTAL_CONF = LTP_RESULT['TOTAL_CONF']
+
+	TOTAL_PASS = TOTAL_TEST - TOTAL_SKIP - TOTAL_FAIL - TOTAL_CONF
+	if TOTAL_PASS < 0:
+		TOTAL_PASS = 0
+
+	if TOTAL_CONF == TOTAL_SKIP:
+		TOTAL_SKIP = 0
+
+	#A killed hung test parses to TOTAL_TEST 0, it is slow or hung, not SKIP/CONF/BROK
+	if (TOTAL_CONF + TOTAL_SKIP + TOTAL_BROK) >= TOTAL_TEST and not run.hung:
+		with open('%s/sls_skip_conf_brok' % logdir, 'a') as g:
+			g.write('%s:%s\n' % (run.test, run.suite))
+
+	test_results = {}
+	test_results['TOTAL_ITRN'] = TOTAL_TEST
+	test_results['TOTAL_FAIL'] = TOTAL_FAIL
+	test_results['TOTAL_PASS'] = TOTAL_PASS
+	test_results['TOTAL_BROK'] = TOTAL_BROK
+	test_results['TOTAL_SKIP'] = TOTAL_SKIP
+	test_results['TOTAL_CONF'] = TOTAL_CONF
+	test_results['TOTAL_WARN'] = LTP_RESULT['TOTAL_WARN']
+	test_results['TOTAL_HUNG'] = 1 if run.hung else 0
+	test_results['TEST'] = run.test
+	test_results['SUITE'] = run.suite
+	test_results['ITERATIONS'] = run.iterations
+	test_results['SCENARIO'] = run.scenario
+	test_results['START'] = run.start.strftime('%Y-%m-%d %H:%M:%S')
+	test_results['END'] = run.end.strftime('%Y-%m-%d %H:%M:%S')
+	return test_results
+
+
+def CaptureStacks(run, sysrq=False):
+	#Kernel stack, wchan and state of every process of the test, written before the kill
+	lines = ["%s of %s, %d iterations, started %s, timeout %ss\n" % (run.test, run.suite, run.iterations, run.start, run.timeout)]
+	for pid, name, _ in sorted(TestProcesses([run]).get(run, [])):
+		lines.append("\n%d %s\n" % (pid, name))
+		for f in ['status', 'wchan', 'stack']:
+			try:
+				with open('/proc/%d/%s' % (pid, f), 'r') as fp:
+					data = fp.read()
+			except (IOError, OSError) as e:
+				data = str(e)
+			if f == 'status':
+				data = ''.join(x for x in data.splitlines(True) if x.startswith('State:'))
+			elif f == 'wchan':
+				data = 'wchan: %s\n' % data
+			lines.append(data)
+	if sysrq:
+		#Blocked tasks of the whole machine go to dmesg
+		try:
+			with open('/proc/sysrq-trigger', 'w') as fp:
+				fp.write('w')
+			lines.append("\nsysrq w written, blocked tasks are in dmesg\n")
+		except (IOError, OSError) as e:
+			lines.append("\nsysrq w failed: %s\n" % str(e))
+
+	hung_dir = os.environ['TC_OUTPUT'] + '/HUNG'
+	if not os.path.exists(hung_dir):
+		os.makedirs(hung_dir)
+	stack_file = '%s/%s.stack' % (hung_dir, os.path.basename(run.log_file))
+	with open(stack_file, 'w') as g:
+		g.write(''.join(lines))
+	return stack_file
+
+
+def SignalTest(run, sig, registry=None):
+	#Process group and cgroup of runltp, and tests ltp-pan moved to their own process groups
+	procs = TestProcesses([run]).get(run, [])
+	if registry is not None:
+		registry.Kill(run, sig)
+	elif run.pgid is not None:
+		try:
+			os.killpg(run.pgid, sig)
+		except OSError:
+			pass
+	for pid, _, _ in procs:
+		try:
+			os.kill(pid, sig)
+		except OSError:
+			continue
+
+
+def HangTest(run, tlog, registry=None, sysrq=False):
+	run.hung = True
+	if registry is not None:
+		registry.WriteInProgress()
+	stack_file = CaptureStacks(run, sysrq)
+	lg(tlog, "[HangTest] [warning] %s of %s hung for %ss, stacks in %s, sending SIGTERM" % (run.test, run.suite, run.timeout, stack_file), 0, 1)
+	SignalTest(run, signal.SIGTERM, registry)
+	try:
+		run.Wait(HANG_GRACE)
+		return
+	except subprocess.TimeoutExpired:
+		pass
+	lg(tlog, "[HangTest] [warning] %s did not exit %ds after SIGTERM, sending SIGKILL" % (run.test, HANG_GRACE), 0, 1)
+	SignalTest(run, signal.SIGKILL, registry)
+	run.Wait()
+
+
+def FinishTest(run, logdir, tlog, registry=None, cgroups=None, sysrq=False):
+	if run.end is None:
+		try:
+			run.Wait(run.timeout)
+		except subprocess.TimeoutExpired:
+			HangTest(run, tlog, registry, sysrq)
+	#Leftover children of runltp are killed with the cgroup, before the test leaves the registry
+	stats = None
+	if cgroups is not None:
+		stats = cgroups.Release(run)
+	if registry is None:
+		RemoveInProgress(run.test, logdir)
+	else:
+		registry.Unregister(run)
+	test_results = TestResults(run, logdir, tlog)
+	if stats is not None:
+		test_results['CGROUP'] = stats
+	return test_results
+
+
+class TestRegistry(object):
+	def __init__(self, logdir, in_progess_file=None):
+		self.logdir = logdir
+		if in_progess_file is None:
+			in_progess_file = os.environ['TC_OUTPUT'] + '/IN-PROGRESS-TEST'
+		self.in_progess_file = in_progess_file
+		#Reentrant, the signal handler of go_sls.py runs on the main thread, maybe inside Register
+		self.lock = threading.RLock()
+		self.runs = {}
+		#Changes are counted under lock, one writer thread turns them into IN-PROGRESS-TEST
+		self.changed = threading.Condition(self.lock)
+		self.version = 0
+		self.writer = None
+		self.write_lock = threading.Lock()
+		self.written = None
+		self.sock = None
+
+	def Register(self, test, iterations, suite, scenario=-1):
+		#Registered before the thread starts runltp, so duplicate checks see it at once. Written through
+		#to IN-PROGRESS-TEST, a panic caused by the test then finds it there
+		run = TestRun(test, iterations, suite, scenario)
+		with self.lock:
+			self.runs.setdefault(test, []).append(run)
+		try:
+			self.Flush()
+		except (IOError, OSError):
+			self.WriteInProgress()
+		return run
+
+	def Unregister(self, run):
+		with self.lock:
+			runs = self.runs.get(run.test, [])
+			if run in runs:
+				runs.remove(run)
+			if len(runs) == 0 and run.test in self.runs:
+				del self.runs[run.test]
+		self.WriteInProgress()
+
+	def IsRunning(self, test):
+		with self.lock:
+			return test in self.runs
+
+	def Running(self):
+		with self.lock:
+			return [run for runs in self.runs.values() for run in runs]
+
+	def Count(self):
+		with self.lock:
+			return sum(len(runs) for runs in self.runs.values())
+
+	def Status(self):
+		status = []
+		for run in sorted(self.Running(), key=lambda x: x.start):
+			status.append({'TEST': run.test, 'SUITE': run.suite, 'ITERATIONS': run.iterations, 'SCENARIO': run.scenario,
+				'START': run.start.strftime('%Y/%m/%d,%H:%M:%S'), 'PID': run.pid, 'TIMEOUT': run.timeout,
+				'HUNG': run.hung, 'IO_DIR': run.io_dir, 'CGROUP': run.cgroup})
+		return status
+
+	def InProgressLines(self):
+		return [InProgressLine(x) for x in self.Status()]
+
+	def WriteInProgress(self):
+		#Returns at once, the writer thread writes the latest state once for any number of changes.
+		#Used for completions and HUNG marks, a test that ended cannot be the cause of a later panic
+		with self.lock:
+			self.version += 1
+			self.changed.notify()
+			if self.writer is None:
+				self.writer = threading.Thread(target=self._writer)
+				self.writer.daemon = True
+				self.writer.start()
+
+	def Flush(self, blocking=True):
+		#State is read under write_lock, a slower concurrent Flush cannot replace it with an older one.
+		#Signal handlers pass blocking=False, the Flush they interrupted holds write_lock. Returns 0 if skipped
+		if not self.write_lock.acquire(blocking):
+			return 0
+		try:
+			data = ''.join(self.InProgressLines())
+			if data != self.written:
+				ReplaceFile(self.in_progess_file, data)
+				self.written = data
+		finally:
+			self.write_lock.release()
+		return 1
+
+	def _writer(self):
+		version = 0
+		while True:
+			with self.lock:
+				while self.version == version:
+					self.changed.wait()
+				version = self.version
+			try:
+				self.Flush()
+			except (IOError, OSError):
+				continue
+
+	def Serve(self, sock_path):
+		#One JSON status per connection, show_results.py -i reads it instead of IN-PROGRESS-TEST
+		if os.path.exists(sock_path):
+			os.remove(sock_path)
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.sock.bind(sock_path)
+		self.sock.listen(8)
+		th = threading.Thread(target=self._serve)
+		th.daemon = True
+		th.start()
+
+	def _serve(self):
+		while True:
+			try:
+				conn, _ = self.sock.accept()
+			except (IOError, OSError):
+				return
+			try:
+				conn.sendall(json.dumps({'RUNNING': self.Status()}).encode('utf-8'))
+			except (IOError, OSError):
+				pass
+			finally:
+				conn.close()
+
+	def Kill(self, run, sig=signal.SIGKILL):
+		#cgroup also has children which left the process group of runltp
+		cgroup = run.cgroup
+		if cgroup is not None:
+			KillCgroup(cgroup, sig)
+		if run.pgid is None:
+			return 1
+		try:
+			os.killpg(run.pgid, sig)
+		except OSError:
+			return 1
+		return 0
+
+	def KillAll(self, sig=signal.SIGKILL):
+		for run in self.Running():
+			self.Kill(run, sig)
+
+
+def QueryStatus(sock_path, timeout=2):
+	if not os.path.exists(sock_path):
+		return None
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	sock.settimeout(timeout)
+	data = b''
+	try:
+		sock.connect(sock_path)
+		while True:
+			chunk = sock.recv(65536)
+			if not chunk:
+				break
+			data += chunk
+		return json.loads(data.decode('utf-8'))['RUNNING']
+	except (IOError, OSError, ValueError, KeyError):
+		return None
+	finally:
+		sock.close()
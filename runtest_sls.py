@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Single pass rewriter of ltp runtest files and rsh based scripts of testcases/bin, used by ChangeLTP.
+#           1. Filter : Lines to drop, strings to replace and lines to append in a set of files
+#           2. TooNew tests : Tests whose TST_MIN_KVER is newer than the running kernel, from ltpmeta_sls.py index
+#           3. LTPFilters : Filter list of SLS, rsh to ssh, $TMPDIR, arch _16, kernel version, IPV6 and NFSv3 UDP
+#           4. RewriteFiles : Loads each file once, applies all filters and writes each changed file once atomically
+#           5. Dry run : ./runtest_sls.py -n prints the unified diff without changing any file
+#
+#  SETUP:   1. Install SLS : ./install_sls.py, runs ChangeLTP which rewrites the ltp tree
+#           2. ./runtest_sls.py -n shows what ChangeLTP would change in LTPROOT of sls_config
+#
+
+import os
+import sys
+import difflib
+import argparse
+from ltpmeta_sls import ScanTree, LoadMetadata
+
+#Substrings of runtest lines of IPV6 tests
+IPV6_PATTERNS = ['-6', 'v6', 'ipv6', 'route6', 'mcast6']
+#ltp-pan runs nfs06 with NFSv3 only over TCP
+NFS06_LINES = ["nfs01_06  nfs06 -v '3,4,4,4' -t 'tcp,tcp,tcp,tcp' \n",
+	"nfs02_06 nfs06 -v '4,4.1,4.2,4.2,4.2' -t 'tcp,tcp,tcp,tcp,tcp' \n"]
+
+
+class Filter(object):
+	def __init__(self, name, files=None, drop=None, replace=None, append=None):
+		#files None means every runtest file
+		self.name = name
+		self.files = files
+		self.drop = drop or []
+		self.replace = replace or []
+		self.append = append or []
+
+	def Applies(self, fname, runtest):
+		if self.files is None:
+			return runtest
+		return fname in self.files
+
+	def Apply(self, lines):
+		out = []
+		dropped = 0
+		for line in lines:
+			if any(d in line for d in self.drop):
+				dropped += 1
+				continue
+			for old, new in self.replace:
+				line = line.replace(old, new)
+			out.append(line)
+		if len(self.append) != 0:
+			if len(out) != 0 and not out[-1].endswith('\n'):
+				out[-1] = out[-1] + '\n'
+			out.extend(self.append)
+		return out, dropped
+
+
+def LTPFilters(ltp_path, arch=None, kernel=None, too_new=None):
+	ltpbin = ltp_path + '/testcases/bin'
+	if arch is None:
+		arch = os.uname()[4]
+	if too_new is None:
+		too_new = ScanTree(ltpbin).TooNew(kernel)
+	filters = [
+		Filter('rsh to ssh', ['testcases/bin/rcp01.sh', 'testcases/bin/ftp01.sh'], replace=[('rsh', 'ssh')]),
+		Filter('rsh to ssh', ['testcases/bin/check_envval'], replace=[('exists cut locale rsh', 'exists cut locale ssh')]),
+		Filter('IO tests use $TMPDIR', ['runtest/lvm.part1', 'runtest/lvm.part2', 'runtest/scsi_debug.part1'], replace=[('/test/', '$TMPDIR/')]),
+		Filter('IO tests use $TMPDIR', ['runtest/fcntl-locktests'], replace=[('/tmp/', '$TMPDIR/')]),
+	]
+	if arch in ['ppc64', 'ppc64le']:
+		filters.append(Filter('unsupported _16 syscalls', ['runtest/syscalls'], drop=['_16']))
+	if len(too_new) != 0:
+		filters.append(Filter('newer kernel tests', drop=sorted(too_new)))
+	filters.append(Filter('IPV6 tests', drop=IPV6_PATTERNS))
+	filters.append(Filter('NFSv3 UDP tests', ['runtest/net.nfs'], drop=['-v 3 -t udp', 'nfs01_06', 'nfs02_06'], append=NFS06_LINES))
+	return filters
+
+
+def RuntestFiles(ltp_path):
+	runtest = ltp_path + '/runtest'
+	try:
+		return ['runtest/%s' % x for x in sorted(os.listdir(runtest)) if os.path.isfile('%s/%s' % (runtest, x))]
+	except OSError:
+		return []
+
+
+def WriteAtomic(path, lines):
+	tmpfile = '%s.%d.new' % (path, os.getpid())
+	with open(tmpfile, 'w') as g:
+		g.write(''.join(lines))
+	os.chmod(tmpfile, os.stat(path).st_mode & 0o7777)
+	os.rename(tmpfile, path)
+
+
+def RewriteFiles(ltp_path, filters, dry_run=False):
+	#Returns changed files with their diff and dropped line count per filter
+	runtest_files = RuntestFiles(ltp_path)
+	fnames = list(runtest_files)
+	for f in filters:
+		if f.files is not None:
+			fnames.extend(x for x in f.files if x not in fnames)
+	changes = []
+	for fname in fnames:
+		path = '%s/%s' % (ltp_path, fname)
+		if not os.path.isfile(path):
+			continue
+		wanted = [f for f in filters if f.Applies(fname, fname in runtest_files)]
+		if len(wanted) == 0:
+			continue
+		with open(path, 'r', errors='replace') as fp:
+			old = fp.readlines()
+		new = old
+		dropped = {}
+		for f in wanted:
+			new, count = f.Apply(new)
+			if count != 0:
+				dropped[f.name] = dropped.get(f.name, 0) + count
+		if new == old:
+			continue
+		diff = ''.join(difflib.unified_diff(old, new, 'a/' + fname, 'b/' + fname))
+		changes.append({'FILE': fname, 'DROPPED': dropped, 'DIFF': diff})
+		if not dry_run:
+			WriteAtomic(path, new)
+	return changes
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Rewrite ltp runtest files for SLS')
+	parser.add_argument('-n', action="store_true", dest="n", help='Dry run, print diff and do not change files')
+	args = parser.parse_args()
+
+	from common_sls import GetVars
+	ltp_vars = GetVars()
+	if ltp_vars is None:
+		sys.exit(1)
+	ltp_path = os.environ['ltp_path']
+	sls_logdir = ltp_vars.get('SLS_DIR', '').strip() or '/var/log/sls'
+	too_new = LoadMetadata(sls_logdir, ltp_path).TooNew()
+	changes = RewriteFiles(ltp_path, LTPFilters(ltp_path, too_new=too_new), args.n)
+	for change in changes:
+		if args.n:
+			sys.stdout.write(change['DIFF'])
+		else:
+			print("Rewrote %s" % change['FILE'])
+	print("%d files %s" % (len(changes), 'would change' if args.n else 'changed'))
+
+
+if __name__ == "__main__":
+	main()
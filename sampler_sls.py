@@ -0,0 +1,144 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Samples system resources from /proc and statvfs without running top/free/df.
+#           1. ReadCPUTimes : Reads idle and total jiffies from /proc/stat
+#           2. ReadMemInfo : Reads /proc/meminfo in kB
+#           3. ReadPressure : Reads /proc/pressure/<cpu|memory|io> if kernel supports PSI
+#           4. FsUsage : Returns used percent of a filesystem, same as Use% of df
+#           5. Snapshot : Resource readings used by resource gates and show_results.py
+#           6. TakeSnapshot : Takes a Snapshot, idle CPU is the delta of two /proc/stat reads over a window
+#
+#  SETUP:   1. Install SLS : ./install_sls.py
+#           2. Start SLS : ./start_sls.py <options>
+#           3. Functions in sampler_sls.py will get called internally from SLS scripts.
+#
+
+import os
+import time
+import math
+
+#Seconds between two /proc/stat reads, SAMPLE_WINDOW in sls_config overrides it
+SAMPLE_WINDOW = 0.5
+
+
+def ReadCPUTimes():
+	with open('/proc/stat') as fp:
+		line = fp.readline()
+	#cpu user nice system idle iowait irq softirq steal guest guest_nice, guest is part of user
+	values = [int(x) for x in line.split()[1:9]]
+	while len(values) < 8:
+		values.append(0)
+	return values[3], sum(values)
+
+
+def ReadMemInfo():
+	meminfo = {}
+	with open('/proc/meminfo') as fp:
+		for line in fp:
+			fields = line.split()
+			if len(fields) < 2:
+				continue
+			meminfo[fields[0].rstrip(':')] = int(fields[1])
+	return meminfo
+
+
+def ReadPressure(resource):
+	pfile = '/proc/pressure/%s' % resource
+	if not os.path.exists(pfile):
+		return None
+	pressure = {}
+	try:
+		with open(pfile) as fp:
+			for line in fp:
+				fields = line.split()
+				if len(fields) == 0:
+					continue
+				pressure[fields[0]] = {}
+				for f in fields[1:]:
+					key, value = f.split('=')
+					pressure[fields[0]][key] = float(value)
+	except (IOError, OSError):
+		return None
+	return pressure
+
+
+def FsUsage(path='/'):
+	st = os.statvfs(path)
+	used = st.f_blocks - st.f_bfree
+	total = used + st.f_bavail
+	if total == 0:
+		return 0
+	return int(math.ceil(used * 100.0 / total))
+
+
+class Snapshot(object):
+	def __init__(self):
+		self.time = 0
+		self.cpu_idle = 0
+		self.mem_total = 0
+		self.mem_free = 0
+		self.mem_available = 0
+		self.swap_total = 0
+		self.swap_free = 0
+		self.free_mem_percent = 0
+		self.root_fs_used = 0
+		self.pressure = {}
+
+	def PressureAvg(self, resource, kind='some', avg='avg10'):
+		if resource not in self.pressure or self.pressure[resource] is None:
+			return None
+		return self.pressure[resource].get(kind, {}).get(avg)
+
+
+def SampleWindow():
+	window = os.environ.get('SAMPLE_WINDOW', '').strip()
+	if window == '':
+		return SAMPLE_WINDOW
+	return float(window)
+
+
+def TakeSnapshot(window=None, path='/'):
+	if window is None:
+		window = SampleWindow()
+	snap = Snapshot()
+
+	idle1, total1 = ReadCPUTimes()
+	if window > 0:
+		time.sleep(window)
+		idle2, total2 = ReadCPUTimes()
+		idle, total = idle2 - idle1, total2 - total1
+	else:
+		idle, total = idle1, total1
+	if total > 0:
+		snap.cpu_idle = (idle * 100.0) / total
+	else:
+		snap.cpu_idle = 100.0
+	snap.time = time.time()
+
+	#Free memory is total - used of free -m, which is MemAvailable on kernels exporting it
+	meminfo = ReadMemInfo()
+	snap.mem_total = meminfo.get('MemTotal', 0) // 1024
+	free_kb = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0) + meminfo.get('SReclaimable', 0)
+	snap.mem_available = meminfo.get('MemAvailable', free_kb) // 1024
+	snap.mem_free = snap.mem_available
+	snap.swap_total = meminfo.get('SwapTotal', 0) // 1024
+	snap.swap_free = meminfo.get('SwapFree', 0) // 1024
+	if snap.mem_total > 0:
+		snap.free_mem_percent = (snap.mem_free * 100.0) / snap.mem_total
+
+	for resource in ['cpu', 'memory', 'io']:
+		snap.pressure[resource] = ReadPressure(resource)
+
+	if path is not None:
+		snap.root_fs_used = FsUsage(path)
+	return snap
@@ -0,0 +1,493 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Scheduler of go_sls.py, picks tests and runs them until TEST_HOURS. Used as is by bench_sls.py
+#           1. SlotTarget : Tests allowed to run together, from headroom above the resource gates or the controller
+#           2. Scheduler : Holds catalog, registry, aggregator, cost profiles, controller, IO targets and cgroups
+#              PickTests, AddMustTests : Random eligible tests with suite and iterations, MUST_TEST of sls_config
+#              AdmitTests : Packs picked tests into headroom by their cost profiles
+#              ExecuteScenario : Registers and starts each test of a scenario on its own thread
+#              SlotLoop : Starts a test as soon as a slot frees up
+#              ScenarioLoop : Starts a scenario, waits for it if WAIT_SCENARIO and checks resources
+#
+#  SETUP:   1. Start SLS : ./start_sls.py <options>, go_sls.py creates the Scheduler and runs one of the loops
+#           2. ./bench_sls.py runs the same loops against a fake ltp tree
+#
+
+import os
+import re
+import time
+import queue
+import datetime
+import threading
+from common_sls import lg, GetRandom, GetSuiteIterations, GetFreeCPU, GetFreeMem, GetFsSpace
+from command_sls import GrepFile
+from sampler_sls import TakeSnapshot
+from results_sls import AppendJournal, RESULT_JOURNAL
+from runner_sls import StartTest, FinishTest
+from cost_sls import COST_CHOICE
+from controller_sls import CONTROL_PERIOD
+from profile_sls import Profiled
+
+#Seconds slot scheduler waits for a test to complete before rechecking resources
+SLOT_POLL = 10
+#Seconds between network checks of slot scheduler
+NW_CHECK = 60
+#Seconds between idle CPU and free memory lines of slot scheduler, when it starts no test
+RESOURCE_LOG = 60
+#Seconds scenario scheduler sleeps after a scenario, and when no test may start
+SCENARIO_PAUSE = 2
+NO_TEST_PAUSE = 60
+#Fixed TEST_TIMEOUT, or TIMEOUT_FACTOR times the usual duration of the test, at least this many seconds
+TIMEOUT_MIN = 600
+
+
+def SlotTarget(min_test_scenario, max_test_scenario, snap, controller=None):
+	#Tests allowed to run together, scaled between MIN and MAX by headroom above the resource gates
+	#Controller output is capped by the gates of resources it does not control and by the OOM and / gates
+	if snap.free_mem_percent <= 10 or snap.root_fs_used > 90:
+		return 1
+	rooms = [1.0]
+	if controller is None or controller.target_cpu is None:
+		if snap.cpu_idle < 27:
+			return min_test_scenario
+		rooms.append((snap.cpu_idle - 27) / (100.0 - 27))
+	if controller is None or controller.target_mem is None:
+		if snap.mem_free < 427:
+			return min_test_scenario
+		rooms.append((snap.mem_free - 427) / float(max(snap.mem_total - 427, 1)))
+	target = min_test_scenario + int(round((max_test_scenario - min_test_scenario) * min(rooms)))
+	if controller is not None:
+		target = min(target, controller.tests)
+	return target
+
+
+class Scheduler(object):
+	def __init__(self, ltp_vars, test_suite, catalog, registry, aggregator, costs, log, tlog, sls_logdir,
+			scenario_file, ltp_meta=None, kernel=None, controller=None, iotargets=None, cgroups=None,
+			sysrq=False, journal=None, sample=TakeSnapshot):
+		self.ltp_vars = ltp_vars
+		self.test_suite = test_suite
+		self.total_tests = len(test_suite) - 1
+		self.catalog = catalog
+		self.registry = registry
+		self.aggregator = aggregator
+		self.costs = costs
+		self.log = log
+		self.tlog = tlog
+		self.sls_logdir = sls_logdir
+		self.scenario_file = scenario_file
+		self.ltp_meta = ltp_meta
+		self.kernel = kernel
+		self.controller = controller
+		self.iotargets = iotargets
+		self.cgroups = cgroups
+		self.sysrq = sysrq
+		self.journal = journal if journal is not None else os.environ['TC_OUTPUT'] + '/' + RESULT_JOURNAL
+		self.sample = sample
+		self.finished = queue.Queue()
+		self.ineligible = {}
+		self.scen = 0
+		self.network_fail = 0
+
+	def CallLtp(self, run):
+		rlog = '%s/run_test.log' % self.sls_logdir
+		try:
+			StartTest(run.test, run.iterations, run.suite, rlog, run.scenario, run, self.iotargets, self.cgroups)
+			test_results = FinishTest(run, self.sls_logdir, rlog, self.registry, self.cgroups, self.sysrq)
+			AppendJournal(self.journal, test_results)
+			self.aggregator.Add(run.test, test_results)
+			#Duration of a killed hung test is its timeout, it would stretch the next timeout of the test
+			if not test_results.get('TOTAL_HUNG'):
+				self.costs.Update(run, test_results)
+		except Exception as e:
+			lg(rlog, "[call_ltp] [error] %s: %s" % (run.test, str(e)), 0, 1)
+			if self.cgroups is not None:
+				self.cgroups.Release(run)
+			self.registry.Unregister(run)
+		if self.iotargets is not None:
+			self.iotargets.Release(run)
+		self.finished.put(run.test)
+
+	def TestTimeout(self, test, suite, iterations):
+		timeout = None
+		if self.ltp_vars.get('TIMEOUT_FACTOR', '') != '':
+			duration = self.costs.Duration(test, suite, iterations)
+			if duration is not None:
+				timeout = max(duration * float(self.ltp_vars['TIMEOUT_FACTOR']), TIMEOUT_MIN)
+		if self.ltp_vars.get('TEST_TIMEOUT', '') != '':
+			if timeout is None or timeout > int(self.ltp_vars['TEST_TIMEOUT']):
+				timeout = int(self.ltp_vars['TEST_TIMEOUT'])
+		return timeout
+
+	def Launch(self, test):
+		#test is 'name(suite|iterations)', registry adds it to IN-PROGRESS-TEST before it starts
+		testcase = test.split('(')[0]
+		suite = test.split('(')[1].split('|')[0]
+		iterations = int(test.split('|')[1].replace(')',''))
+		run = self.registry.Register(testcase, iterations, suite, self.scen)
+		run.timeout = self.TestTimeout(testcase, suite, iterations)
+		th = threading.Thread(target=self.CallLtp, args=(run,))
+		th.start()
+		return th
+
+	@Profiled('execute_scenario')
+	def ExecuteScenario(self, tests_scenario, wait=None):
+		ltp_threads = []
+		for test in tests_scenario:
+			ltp_threads.append(self.Launch(test))
+
+		#Wait till this scenario completes
+		if wait is None:
+			wait = re.search('YES', os.environ['WAIT_SCENARIO'], re.M|re.I)
+		if wait:
+			line = "Waiting for scenario to complete"
+			lg(self.log, line, 0)
+			for th in ltp_threads:
+				th.join()
+		return ltp_threads
+
+	def ScenarioLimits(self):
+		if 'MIN_TEST_PER_SCENARIO' in self.ltp_vars:
+			min_test_scenario = int(self.ltp_vars['MIN_TEST_PER_SCENARIO'].strip())
+		else:
+			min_test_scenario = 3
+
+		if 'MAX_TEST_PER_SCENARIO' in self.ltp_vars:
+			max_test_scenario = int(self.ltp_vars['MAX_TEST_PER_SCENARIO'].strip())
+		else:
+			max_test_scenario = 8
+		return min_test_scenario, max_test_scenario
+
+	def ScenarioSize(self):
+		min_test_scenario, max_test_scenario = self.ScenarioLimits()
+		if max_test_scenario > min_test_scenario:
+			total_tests_scenario = GetRandom(max_test_scenario, min_test_scenario)
+		else:
+			total_tests_scenario = max_test_scenario
+
+		if 'MUST_TEST' in self.ltp_vars:
+			if self.ltp_vars['MUST_TEST'].strip() != '':
+				must_tests = self.ltp_vars['MUST_TEST'].strip().split(',')
+				must_tests = [x for x in must_tests if x]
+				if max_test_scenario > len(must_tests):
+					total_tests_scenario = max_test_scenario - len(must_tests)
+			if total_tests_scenario < 0:
+				total_tests_scenario = 0
+			elif total_tests_scenario > min_test_scenario:
+				total_tests_scenario = GetRandom(total_tests_scenario, min_test_scenario)
+		return total_tests_scenario
+
+	def EligibleTest(self, test):
+		#Reason a test cannot run on this machine, looked up once per test
+		if self.ltp_meta is None:
+			return True
+		if test not in self.ineligible:
+			self.ineligible[test] = self.ltp_meta.Eligible(test, self.kernel)
+			if self.ineligible[test] is not None:
+				lg(self.tlog, "[pick_tests] [info] Not picking %s, %s" % (test, self.ineligible[test]), 0)
+		return self.ineligible[test] is None
+
+	def CapIterations(self, suite_iter):
+		#If test belongs to Network focus area, cap iterations max to 10
+		if re.search(suite_iter[0], os.environ['NW1_LIST'], re.M):
+			if suite_iter[1] > 10:
+				suite_iter[1] = 10
+		if re.search(suite_iter[0], os.environ['NW2_LIST'], re.M):
+			if suite_iter[1] > 10:
+				suite_iter[1] = 10
+		if re.search(suite_iter[0], os.environ['NFS_LIST'], re.M):
+			if suite_iter[1] > 10:
+				suite_iter[1] = GetRandom(10)
+
+	@Profiled('pick_tests')
+	def PickTests(self, total_tests_scenario):
+		tests_scenario = []
+		#Bound the retries, all candidates can be running or excluded
+		attempts = 0
+		max_attempts = 10 * len(self.test_suite) + 100
+		tlist = []
+		for x in range(total_tests_scenario):
+			valid_test = 0
+			while valid_test == 0 and attempts < max_attempts:
+				attempts += 1
+				#Pick a Random test
+				if self.total_tests <= 0:
+					test = self.test_suite[0]
+				else:
+					rnum = GetRandom(self.total_tests, 0)
+					if rnum >= len(self.test_suite):
+						rnum = len(self.test_suite) - 1
+					test = self.test_suite[rnum]
+				if test == "" or test == " ":
+					continue
+				test = test.strip()
+
+				#If kernel, commands or drivers of this machine do not suit the test, pick some other test
+				if not self.EligibleTest(test):
+					continue
+
+				#If not valid test, then pick some other test
+				suite_iter = GetSuiteIterations(self.tlog, test, self.ltp_vars, self.catalog)
+				if suite_iter[1] == 0:
+					continue
+
+				#If already running, then pick some other test
+				if self.registry.IsRunning(test):
+					continue
+
+				#Check if skip or brok or conf count this test is more than 2, if so dont pick
+				if len(GrepFile('%s/sls_skip_conf_brok' % self.sls_logdir, '%s:%s' % (test,suite_iter[0]), word=True)) >= 2:
+					continue
+
+				#If test is already picked in this scenario, pick another
+				tentry = "%s|%s" % (test, suite_iter[0])
+				if tentry in tlist:
+					valid_test = 0
+					continue
+
+				#If test is part of EXCLUDE_TEST, exclude it
+				if 'EXCLUDE_TEST' in self.ltp_vars:
+					if self.ltp_vars['EXCLUDE_TEST'] != '':
+						etests = self.ltp_vars['EXCLUDE_TEST'].split(',')
+						if test in etests:
+							continue
+
+				tlist.append(tentry)
+				self.CapIterations(suite_iter)
+
+				#If network_fail then pick skip NFS and Network tests
+				if self.network_fail == 1:
+					if re.search(suite_iter[0], os.environ['NW1_LIST'], re.M):
+						iline = 'Ignoring network test:%s, as RHOSTS ping failed' % test
+						lg(self.log, iline, 0)
+						continue
+
+					if re.search(suite_iter[0], os.environ['NW2_LIST'], re.M):
+						iline = 'Ignoring network test:%s, as RHOSTS ping failed' % test
+						lg(self.log, iline, 0)
+						continue
+
+					if re.search(suite_iter[0], os.environ['NFS_LIST'], re.M):
+						iline = 'Ignoring NFS test:%s, as RHOSTS ping failed' % test
+						lg(self.log, iline, 0)
+						continue
+
+				#Shorter runs while load is above TARGET_*_UTIL
+				if self.controller is not None:
+					suite_iter[1] = self.controller.Iterations(suite_iter[1])
+
+				test_detail = "%s(%s|%d)" % (test, suite_iter[0], suite_iter[1])
+				tests_scenario.append(test_detail)
+				valid_test = 1
+		return tests_scenario
+
+	@Profiled('add_must_tests')
+	def AddMustTests(self, tests_scenario):
+		#Add must test testcases
+		if 'MUST_TEST' in self.ltp_vars:
+			must_tests = self.ltp_vars['MUST_TEST'].strip().split(',')
+			must_tests = [x for x in must_tests if x]
+			for test in must_tests:
+				test = test.strip()
+				if test == '':
+					continue
+				if test in tests_scenario:
+					continue
+
+				#If already running, then pick some other test
+				if self.registry.IsRunning(test):
+					line = "Must test:%s, already running. So not picking it for this scenario" % test
+					lg(self.log, line, 0)
+					continue
+
+				suite_iter = GetSuiteIterations(self.tlog, test, self.ltp_vars, self.catalog)
+				if suite_iter[1] == 0:
+					lg(self.log, suite_iter[0], 0)
+					continue
+				self.CapIterations(suite_iter)
+
+				#Add test to test list
+				test_detail = "%s(%s|%d)" % (test, suite_iter[0], suite_iter[1])
+				tests_scenario.append(test_detail)
+		return tests_scenario
+
+	def LogScenario(self, tests_scenario):
+		d = datetime.datetime.now()
+		dat = "%s/%s/%s,%s:%s:%s" % (d.strftime('%Y'),d.strftime('%m'),d.strftime('%d'),d.strftime('%H'),d.strftime('%M'),d.strftime('%S'))
+		line = "[%s] [go_sls] [notice] Scenario_%d:  %s\n" % (dat,self.scen," ".join(tests_scenario))
+		f = open(self.scenario_file, "a")
+		f.write(line)
+		f.close()
+		return dat
+
+	def LaunchChecks(self, tests_scenario):
+		dat = self.LogScenario(tests_scenario)
+
+		#Check free memory and launch only 1 test if less tahn 10% memory is available
+		free_mem_percent = self.sample(0).free_mem_percent
+		if free_mem_percent <= 10:
+			line = "Alert !! Less than 10%% memory is available, so launching only 1 test for this scenario"
+			lg(self.log, line, 0)
+			test = tests_scenario[-1].split('(')[0]
+			testsuite = tests_scenario[-1].split('(')[1].split('|')[0]
+			tests_scenario = []
+			test_detail = "%s(%s|1)" % (test,testsuite)
+			tests_scenario.append(test_detail)
+			line = "[%s] [go_sls] [info] Starting only 1 test:%s for 1 iteration" % (dat, test)
+			lg(self.log, line, 0)
+		else:
+			line = "[%s] [go_sls] [info] Starting %d TESTS CONCURRENTLY" % (dat, len(tests_scenario))
+			lg(self.log, line, 0)
+		return tests_scenario
+
+	@Profiled('admit_tests')
+	def AdmitTests(self, tests_scenario, count, snap, must_tests=None):
+		#Packs picked tests into headroom by their cost profiles, must tests are always kept
+		def entries(tests):
+			return [(x, x.split('(')[0], x.split('(')[1].split('|')[0]) for x in tests]
+		if self.controller is not None:
+			room = self.costs.Headroom(snap, self.registry.Running(), self.controller.target_cpu, self.controller.target_mem)
+		else:
+			room = self.costs.Headroom(snap, self.registry.Running())
+		admitted = self.costs.Pack(entries(tests_scenario), count, room, entries(must_tests or []))
+		#Something has to run, else headroom never changes
+		if len(admitted) == 0 and len(tests_scenario) != 0 and not must_tests and self.registry.Count() == 0:
+			admitted = [min(entries(tests_scenario), key=lambda x: self.costs.Estimate(x[1], x[2]))[0]]
+		if len(admitted) < len(tests_scenario):
+			line = "[go_sls] [info] Headroom %dMB %.1f CPUs, admitting %d of %d picked tests" % (room[0], room[1], len(admitted), len(tests_scenario))
+			lg(self.log, line, 0)
+		return admitted
+
+	def WaitFinished(self, timeout):
+		#Wake up as soon as a test completes, returns the test or None after timeout
+		try:
+			return self.finished.get(timeout=timeout)
+		except queue.Empty:
+			return None
+
+	def Drain(self):
+		line = "Waiting for running tests to complete"
+		lg(self.log, line, 0)
+		while self.registry.Count() != 0:
+			self.WaitFinished(SLOT_POLL)
+
+	def LogResources(self, snap, cpu=True, mem=True):
+		#Same lines as GetFreeCPU and GetFreeMem log, show_results.py -c and -m average them
+		if cpu:
+			lg(self.log, "[go_sls] [info] Idle CPU: %d" % snap.cpu_idle, 0, 1)
+		if mem:
+			lg(self.log, "[go_sls] [info] Free Memory percent %.2f" % snap.free_mem_percent, 0, 1)
+
+	def CheckResources(self, snap):
+		#Controller replaces the gates of resources it has a target for
+		cpu_gate = self.controller is None or self.controller.target_cpu is None
+		mem_gate = self.controller is None or self.controller.target_mem is None
+		if cpu_gate:
+			GetFreeCPU(self.log, self.tlog, snap)
+		if mem_gate:
+			GetFreeMem(self.log, self.tlog, snap)
+		self.LogResources(snap, not cpu_gate, not mem_gate)
+		GetFsSpace(self.log, self.tlog, snap)
+
+	def SlotLoop(self, end_time, test_hours, network_check=None):
+		#network_check returns 1 if SLS has to stop, it also sets network_fail
+		min_test_scenario, max_test_scenario = self.ScenarioLimits()
+		last_nw_check = time.time()
+		last_log = 0
+		while True:
+			running = self.registry.Count()
+			snap = self.sample()
+			if self.controller is not None:
+				self.controller.Update(snap)
+				lg(self.tlog, "[go_sls] [debug] Controller %s" % self.controller.Describe(), 0)
+			target = SlotTarget(min_test_scenario, max_test_scenario, snap, self.controller)
+			free_slots = target - running
+			if free_slots > 0:
+				#Must tests take the free slots first, each launch is logged as a scenario for -r replay
+				must_tests = self.AddMustTests([])
+				tests_scenario = list(must_tests)
+				if free_slots > len(must_tests):
+					picked = self.PickTests((free_slots - len(must_tests)) * COST_CHOICE)
+					tests_scenario.extend(self.AdmitTests(picked, free_slots - len(must_tests), snap, must_tests))
+				if len(tests_scenario) != 0:
+					line = "[go_sls] [info] Running:%d Target:%d Free Mem:%d MB" % (running, target, snap.mem_free)
+					lg(self.log, line, 0, 1)
+					self.LogResources(snap)
+					last_log = time.time()
+					tests_scenario = self.LaunchChecks(tests_scenario)
+					self.ExecuteScenario(tests_scenario, 0)
+					self.scen += 1
+
+			if time.time() - last_log >= RESOURCE_LOG:
+				last_log = time.time()
+				self.LogResources(snap)
+
+			if network_check is not None and time.time() - last_nw_check >= NW_CHECK:
+				last_nw_check = time.time()
+				if network_check() == 1:
+					break
+
+			if datetime.datetime.now() > end_time:
+				line = "LTP Tests executed for %d hours and now its ending" % test_hours
+				lg(self.log, line, 0)
+				self.Drain()
+				break
+
+			#Wake up as soon as a test completes, recheck resources periodically otherwise
+			self.WaitFinished(SLOT_POLL)
+
+	def ScenarioLoop(self, end_time, test_hours, network_check=None):
+		snap = self.sample()
+		while True:
+			#Pick more tests than scenario size, admit those that fit in headroom
+			must_tests = self.AddMustTests([])
+			if self.controller is not None:
+				total_tests_scenario = max(self.controller.FreeSlots(snap, self.registry.Count()) - len(must_tests), 0)
+				lg(self.tlog, "[go_sls] [debug] Controller %s" % self.controller.Describe(), 0)
+			else:
+				total_tests_scenario = self.ScenarioSize()
+			tests_scenario = self.PickTests(total_tests_scenario * COST_CHOICE)
+			tests_scenario = self.AdmitTests(tests_scenario, total_tests_scenario, snap, must_tests) + must_tests
+
+			if len(tests_scenario) == 0 and self.controller is not None:
+				#At or above target, sample again when a test completes or after a control period
+				self.WaitFinished(CONTROL_PERIOD)
+				snap = self.sample()
+			elif len(tests_scenario) == 0:
+				lg(self.log, "Not allowed to start any new tests, sleeping for a minute", 0)
+				time.sleep(NO_TEST_PAUSE)
+				snap = self.sample()
+			else:
+				tests_scenario = self.LaunchChecks(tests_scenario)
+				self.ExecuteScenario(tests_scenario)
+				self.scen += 1
+
+				#Check Resources
+				lg(self.log, " ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ", 0)
+				snap = self.sample()
+				self.CheckResources(snap)
+				if network_check is not None and network_check() == 1:
+					break
+				time.sleep(SCENARIO_PAUSE)
+
+			current_time = datetime.datetime.now()
+			if current_time > end_time:
+				line = "LTP Tests executed for %d hours and now its ending" % test_hours
+				lg(self.log, line, 0)
+				line = "Current Time: %s , End Time: %s" % (current_time, end_time)
+				lg(self.log, line, 0)
+				self.Drain()
+				break
+			else:
+				line = "Enough resources are available, going for next iteration"
+				lg(self.log, line, 0)
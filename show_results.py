@@ -15,6 +15,7 @@
 #           1. Reads latest_log from SLS DIR
 #           2. Reads REPORT.json file from SLS log directory 
 #           3. Prints the results and status based on arguments
+#           4. Prints top time sinks from PROFILE.json with -p
 #
 #  SETUP:   1. Create or Edit ./sls_config file with test inputs
 #           2. Install SLS: ./install_sls.py
@@ -31,6 +32,10 @@ import time
 import json
 import argparse
 from common_sls import *
+from command_sls import ListDir, ProcessCount
+from sampler_sls import TakeSnapshot
+from profile_sls import TopSinks
+from runner_sls import QueryStatus, InProgressLine, STATUS_SOCKET
 
 #Parse Arguments
 parser = argparse.ArgumentParser(description='Show LTP Results')
@@ -40,6 +45,7 @@ parser.add_argument('-s', action="store_true", dest="s", help='Show Test Scenari
 parser.add_argument('-t', action="store", dest="t", nargs="?", default='all', help='Show Tests')
 parser.add_argument('-i', action="store_true", dest="i", help='Show In Progress Tests')
 parser.add_argument('-d', action="store_true", dest="d", help='Show Details of In Progress Tests')
+parser.add_argument('-p', action="store", dest="p", nargs="?", type=int, const=10, help='Show top time sinks of go_sls.py from PROFILE.json, default top 10')
 args = parser.parse_args()
 
 ltp_vars = GetVars()
@@ -88,8 +94,7 @@ with open(MASTER_FILE, 'r') as g:
 	REPORT = json.load(g)
 g.close()
 
-command = "ps -eaf|grep go_sls|grep -v grep|wc -l"
-if int(RunCommand(command, tlog, 2, 0)) == 0 and REPORT['RESULTS']['STATUS'] == 'In Progress':
+if ProcessCount('go_sls') == 0 and REPORT['RESULTS']['STATUS'] == 'In Progress':
 	REPORT['RESULTS']['STATUS'] = 'ABORTED'
 
 print('------------------------------------------------------')
@@ -104,6 +109,8 @@ print("CONF%%    : %s" % REPORT['RESULTS']['CONF%'])
 print("BROK%%    : %s" % REPORT['RESULTS']['BROK%'])
 
 START_FILE = MASTER_FILE.replace('REPORT.json','START.LTP_log')
+if args.c or args.m:
+	snap = TakeSnapshot()
 if args.c:
 	if os.path.exists(START_FILE):
 		command = "cat %s|grep 'Idle CPU: '|awk '{print $6}'|tr '\n' '^'" % START_FILE
@@ -113,13 +120,12 @@ if args.c:
 			cpu = [x for x in cpu if x.strip()]
 			cpu_usage = "Avg CPU Usage : %d%%" % (100 - (eval("+".join(cpu))/len(cpu)))
 			print(cpu_usage)
+		print("Current CPU Usage : %d%%" % (100 - snap.cpu_idle))
 	else:
 		print("%s file is not present" % START_FILE)
 
 if args.m:
 	if os.path.exists(START_FILE):
-		command = "free -m | awk '{print $2}' | grep -v [a-z] | head -n 1"
-		totalmem = int(RunCommand(command, tlog, 2, 0))
 		command = "cat %s|grep 'Free Memory percent'|awk '{print $7}'|tr '\n' '^'" % START_FILE
 		freemem = RunCommand(command, tlog, 2, 0)
 		if freemem != "":
@@ -131,6 +137,9 @@ if args.m:
 			total_mem_percent = 100 - (total_mem_percent / len(mem))
 			mem_usage = "Avg Memory Usage : %.2f%%" % total_mem_percent
 			print(mem_usage)
+		print("Current Memory Usage : %.2f%% of %d MB" % (100 - snap.free_mem_percent, snap.mem_total))
+		if snap.PressureAvg('memory') is not None:
+			print("Memory Pressure (avg10) : some %.2f full %.2f" % (snap.PressureAvg('memory'), snap.PressureAvg('memory', 'full')))
 	else:
 		print("%s file is not present" % START_FILE)
 
@@ -139,29 +148,34 @@ print("OVERVIEW : %s" % REPORT['RESULTS']['OVERVIEW'])
 if args.i or args.d:
 	print("")
 	INPROGRESS = MASTER_FILE.replace('REPORT.json','IN-PROGRESS-TEST')
-	if os.path.exists(INPROGRESS):
+	#Ask running go_sls.py first, IN-PROGRESS-TEST is the last snapshot it wrote
+	status = QueryStatus('%s/%s' % (logdir, STATUS_SOCKET))
+	if status is not None or os.path.exists(INPROGRESS):
 		print("\nIn Progress Tests:")
 		print("-------------------")
-		with open(INPROGRESS,'r') as g:
-			inprog = g.readlines()
-		g.close()
+		if status is not None:
+			inprog = [InProgressLine(x) for x in status]
+		else:
+			with open(INPROGRESS,'r') as g:
+				inprog = g.readlines()
 		for test in inprog:
 			if test == '' or test == ' ' or test == '\n':
 				continue
 			print(test)
 			if args.d:
 				tst = test.split(':')[0]
-				command = "ls -t /opt/ltp/output/|grep %s|head -1" % tst
-				outfile = RunCommand(command, tlog, 2, 0)
-				outfile = outfile.strip()
+				outdir = os.environ['ltp_results'] + '/output'
+				outfiles = ListDir(outdir, tst)
+				outfiles.sort(key=lambda x: os.path.getmtime('%s/%s' % (outdir, x)), reverse=True)
+				outfile = outfiles[0] if len(outfiles) != 0 else ''
 				if outfile == '':
-					print('Output file for %s not found under /opt/ltp/output/' % tst)
+					print('Output file for %s not found under %s/' % (tst, outdir))
 				else:
-					outputfile = "/opt/ltp/output/%s" % outfile
+					outputfile = "%s/%s" % (outdir, outfile)
 					if not os.path.exists(outputfile):
-						print("Output file for %s not found under /opt/ltp/output/" % tst)
+						print("Output file for %s not found under %s/" % (tst, outdir))
 					else:
-						command = "tail -5 /opt/ltp/output/%s" % outfile
+						command = ['tail', '-5', outputfile]
 						print(RunCommand(command, tlog, 2, 0))
 						print("")
 	else:
@@ -179,11 +193,24 @@ if args.s:
 	else:
 		print("%s file is not present" % SCEN_FILE)
 
+if args.p is not None:
+	print("")
+	PROFILE = MASTER_FILE.replace('REPORT.json','PROFILE.json')
+	if os.path.exists(PROFILE):
+		profile, sinks = TopSinks(PROFILE, args.p)
+		print("Top Time Sinks (%s):" % profile['TIME'])
+		print("-------------------")
+		print("%-45s %8s %12s %10s %10s" % ('PHASE', 'COUNT', 'TOTAL(s)', 'AVG(s)', 'MAX(s)'))
+		for name, h in sinks:
+			print("%-45s %8d %12.3f %10.3f %10.3f" % (name[:45], h['COUNT'], h['TOTAL'], h['AVG'], h['MAX']))
+	else:
+		print("%s file is not present" % PROFILE)
+
 if args.t != 'all':
 	print("")
 	if args.t is not None:
 		res_types = args.t.split(',')
-		allowed_types = ['fail', 'pass', 'brok', 'skip', 'conf']
+		allowed_types = ['fail', 'pass', 'brok', 'skip', 'conf', 'hung']
 		caps_types = [x.upper() for x in allowed_types]
 		for rtype in res_types:
 			if (rtype not in allowed_types) and (rtype not in caps_types):
@@ -203,7 +230,7 @@ if args.t != 'all':
 				for rtype in res_types:
 					RT = 'TOTAL_%s' % rtype.upper()
 					testline = '%s %s' % (test, str(tests[test]))
-					if int(tests[test][RT]) != 0 and testline not in test_results:
+					if int(tests[test].get(RT, 0)) != 0 and testline not in test_results:
 						test_results.append(testline)
 				for res in test_results:
 					print(str(res))	
@@ -30,6 +30,7 @@ import os
 import sys
 import argparse
 from common_sls import *
+from command_sls import ListDir, CountInFiles, ProcessCount
 
 def usage():
 	print("\n--------------------------------------------------------------")
@@ -90,8 +91,7 @@ if not ( t or b or i or n or s or r):
 	usage()
 
 #Check if SLS is already Running
-command = "ps -eaf|grep go_sls|grep -v grep |wc -l"
-if int(RunCommand(command,slog,2,0)) > 0:
+if ProcessCount('go_sls') > 0:
 	print("SLS is already running, if you wish to stop SLS please use: ./stop_sls.py")
 	exit(1)
 
@@ -99,7 +99,7 @@ if int(RunCommand(command,slog,2,0)) > 0:
 RunCommand('rm -f %s/*' % logdir, None, 0, 0)
 
 #Check if ltp is installed
-ret = RunCommand('/opt/ltp/runltp --help > /dev/null 2>&1', slog, 0, 0)
+ret = RunCommand("%s/runltp --help > /dev/null 2>&1" % os.environ['ltp_path'], slog, 0, 0)
 if ret != 0:
 	lg(slog, 'LTP is not installed, please execute ./install_sls.py')
 	exit(1)
@@ -110,7 +110,7 @@ RunCommand('rm -f ' + slog, slog)
 lg(slog,'\n', 0)
 
 #Check if LTP is installed
-ret = RunCommand('/opt/ltp/runltp --help > /dev/null 2>&1', slog, 0)
+ret = RunCommand("%s/runltp --help > /dev/null 2>&1" % os.environ['ltp_path'], slog, 0)
 if ret == 1:
 	lg(slog, "LTP is not installed. Execute  : ./install_sls.py")
 	exit(1)
@@ -130,17 +130,15 @@ if b or i or n or t or r:
 
 #Unmount IO filesystems if any
 lg(slog, 'Trying to umount sls related filesystems, if any...')
-command = "mount |grep -e '/tmp/ltp-' -e '/tmp/ltp_'|awk '{print $3}'|tr '\n' '^'"
-mntpoints = RunCommand(command, slog, 2, 0).strip().split('^')
-mntpoints = [x for x in mntpoints if x]
+mntpoints = MountPoints(['/tmp/ltp-', '/tmp/ltp_'])
 for mp in mntpoints:
 	lg(slog, 'Unmounting : %s' % mp)
-	command = 'umount %s' % mp
-	if int(RunCommand(command, slog, 0, 0)) != 0:
-		command = 'umount -f %s' % mp
-		if int(RunCommand(command, slog, 0, 0)) != 0:
-			command = 'umount -l %s' % mp
-			if int(RunCommand(command, slog, 0, 0)) != 0:
+	command = ['umount', mp]
+	if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
+		command = ['umount', '-f', mp]
+		if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
+			command = ['umount', '-l', mp]
+			if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
 				lg(slog,'Failed to umount : %s, please umount manually' % mp)
 				exit(1)
 
@@ -195,11 +193,11 @@ for TST in ['MUST_TEST', 'EXCLUDE_TEST']:
 			mt = mt.strip()
 			if mt == "":
 				continue
-			if int(RunCommand("ls /opt/ltp/testcases/bin|grep -w %s|wc -l" % mt, slog, 2, 0)) == 0:
-				lg(slog, '%s: %s not found under /opt/ltp/testcases/bin' % (TST,mt))
+			if len(ListDir(os.environ['ltp_bin'], mt, word=True)) == 0:
+				lg(slog, '%s: %s not found under %s' % (TST,mt,os.environ['ltp_bin']))
 				exit(1)
-			if int(RunCommand("grep -w %s /opt/ltp/runtest/*|wc -l" % mt, slog, 2, 0)) == 0:
-				lg(slog, 'test suite for %s: %s not found under /opt/ltp/runtest/' % (TST,mt))
+			if CountInFiles(os.environ['ltp_path'] + '/runtest/*', mt, word=True) == 0:
+				lg(slog, 'test suite for %s: %s not found under %s/runtest/' % (TST,mt,os.environ['ltp_path']))
 				exit(1)
 	if TST == 'EXCLUDE_TEST' and 'MUST_TEST' in ltp_vars and ltp_vars['MUST_TEST'] != '' and 'EXCLUDE_TEST' in ltp_vars:
 		mtests = ltp_vars['MUST_TEST'].split(',')
@@ -263,17 +261,11 @@ if os.environ['os_version'] == 'rhel' or os.environ['os_version'] == 'fedora':
 	mods = "xfrm dccp tunnel sctp"
 else:
 	mods = ''
+modules = []
 if 'MODULES' in ltp_vars and ltp_vars['MODULES'] != '':
 	modules = ltp_vars['MODULES'].split(' ')
-	modules = [x for x in modules if x]
-	for m in modules:
-		lg(slog, 'Loading : ' + m)
-		LoadModule(m, slog)
-modules = mods.split(' ')
-modules = [x for x in modules if x]
-for m in modules:
-	lg(slog, 'Loading : ' + m)
-	LoadModule(m, slog)
+modules = [x for x in modules + mods.split(' ') if x]
+LoadModules(modules, slog)
 
 lg(slog,'Starting Required OS services')
 if StartService(slog) != 0:
@@ -301,9 +293,8 @@ if s:
 	suites = s[0].split(',')
 	suites = [x for x in suites if x]
 	for suite in suites:
-		command = "ls /opt/ltp/runtest/|grep -w '^%s$'|wc -l" % suite
-		if int(RunCommand(command,slog, 2, 0)) == 0:
-			lg(slog, 'Test Suite: %s not found under /opt/ltp/runtest' % suite)
+		if suite not in ListDir(os.environ['ltp_path'] + '/runtest/'):
+			lg(slog, 'Test Suite: %s not found under %s/runtest' % (suite, os.environ['ltp_path']))
 			exit(1)
 
 lg(slog, '--------------------------------------------------')
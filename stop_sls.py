@@ -13,7 +13,7 @@
 #  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
 #  PURPOSE: Stops SLS execution.
 #           1. Kills SLS related processes including LTP tests
-#           2. Updates status as ABORTED in REPORT.json file
+#           2. Rebuilds REPORT.json from RESULTS.jsonl journal with status STOPPED_BY_USER
 #
 #  SETUP:   1. Create or Edit ./sls_config file with test inputs
 #           2. Install SLS: ./install_sls.py
@@ -29,6 +29,7 @@ import fcntl
 import time
 import json
 from common_sls import *
+from results_sls import WriteReport, CompactJournal, ReportStart, RESULT_JOURNAL
 
 ltp_vars = GetVars()
 if not ltp_vars:
@@ -70,8 +71,10 @@ if not os.path.exists('%s/latest_log' % logdir):
 	exit(1)
 
 f = open('%s/latest_log' % logdir, "r")
-MASTER_FILE = "%s/REPORT.json" % f.read().strip()
+TC_OUTPUT = f.read().strip()
 f.close()
+MASTER_FILE = "%s/REPORT.json" % TC_OUTPUT
+JOURNAL = "%s/%s" % (TC_OUTPUT, RESULT_JOURNAL)
 if not os.path.exists(MASTER_FILE):
 	lg(slog,"Not Found: %s" % MASTER_FILE)
 	exit(1)
@@ -88,14 +91,15 @@ while True:
 	else:
 		break
 
-with open(MASTER_FILE, 'r') as g:
-	REPORT = json.load(g)
-
-REPORT['RESULTS']['STATUS'] = "STOPPED_BY_USER"
-with open(MASTER_FILE, "w") as g:
-	json.dump(REPORT, g)
+#go_sls.py was killed, results it had not flushed to REPORT.json yet are only in the journal
+if os.path.exists(JOURNAL):
+	CompactJournal(JOURNAL, MASTER_FILE, ReportStart(MASTER_FILE), 'STOPPED_BY_USER')
+else:
+	with open(MASTER_FILE, 'r') as g:
+		REPORT = json.load(g)
 
-g.close()
+	REPORT['RESULTS']['STATUS'] = "STOPPED_BY_USER"
+	WriteReport(MASTER_FILE, REPORT)
 
 fcntl.flock(lock_file, fcntl.LOCK_UN)
 fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -103,18 +107,16 @@ fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 #Unmount IO filesystems if any
 lg(slog, 'Trying to umount sls related filesystems, if any...')
-command = "mount |grep -e '/tmp/ltp-' -e '/tmp/ltp_'|awk '{print $3}'|tr '\n' '^'"
-mntpoints = RunCommand(command, slog, 2, 0).strip().split('^')
-mntpoints = [x for x in mntpoints if x]
+mntpoints = MountPoints(['/tmp/ltp-', '/tmp/ltp_'])
 for mp in mntpoints:
 	lg(slog, 'Unmounting : %s' % mp)	
-	command = 'umount %s' % mp
-	lg(slog,command)
-	if int(RunCommand(command, slog, 0, 0)) != 0:
-		command = 'umount -f %s' % mp
-		lg(slog,command)	
-		if int(RunCommand(command, slog, 0, 0)) != 0:
-			command = 'umount -l %s' % mp
-			lg(slog,command)	
-			if int(RunCommand(command, slog, 0, 0)) != 0:
+	command = ['umount', mp]
+	lg(slog,' '.join(command))
+	if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
+		command = ['umount', '-f', mp]
+		lg(slog,' '.join(command))	
+		if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
+			command = ['umount', '-l', mp]
+			lg(slog,' '.join(command))	
+			if int(RunCommand(command, slog, 0, 0, UMOUNT_TIMEOUT)) != 0:
 				lg(slog,'Failed to umount : %s, please umount manually' % mp)
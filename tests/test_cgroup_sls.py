@@ -0,0 +1,57 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Tests of joining a test cgroup, CgroupManager.Command and Join of cgroup_sls.py.
+#           A directory stands in for cgroupfs, cgroup.procs is then a plain file
+#           1. Joined : Command runs after its pid is in cgroup.procs
+#           2. Not joined : Command does not run and the error is raised
+#
+#  SETUP:   1. python3 -m pytest tests
+#
+
+import os
+import subprocess
+import pytest
+from cgroup_sls import CgroupManager
+
+
+class Run(object):
+	def __init__(self, cgroup):
+		self.cgroup = cgroup
+
+
+def Start(manager, run, marker):
+	command = manager.Command(run, ['touch', marker])
+	return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+def test_joined(tmp_path):
+	run = Run(str(tmp_path))
+	marker = str(tmp_path / 'ran')
+	manager = CgroupManager(root=str(tmp_path))
+	proc = Start(manager, run, marker)
+	manager.Join(run, proc)
+	assert proc.wait(10) == 0
+	with open(str(tmp_path / 'cgroup.procs')) as g:
+		assert g.read() == str(proc.pid)
+	assert os.path.exists(marker)
+
+
+def test_not_joined(tmp_path):
+	run = Run(str(tmp_path / 'removed'))
+	marker = str(tmp_path / 'ran')
+	manager = CgroupManager(root=str(tmp_path))
+	proc = Start(manager, run, marker)
+	with pytest.raises(OSError):
+		manager.Join(run, proc)
+	assert proc.returncode == 126
+	assert not os.path.exists(marker)
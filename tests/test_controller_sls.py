@@ -0,0 +1,98 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Tests of UtilController of controller_sls.py against a lagged linear load model.
+#           1. LaggedLoad : CPU used moves to base + load per test * tests with a first order lag, plus noise
+#           2. Operating point must be the target, whatever the rate the scheduler calls Update at
+#
+#  SETUP:   1. python3 -m pytest tests
+#
+
+import math
+import random
+from controller_sls import UtilController, CONTROL_PERIOD
+
+
+class Snap(object):
+	def __init__(self, cpu_util, mem_util=50):
+		self.cpu_idle = 100.0 - cpu_util
+		self.free_mem_percent = 100.0 - mem_util
+
+
+def LaggedLoad(controller, step, per_test, seconds=20000, tau=30.0, base=5.0, noise=8.0, seed=1):
+	#Returns mean CPU used and mean tests over the second half of the run
+	rnd = random.Random(seed)
+	load = base
+	now = 0.0
+	utils = []
+	tests = []
+	while now < seconds:
+		running = controller.Update(Snap(min(100.0, load + rnd.gauss(0, noise))), now)
+		load += (base + per_test * running - load) * (1 - math.exp(-step / tau))
+		now += step
+		if now > seconds / 2:
+			utils.append(min(100.0, load))
+			tests.append(running)
+	return sum(utils) / len(utils), sum(tests) / float(len(tests))
+
+
+def OpenLoop(step, seeds=10, seconds=20000):
+	#Mean tests when the measured load is only noise around the target
+	means = []
+	for seed in range(seeds):
+		rnd = random.Random(seed)
+		controller = UtilController(60, None, 2, 20)
+		now = 0.0
+		tests = []
+		while now < seconds:
+			tests.append(controller.Update(Snap(60 + rnd.gauss(0, 8)), now))
+			now += step
+		means.append(sum(tests) / float(len(tests)))
+	return sum(means) / len(means)
+
+
+def test_output_held_within_period():
+	controller = UtilController(60, None, 2, 20)
+	first = controller.Update(Snap(0), 0)
+	for x in range(1, 20):
+		assert controller.Update(Snap(100 if x % 2 else 0), x * CONTROL_PERIOD / 20.0) == first
+	assert controller.Update(Snap(0), CONTROL_PERIOD) > first
+
+
+def test_lagged_load_settles_at_target():
+	for per_test in [5, 10]:
+		for step in [0.6, 10]:
+			util, tests = LaggedLoad(UtilController(60, None, 2, 20), step, per_test)
+			assert abs(util - 60) < 2, (per_test, step, util)
+			assert abs(tests - 55.0 / per_test) < 1, (per_test, step, tests)
+
+
+def test_operating_point_independent_of_call_rate():
+	assert abs(OpenLoop(0.6) - OpenLoop(10)) < 1.5
+
+
+def test_saturates_at_limits():
+	#Target not reachable with MAX tests, or already passed with MIN tests
+	util, tests = LaggedLoad(UtilController(60, None, 2, 20), 1, 2)
+	assert tests == 20
+	util, tests = LaggedLoad(UtilController(60, None, 2, 20), 1, 30)
+	assert tests < 2.1
+
+
+def test_iterations_shrink_above_target():
+	controller = UtilController(50, 50, 1, 8)
+	controller.Update(Snap(40, 95), 0)
+	assert controller.tests == 1
+	assert controller.Iterations(100) == 10
+	controller = UtilController(50, None, 1, 8)
+	controller.Update(Snap(40, 95), 0)
+	assert controller.Iterations(100) == 100
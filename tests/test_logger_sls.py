@@ -0,0 +1,41 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Tests of LogWriter of logger_sls.py.
+#           1. Removed directory : Lines of its log file are dropped and reported once, other logs are written
+#
+#  SETUP:   1. python3 -m pytest tests
+#
+
+import shutil
+from logger_sls import LogWriter
+
+
+def test_removed_directory(tmp_path, capsys):
+	(tmp_path / 'a').mkdir()
+	(tmp_path / 'b').mkdir()
+	gone = str(tmp_path / 'a' / 'x.log')
+	kept = str(tmp_path / 'b' / 'y.log')
+	writer = LogWriter(interval=60)
+	writer.Write(gone, b'one\n')
+	writer.Write(kept, b'one\n')
+	writer.Drain()
+	shutil.rmtree(str(tmp_path / 'a'))
+	for i in range(3):
+		writer.Write(gone, b'two\n')
+		writer.Write(kept, b'two\n')
+	writer.Close()
+
+	with open(kept) as g:
+		assert g.read() == 'one\ntwo\ntwo\ntwo\n'
+	err = capsys.readouterr().err
+	assert err.count('Cannot write %s' % gone) == 1
@@ -0,0 +1,84 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Tests of ltpresult_sls.py against runltp -l and -o files under fixtures/ltpresult.
+#           1. mixed : Six iterations of a new API test ending with termination_id 0, 1, 2, 4, 32 and 6
+#           2. crashed : Output cut short in the second iteration, log without totals
+#           3. legacy : Old API test output, second iteration killed by SIGKILL
+#
+#  SETUP:   1. python3 -m pytest tests
+#
+
+import os
+from ltpresult_sls import ParseLog, ParseOutput, ParseResults
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ltpresult')
+
+
+def Fixture(name):
+	return (os.path.join(FIXTURES, name + '.log'), os.path.join(FIXTURES, name + '.out'))
+
+
+def Totals(result):
+	return dict((k, v) for k, v in result.items() if k.startswith('TOTAL_'))
+
+
+def test_log_totals():
+	assert ParseLog(Fixture('mixed')[0]) == {'TOTAL_TEST': 6, 'TOTAL_SKIP': 1, 'TOTAL_FAIL': 4}
+	assert ParseLog(Fixture('legacy')[0]) == {'TOTAL_TEST': 2, 'TOTAL_SKIP': 0, 'TOTAL_FAIL': 1}
+
+
+def test_log_without_totals():
+	assert ParseLog(Fixture('crashed')[0]) == {'TOTAL_TEST': 0, 'TOTAL_SKIP': 0, 'TOTAL_FAIL': 0}
+
+
+def test_missing_files():
+	result = ParseResults(os.path.join(FIXTURES, 'none.log'), os.path.join(FIXTURES, 'none.out'))
+	assert Totals(result) == {'TOTAL_TEST': 0, 'TOTAL_SKIP': 0, 'TOTAL_FAIL': 0,
+		'TOTAL_BROK': 0, 'TOTAL_CONF': 0, 'TOTAL_WARN': 0}
+	assert result['ITERATIONS'] == []
+
+
+def test_output_iterations():
+	iterations = ParseOutput(Fixture('mixed')[1])
+	assert [x['TAG'] for x in iterations] == ['fcntl36'] * 6
+	assert [x['TERMINATION_ID'] for x in iterations] == [0, 1, 2, 4, 32, 6]
+	assert [x['DURATION'] for x in iterations] == [3, 4, 1, 2, 0, 1]
+	#Result lines are counted in test output only, the Summary block of new API tests is not
+	counts = [tuple(x[k] for k in ['TPASS', 'TFAIL', 'TBROK', 'TCONF', 'TWARN']) for x in iterations]
+	assert counts == [(2, 0, 0, 0, 0), (1, 1, 0, 0, 0), (0, 0, 1, 0, 0),
+		(1, 0, 0, 0, 1), (0, 0, 0, 1, 0), (0, 1, 1, 0, 1)]
+
+
+def test_results_from_termination_id():
+	#TBROK and TWARN both set count as broken, TCONF only when it is the only bit
+	result = ParseResults(*Fixture('mixed'))
+	assert Totals(result) == {'TOTAL_TEST': 6, 'TOTAL_SKIP': 1, 'TOTAL_FAIL': 4,
+		'TOTAL_BROK': 2, 'TOTAL_CONF': 1, 'TOTAL_WARN': 1}
+	assert len(result['ITERATIONS']) == 6
+
+
+def test_results_cut_short():
+	result = ParseResults(*Fixture('crashed'))
+	assert Totals(result) == {'TOTAL_TEST': 0, 'TOTAL_SKIP': 0, 'TOTAL_FAIL': 0,
+		'TOTAL_BROK': 0, 'TOTAL_CONF': 0, 'TOTAL_WARN': 0}
+	assert [x['TERMINATION_ID'] for x in result['ITERATIONS']] == [0, None]
+	assert result['ITERATIONS'][1]['TPASS'] == 1
+
+
+def test_results_legacy_output():
+	#Old API lines are '<tag> <num> TPASS : <msg>', signaled termination_id 9 is a failure only
+	result = ParseResults(*Fixture('legacy'))
+	assert Totals(result) == {'TOTAL_TEST': 2, 'TOTAL_SKIP': 0, 'TOTAL_FAIL': 1,
+		'TOTAL_BROK': 0, 'TOTAL_CONF': 0, 'TOTAL_WARN': 0}
+	assert [(x['TAG'], x['DURATION'], x['TERMINATION_ID'], x['TPASS'], x['TFAIL']) for x in result['ITERATIONS']] == \
+		[('growfiles', 20, 0, 1, 0), ('growfiles', 18, 9, 0, 1)]
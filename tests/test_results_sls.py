@@ -0,0 +1,42 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Tests of results_sls.py.
+#           1. Stop : Results journaled after the last REPORT.json snapshot reach it, as stop_sls.py rebuilds it
+#
+#  SETUP:   1. python3 -m pytest tests
+#
+
+import json
+import datetime
+from results_sls import ResultAggregator, AppendJournal, CompactJournal, ReportStart
+
+
+def test_stop_compacts_journal(tmp_path):
+	master_file = str(tmp_path / 'REPORT.json')
+	journal = str(tmp_path / 'RESULTS.jsonl')
+	start = datetime.datetime.now() - datetime.timedelta(days=1, hours=2, seconds=5)
+	aggregator = ResultAggregator(master_file, start)
+	aggregator.Add('fork01', {'TOTAL_ITRN': 1, 'TOTAL_PASS': 1})
+	aggregator.Flush()
+	AppendJournal(journal, {'TEST': 'fork01', 'TOTAL_ITRN': 1, 'TOTAL_PASS': 1})
+	#Not flushed by the aggregator before it was killed
+	AppendJournal(journal, {'TEST': 'mmap01', 'TOTAL_ITRN': 1, 'TOTAL_FAIL': 1})
+
+	assert abs((ReportStart(master_file) - start).total_seconds()) < 2
+	CompactJournal(journal, master_file, ReportStart(master_file), 'STOPPED_BY_USER')
+	with open(master_file) as g:
+		report = json.load(g)
+	assert report['RESULTS']['STATUS'] == 'STOPPED_BY_USER'
+	assert report['RESULTS']['RUNTIME'].startswith('1 day, 2:00:0')
+	assert sorted(report['TESTS']) == ['fork01', 'mmap01']
+	assert report['TESTS']['mmap01']['TOTAL_FAIL'] == 1
@@ -0,0 +1,66 @@
+# Copyright (c) International Business Machines  Corp., 2020
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it would be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details
+#  AUTHORS: manjuhr1@in.ibm.com, chetjain@in.ibm.com
+#  PURPOSE: Tests of TestRegistry of runner_sls.py.
+#           1. Signal during Register : Handler flushes like the one of go_sls.py, while Register holds write_lock
+#
+#  SETUP:   1. python3 -m pytest tests
+#
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Runs in its own process, a deadlock of the main thread ends in TimeoutExpired instead of a hung pytest
+SIGNAL_IN_REGISTER = '''
+import os
+import sys
+import signal
+import runner_sls
+
+in_progress = sys.argv[1]
+registry = runner_sls.TestRegistry(os.path.dirname(in_progress), in_progress)
+flushed = []
+
+def handler(signum, frame):
+	flushed.append((registry.Count(), registry.Flush(False)))
+
+signal.signal(signal.SIGINT, handler)
+replace = runner_sls.ReplaceFile
+
+def SignalledReplace(path, data):
+	#Delivered while Register holds write_lock, the handler runs before ReplaceFile returns
+	os.kill(os.getpid(), signal.SIGINT)
+	replace(path, data)
+
+runner_sls.ReplaceFile = SignalledReplace
+registry.Register('fork01', 1, 'syscalls')
+runner_sls.ReplaceFile = replace
+print(flushed)
+print(registry.Flush(False))
+'''
+
+
+def test_signal_during_register(tmp_path):
+	in_progress = str(tmp_path / 'IN-PROGRESS-TEST')
+	env = dict(os.environ, ltp_path=str(tmp_path), TC_HTML_PATH=str(tmp_path), PYTHONPATH=ROOT)
+	proc = subprocess.run([sys.executable, '-c', SIGNAL_IN_REGISTER, in_progress], env=env,
+		stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=30)
+	assert proc.returncode == 0, proc.stderr
+	lines = proc.stdout.splitlines()
+	#Handler saw the registered test and skipped the flush it interrupted
+	assert lines[0] == '[(1, 0)]'
+	assert lines[1] == '1'
+	with open(in_progress) as g:
+		assert g.read().startswith('fork01:syscalls:1: ')